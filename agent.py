@@ -1,11 +1,13 @@
+import json
 import os
-import requests
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import date
 from typing import List, Dict, Optional, Tuple
 import uuid
 from pydantic import SecretStr
-# --- 新增导入 ---
-from concurrent.futures import ThreadPoolExecutor
 
 from langchain.agents import initialize_agent, AgentType
 from langchain.schema import HumanMessage, AIMessage
@@ -14,75 +16,72 @@ from langchain.tools import Tool
 from langchain_community.chat_message_histories import RedisChatMessageHistory
 from langchain_openai import ChatOpenAI
 
+from agent_dag import DagExecutor, DagNode
+from gaode_client import gaode_metrics, get_async_gaode_client, get_gaode_client
+from geocode_cache import get_geocode_cache
+
 # 添加Redis连接配置
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 
+# 规划器缓存：最多保留的会话数，以及会话空闲多久（秒）后释放
+PLANNER_CACHE_MAX_ENTRIES = int(os.getenv("PLANNER_CACHE_MAX_ENTRIES", "100"))
+PLANNER_CACHE_IDLE_TTL = int(os.getenv("PLANNER_CACHE_IDLE_TTL", str(30 * 60)))
+
+# 协作流程中单个智能体的超时（秒，0 表示不限时），可按智能体类型覆盖，格式为 {"weather": 60}
+AGENT_NODE_TIMEOUT = float(os.getenv("AGENT_NODE_TIMEOUT", "180"))
+AGENT_NODE_TIMEOUTS = {
+    agent_type: float(timeout)
+    for agent_type, timeout in json.loads(os.getenv("AGENT_NODE_TIMEOUTS", "{}")).items()
+}
+
 # ------- 高德地图工具模块 -------
+# 所有工具共享 gaode_client 中的连接池、超时和重试设置；*_async 版本供智能体异步运行时使用
 def gaode_geocode(address: str) -> dict:
     """调用高德地图 API，将地址转为经纬度"""
-    key = os.getenv("GAODE_API_KEY")
-    if not key:
-        return {"error": "高德地图API密钥未配置"}
-    
-    resp = requests.get(
-        "https://restapi.amap.com/v3/geocode/geo",
-        params={"address": address, "key": key},
-    ).json()
-    return resp
+    return get_gaode_client().geocode(address)
+
+async def gaode_geocode_async(address: str) -> dict:
+    return await get_async_gaode_client().geocode(address)
 
 def gaode_search_poi(location: str, keywords: str = "", poi_type: Optional[str] = None) -> dict:
     """根据经纬度和关键字搜索兴趣点：酒店、景点等"""
-    key = os.getenv("GAODE_API_KEY")
-    if not key:
-        return {"error": "高德地图API密钥未配置"}
-    
-    params = {"location": location, "keywords": keywords, "key": key}
-    if poi_type:
-        params["types"] = poi_type
-    resp = requests.get("https://restapi.amap.com/v3/place/around", params=params).json()
-    return resp
+    return get_gaode_client().search_poi(location, keywords, poi_type)
+
+async def gaode_search_poi_async(location: str, keywords: str = "", poi_type: Optional[str] = None) -> dict:
+    return await get_async_gaode_client().search_poi(location, keywords, poi_type)
 
 def gaode_route(origin: str, destination: str, strategy: str = "0") -> dict:
     """路径规划：驾车（0）、公交（1）、步行（3）等"""
-    key = os.getenv("GAODE_API_KEY")
-    if not key:
-        return {"error": "高德地图API密钥未配置"}
-    
-    resp = requests.get(
-        "https://restapi.amap.com/v3/direction/driving",
-        params={"origin": origin, "destination": destination, "strategy": strategy, "key": key},
-    ).json()
-    return resp
+    return get_gaode_client().route(origin, destination, strategy)
+
+async def gaode_route_async(origin: str, destination: str, strategy: str = "0") -> dict:
+    return await get_async_gaode_client().route(origin, destination, strategy)
 
 def gaode_weather(city: str) -> dict:
     """根据城市名称查询未来的天气预报"""
-    key = os.getenv("GAODE_API_KEY")
-    if not key:
-        return {"error": "高德地图API密钥未配置"}
-    
-    geocode_resp = gaode_geocode(city)
-    if geocode_resp.get("status") != "1" or not geocode_resp.get("geocodes"):
-        return {"error": f"无法解析城市 '{city}' 的地理编码"}
-    
-    adcode = geocode_resp["geocodes"][0].get("adcode")
-    if not adcode:
-        return {"error": f"无法从地理编码响应中找到城市 '{city}' 的 adcode"}
+    return get_gaode_client().weather(city)
 
-    resp = requests.get(
-        "https://restapi.amap.com/v3/weather/weatherInfo",
-        params={"city": adcode, "key": key, "extensions": "all"},
-    ).json()
-    return resp
+async def gaode_weather_async(city: str) -> dict:
+    return await get_async_gaode_client().weather(city)
+
+def get_gaode_stats() -> dict:
+    """各高德接口的调用次数、失败和重试次数、耗时分位数（毫秒），以及地理编码缓存的命中情况"""
+    geocode_cache = get_geocode_cache()
+    return {
+        "endpoints": gaode_metrics.stats(),
+        "geocode_cache": geocode_cache.stats() if geocode_cache else None,
+    }
 
 # ------- 将功能打包成 LangChain Tool -------
 gaode_tools = [
-    Tool(name="geocode", func=gaode_geocode, description="将地址转经纬度"),
-    Tool(name="search_poi", func=gaode_search_poi, description="搜索酒店或景点信息"),
-    Tool(name="route_planning", func=gaode_route, description="规划行程路径"),
+    Tool(name="geocode", func=gaode_geocode, coroutine=gaode_geocode_async, description="将地址转经纬度"),
+    Tool(name="search_poi", func=gaode_search_poi, coroutine=gaode_search_poi_async, description="搜索酒店或景点信息"),
+    Tool(name="route_planning", func=gaode_route, coroutine=gaode_route_async, description="规划行程路径"),
 ]
 
 weather_tools = [
-    Tool(name="get_weather_forecast", func=gaode_weather, description="根据城市名称查询未来几天的天气预报")
+    Tool(name="get_weather_forecast", func=gaode_weather, coroutine=gaode_weather_async,
+         description="根据城市名称查询未来几天的天气预报")
 ]
 
 def search_hotel(location: str, keywords: Optional[str] = "") -> dict:
@@ -90,8 +89,12 @@ def search_hotel(location: str, keywords: Optional[str] = "") -> dict:
     safe_keywords = keywords if keywords is not None else ""
     return gaode_search_poi(location, safe_keywords, poi_type="酒店")
 
+async def search_hotel_async(location: str, keywords: Optional[str] = "") -> dict:
+    safe_keywords = keywords if keywords is not None else ""
+    return await gaode_search_poi_async(location, safe_keywords, poi_type="酒店")
+
 hotel_tools = [
-    Tool(name="search_hotel", func=search_hotel, description="根据位置查询酒店")
+    Tool(name="search_hotel", func=search_hotel, coroutine=search_hotel_async, description="根据位置查询酒店")
 ]
 
 def recommend_attractions(location: str, keywords: Optional[str] = "") -> dict:
@@ -99,8 +102,13 @@ def recommend_attractions(location: str, keywords: Optional[str] = "") -> dict:
     safe_keywords = keywords if keywords is not None else ""
     return gaode_search_poi(location, safe_keywords, poi_type="旅游景点")
 
+async def recommend_attractions_async(location: str, keywords: Optional[str] = "") -> dict:
+    safe_keywords = keywords if keywords is not None else ""
+    return await gaode_search_poi_async(location, safe_keywords, poi_type="旅游景点")
+
 recommend_tools = [
-    Tool(name="recommend_attractions", func=recommend_attractions, description="根据位置推荐景点")
+    Tool(name="recommend_attractions", func=recommend_attractions, coroutine=recommend_attractions_async,
+         description="根据位置推荐景点")
 ]
 
 def plan_itinerary(location: str, days: str = "") -> str:
@@ -114,6 +122,34 @@ planner_tools = [
 ]
 
 # ------- 智能体定义 -------
+# 各类智能体的身份和目标
+AGENT_CONFIG = {
+    "maps": {
+        "name": "地图代理",
+        "goal": "作为地图代理，您的职责是处理地理位置、路线规划和兴趣点搜索。请准确解析中文地址并提供基于位置的建议。"
+    },
+    "weather": {
+        "name": "天气代理",
+        "goal": "作为天气代理，您的职责是提供详细的天气预报，并根据天气状况给出旅行建议。"
+    },
+    "booking": {
+        "name": "预订代理",
+        "goal": "作为预订代理，您的职责是在预算范围内寻找并推荐合适的住宿，同时考虑位置、价格和评价。"
+    },
+    "itinerary": {
+        "name": "行程代理",
+        "goal": "作为行程代理，您的职责是综合所有信息，创建一份详细、合理、逻辑清晰的旅行计划。"
+    }
+}
+
+# 工具注册表：各类智能体使用的工具在模块加载时创建一次，所有会话共用
+AGENT_TOOLS: Dict[str, List[Tool]] = {
+    "maps": gaode_tools + recommend_tools,
+    "weather": weather_tools,
+    "booking": hotel_tools,
+    "itinerary": planner_tools,
+}
+
 def create_llm() -> ChatOpenAI:
     """创建LLM实例"""
     openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -127,33 +163,23 @@ def create_llm() -> ChatOpenAI:
         base_url="https://api.openai-proxy.org/v1",
     )
 
+_shared_llm: Optional[ChatOpenAI] = None
+_shared_llm_lock = threading.Lock()
+
+def get_shared_llm() -> ChatOpenAI:
+    """获取进程内所有智能体和会话共享的LLM实例（共用同一个 HTTP 连接池）"""
+    global _shared_llm
+    with _shared_llm_lock:
+        if _shared_llm is None:
+            _shared_llm = create_llm()
+        return _shared_llm
+
 def create_agent(agent_type: str, tools: List[Tool], email: str, conv_id: str) -> dict:
-    """创建特定类型的智能体，使用Redis存储记忆"""
-    llm = create_llm()
-    
-    agent_config = {
-        "maps": {
-            "name": "地图代理",
-            "goal": "作为地图代理，您的职责是处理地理位置、路线规划和兴趣点搜索。请准确解析中文地址并提供基于位置的建议。"
-        },
-        "weather": {
-            "name": "天气代理",
-            "goal": "作为天气代理，您的职责是提供详细的天气预报，并根据天气状况给出旅行建议。"
-        },
-        "booking": {
-            "name": "预订代理",
-            "goal": "作为预订代理，您的职责是在预算范围内寻找并推荐合适的住宿，同时考虑位置、价格和评价。"
-        },
-        "itinerary": {
-            "name": "行程代理",
-            "goal": "作为行程代理，您的职责是综合所有信息，创建一份详细、合理、逻辑清晰的旅行计划。"
-        }
-    }
-    
-    if agent_type not in agent_config:
+    """创建特定类型的智能体，LLM 实例和工具共用，只有基于Redis的对话记忆按会话创建"""
+    if agent_type not in AGENT_CONFIG:
         raise ValueError(f"未知的智能体类型: {agent_type}")
     
-    config = agent_config[agent_type]
+    config = AGENT_CONFIG[agent_type]
     
     redis_session_id = f"{email}-{conv_id}-{agent_type}"
     message_history = RedisChatMessageHistory(
@@ -163,7 +189,7 @@ def create_agent(agent_type: str, tools: List[Tool], email: str, conv_id: str) -
     
     agent = initialize_agent(
         tools=tools,
-        llm=llm,
+        llm=get_shared_llm(),
         agent=AgentType.CHAT_CONVERSATIONAL_REACT_DESCRIPTION,
         memory=ConversationBufferMemory(
             memory_key="chat_history",
@@ -177,7 +203,8 @@ def create_agent(agent_type: str, tools: List[Tool], email: str, conv_id: str) -
     return {
         "agent": agent,
         "name": config["name"],
-        "goal": config["goal"]
+        "goal": config["goal"],
+        "message_history": message_history
     }
 
 # ------- 多智能体协作系统 -------
@@ -186,11 +213,22 @@ class MultiAgentTravelPlanner:
         self.email = email
         self.conv_id = conv_id
         self.agents = {
-            "maps": create_agent("maps", gaode_tools + recommend_tools, email, conv_id),
-            "weather": create_agent("weather", weather_tools, email, conv_id),
-            "booking": create_agent("booking", hotel_tools, email, conv_id),
-            "itinerary": create_agent("itinerary", planner_tools, email, conv_id)
+            agent_type: create_agent(agent_type, tools, email, conv_id)
+            for agent_type, tools in AGENT_TOOLS.items()
         }
+        # 最近一次 coordinate_agents 各智能体的耗时轨迹
+        self.last_trace: List[Dict] = []
+    
+    def close(self) -> None:
+        """释放各智能体的 Redis 连接（对话记忆仍保存在 Redis 中，共享的 LLM 实例不关闭）"""
+        for agent_info in self.agents.values():
+            redis_client = getattr(agent_info.get("message_history"), "redis_client", None)
+            if redis_client is None:
+                continue
+            try:
+                redis_client.close()
+            except Exception:
+                pass
         
     def get_agent_response(self, agent_type: str, message: str) -> str:
         """获取特定智能体的响应"""
@@ -207,69 +245,165 @@ class MultiAgentTravelPlanner:
             return f"智能体错误: {str(e)}"
         
     def coordinate_agents(self, user_request: str) -> str:
-        """协调多个智能体共同处理用户请求"""
-        # 步骤1: 地图代理处理位置信息（串行，因为后续步骤依赖它）
-        maps_response = self.get_agent_response(
-            "maps", 
-            f"用户请求: {user_request}\n请提供位置分析和路线建议。"
-        )
-        
-        weather_response = ""
-        booking_response = ""
-
-        # --- 修改部分：并发执行步骤2和步骤3 ---
-        with ThreadPoolExecutor(max_workers=2) as executor:
-            # 准备天气代理和预订代理的任务
-            weather_prompt = f"基于地图代理的分析: {maps_response}\n请提供目的地的天气预报。"
-            booking_prompt = f"用户请求: {user_request}\n地图代理分析: {maps_response}\n请推荐合适的住宿。"
-            
-            # 提交任务到线程池
-            future_weather = executor.submit(self.get_agent_response, "weather", weather_prompt)
-            future_booking = executor.submit(self.get_agent_response, "booking", booking_prompt)
-            
-            # 获取两个任务的结果
-            # .result() 方法会阻塞直到该任务完成
-            try:
-                weather_response = future_weather.result()
-            except Exception as e:
-                weather_response = f"天气代理执行出错: {e}"
-
-            try:
-                booking_response = future_booking.result()
-            except Exception as e:
-                booking_response = f"预订代理执行出错: {e}"
-
-        # 步骤4: 行程代理制定详细计划（串行，等待前面所有结果）
-        itinerary_response = self.get_agent_response(
-            "itinerary", 
-            f"用户请求: {user_request}\n地图代理分析: {maps_response}\n天气代理分析: {weather_response}\n预订代理分析: {booking_response}\n请制定详细的旅行行程。"
-        )
+        """按 PLANNING_GRAPH 协调多个智能体共同处理用户请求，耗时轨迹保存在 last_trace"""
+        run = PLANNING_GRAPH.run({"planner": self, "user_request": user_request})
+        self.last_trace = run.trace
+        results = run.results
         
         # 综合所有代理的结果
         return f"""
                         ## 综合旅行计划
 
                         ### 地点和路线
-                        {maps_response}
+                        {results["maps"]}
 
                         ### 天气预报
-                        {weather_response}
+                        {results["weather"]}
 
                         ### 住宿推荐
-                        {booking_response}
+                        {results["booking"]}
 
                         ### 详细行程
-                        {itinerary_response}
+                        {results["itinerary"]}
                         """
 
+# ------- 协作依赖图 -------
+def _agent_node(agent_type: str, depends_on: Tuple[str, ...], prompt_template: str) -> DagNode:
+    """由智能体类型和提示词模板构造依赖图节点，模板可引用 user_request 和上游节点的结果"""
+    label = AGENT_CONFIG[agent_type]["name"]
+    return DagNode(
+        name=agent_type,
+        run=lambda inputs: inputs["planner"].get_agent_response(agent_type, prompt_template.format(**inputs)),
+        depends_on=depends_on,
+        timeout=AGENT_NODE_TIMEOUTS.get(agent_type, AGENT_NODE_TIMEOUT) or None,
+        error_text=f"{label}执行出错: {{error}}",
+        timeout_text=f"{label}执行超时（{{timeout:g}} 秒），未能获得结果",
+        rejected_text=f"{label}未执行：智能体线程池已满，未能获得结果",
+    )
+
+# 地图代理先分析位置；天气代理和预订代理都只依赖地图代理，并发执行；行程代理等待前面所有结果
+PLANNING_GRAPH = DagExecutor([
+    _agent_node("maps", (), "用户请求: {user_request}\n请提供位置分析和路线建议。"),
+    _agent_node("weather", ("maps",), "基于地图代理的分析: {maps}\n请提供目的地的天气预报。"),
+    _agent_node("booking", ("maps",), "用户请求: {user_request}\n地图代理分析: {maps}\n请推荐合适的住宿。"),
+    _agent_node(
+        "itinerary", ("maps", "weather", "booking"),
+        "用户请求: {user_request}\n地图代理分析: {maps}\n天气代理分析: {weather}\n预订代理分析: {booking}\n请制定详细的旅行行程。"
+    ),
+])
+
 # ------- 全局缓存和入口点 -------
-planner_cache = {}
+class PlannerCache:
+    """
+    按会话缓存 MultiAgentTravelPlanner，限制数量和空闲时间
+
+    超过 max_entries 时淘汰最久未使用的会话，空闲超过 idle_ttl 秒的会话在下次访问缓存时
+    释放。被淘汰的规划器调用 close() 释放 Redis 连接；仍在处理请求的规划器等请求结束后再释放。
+    关闭连接涉及网络操作，在锁外进行，不阻塞其他线程查找缓存。
+    """
+
+    def __init__(self, max_entries: int = PLANNER_CACHE_MAX_ENTRIES, idle_ttl: int = PLANNER_CACHE_IDLE_TTL):
+        self.max_entries = max(max_entries, 1)
+        self.idle_ttl = idle_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # key -> {"planner", "last_used", "in_use", "evicted"}
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def use(self, email: str, conv_id: str):
+        """取出（或创建）会话的规划器，在 with 块内使用期间不会被释放"""
+        key = f"{email}-{conv_id}"
+        closing: List[MultiAgentTravelPlanner] = []
+        with self._lock:
+            entry = self._checkout(key, closing)
+        self._close(closing)
+        if entry is None:
+            # 创建规划器不持锁，避免阻塞其他会话
+            planner = MultiAgentTravelPlanner(email, conv_id)
+            closing = []
+            with self._lock:
+                entry = self._checkout(key, closing)
+                if entry is None:
+                    entry = {"planner": planner, "last_used": time.monotonic(), "in_use": 1, "evicted": False}
+                    self._entries[key] = entry
+                    self.misses += 1
+                    self._evict(closing)
+                else:
+                    # 其他线程已为同一会话创建了规划器
+                    closing.append(planner)
+            self._close(closing)
+        try:
+            yield entry["planner"]
+        finally:
+            with self._lock:
+                entry["in_use"] -= 1
+                entry["last_used"] = time.monotonic()
+                release = entry["evicted"] and entry["in_use"] == 0
+            if release:
+                entry["planner"].close()
+
+    def _checkout(self, key: str, closing: List) -> Optional[Dict]:
+        self._expire(closing)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            entry["in_use"] += 1
+            self.hits += 1
+        return entry
+
+    def _expire(self, closing: List) -> None:
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items()
+                    if entry["in_use"] == 0 and now - entry["last_used"] > self.idle_ttl]:
+            self._release(key, closing)
+            self.expirations += 1
+
+    def _evict(self, closing: List) -> None:
+        while len(self._entries) > self.max_entries:
+            self._release(next(iter(self._entries)), closing)
+            self.evictions += 1
+
+    def _release(self, key: str, closing: List) -> None:
+        """移出缓存；没有在使用的规划器加入 closing，由调用方在释放锁之后关闭"""
+        entry = self._entries.pop(key)
+        entry["evicted"] = True
+        if entry["in_use"] == 0:
+            closing.append(entry["planner"])
+
+    @staticmethod
+    def _close(planners: List) -> None:
+        for planner in planners:
+            planner.close()
+
+    def clear(self) -> None:
+        closing: List[MultiAgentTravelPlanner] = []
+        with self._lock:
+            for key in list(self._entries):
+                self._release(key, closing)
+        self._close(closing)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "in_use": sum(1 for entry in self._entries.values() if entry["in_use"]),
+                "idle_ttl": self.idle_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+planner_cache = PlannerCache()
 
 def get_agent_response(user_message: str, email: str, conv_id: str) -> str:
     """处理用户消息并返回AI响应（入口函数）"""
-    cache_key = f"{email}-{conv_id}"
-    if cache_key not in planner_cache:
-        planner_cache[cache_key] = MultiAgentTravelPlanner(email, conv_id)
-    
-    planner = planner_cache[cache_key]
-    return planner.coordinate_agents(user_message)
\ No newline at end of file
+    with planner_cache.use(email, conv_id) as planner:
+        return planner.coordinate_agents(user_message)
\ No newline at end of file
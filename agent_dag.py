@@ -0,0 +1,243 @@
+"""
+智能体依赖图执行模块
+以声明式的依赖图（节点 = 智能体调用，边 = 数据依赖）描述多智能体协作流程：依赖都已完成的
+节点在共享的常驻线程池中并发执行，每个节点可以单独设置超时，失败、超时或因线程池已满被拒绝的
+节点以占位文本作为结果，下游节点仍然继续（部分结果），每次运行记录各节点的耗时轨迹
+"""
+
+import concurrent.futures
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 共享线程池的大小（所有会话的智能体调用共用）
+AGENT_POOL_MAX_WORKERS = int(os.environ.get("AGENT_POOL_MAX_WORKERS", "8"))
+# 线程池已满时，就绪节点等待空闲线程的最长时间（秒），超过后该节点被拒绝
+AGENT_POOL_QUEUE_TIMEOUT = float(os.environ.get("AGENT_POOL_QUEUE_TIMEOUT", "30"))
+# 等待空闲线程或节点开始执行时的轮询间隔（秒）
+_POLL_INTERVAL = 0.05
+
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+STATUS_REJECTED = "rejected"
+
+
+@dataclass(frozen=True)
+class DagNode:
+    """
+    依赖图中的一个节点
+
+    run 接收运行输入和所有上游节点的结果（按节点名称），返回该节点的结果文本。
+    timeout 为 None 表示不限时，从节点真正开始执行时计时；失败、超时或被拒绝时结果为
+    error_text / timeout_text / rejected_text 格式化后的占位文本。
+    """
+    name: str
+    run: Callable[[Dict[str, Any]], str]
+    depends_on: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+    error_text: str = "{name} 执行出错: {error}"
+    timeout_text: str = "{name} 执行超时（{timeout:g} 秒）"
+    rejected_text: str = "{name} 未执行：智能体线程池已满"
+
+
+@dataclass
+class DagRun:
+    """一次运行的结果：各节点的结果文本和耗时轨迹"""
+    results: Dict[str, str] = field(default_factory=dict)
+    trace: List[Dict[str, Any]] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        """所有节点都成功完成"""
+        return all(entry["status"] == STATUS_OK for entry in self.trace)
+
+
+class AgentPool:
+    """
+    带占用计数的线程池
+
+    每个任务从提交起占用一个名额，直到其函数真正返回才释放：超时后结果不再使用的任务仍在
+    后台运行并占用线程，名额也随之保持占用，因此提交不会排在这些线程之后无限等待，
+    线程池已满时 try_submit 直接返回 None，由调用方决定等待或拒绝。
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "agent-dag"):
+        self.max_workers = max(max_workers, 1)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                               thread_name_prefix=thread_name_prefix)
+        self._slots = threading.Semaphore(self.max_workers)
+
+    def try_submit(self, fn: Callable[..., Any], *args: Any) -> Optional[concurrent.futures.Future]:
+        """有空闲名额时提交任务并返回 future，否则返回 None"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            return self._executor.submit(self._call, fn, args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _call(self, fn: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+        try:
+            return fn(*args)
+        finally:
+            self._slots.release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+_pool: Optional[AgentPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_agent_pool() -> AgentPool:
+    """获取进程内共享的智能体线程池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = AgentPool(AGENT_POOL_MAX_WORKERS)
+        return _pool
+
+
+def topological_order(nodes: Sequence[DagNode]) -> List[str]:
+    """
+    按依赖关系排序节点名称
+
+    Raises:
+        ValueError: 节点重名、依赖了不存在的节点或存在循环依赖
+    """
+    names = [node.name for node in nodes]
+    if len(set(names)) != len(names):
+        raise ValueError("依赖图中存在重名节点")
+    depends = {node.name: node.depends_on for node in nodes}
+    for name, upstream in depends.items():
+        unknown = [dep for dep in upstream if dep not in depends]
+        if unknown:
+            raise ValueError(f"节点 {name} 依赖了不存在的节点: {', '.join(unknown)}")
+
+    order, done = [], set()
+    while len(order) < len(names):
+        ready = [name for name in names if name not in done and all(dep in done for dep in depends[name])]
+        if not ready:
+            raise ValueError("依赖图中存在循环依赖: " + ", ".join(name for name in names if name not in done))
+        order.extend(ready)
+        done.update(ready)
+    return order
+
+
+class DagExecutor:
+    """
+    依赖图执行器
+
+    节点定义在创建时校验一次，run() 可以被多个线程同时调用。超时的节点无法强行中止，
+    其线程会在后台运行完毕并一直占用线程池名额，但结果不再使用；线程池在 queue_timeout
+    秒内都没有空闲名额时，就绪节点被拒绝而不是排队等待。
+    """
+
+    def __init__(self, nodes: Sequence[DagNode], pool: Optional[AgentPool] = None,
+                 queue_timeout: float = AGENT_POOL_QUEUE_TIMEOUT):
+        self.order = topological_order(nodes)
+        self.nodes = {node.name: node for node in nodes}
+        self._pool = pool
+        self.queue_timeout = queue_timeout
+
+    def run(self, inputs: Optional[Dict[str, Any]] = None) -> DagRun:
+        """
+        执行依赖图
+
+        Args:
+            inputs: 所有节点共用的运行输入，与上游结果合并后传给节点（上游结果优先）
+
+        Returns:
+            DagRun: 各节点结果（失败、超时或被拒绝的节点为占位文本）和按结束顺序排列的耗时轨迹，
+            轨迹中 ready/started/finished 为相对本次运行开始的秒数（被拒绝的节点 started 为 None），
+            seconds 为节点实际执行的秒数
+        """
+        pool = self._pool or get_agent_pool()
+        inputs = dict(inputs or {})
+        result = DagRun()
+        started_at = time.monotonic()
+        # 节点名称 -> 依赖全部完成（可以提交）的时间
+        ready_at: Dict[str, float] = {}
+        # 节点名称 -> 工作线程真正开始执行该节点的时间，由工作线程写入
+        node_started: Dict[str, float] = {}
+        running: Dict[concurrent.futures.Future, str] = {}
+        pending = list(self.order)
+
+        def call(node: DagNode, node_inputs: Dict[str, Any]) -> str:
+            node_started[node.name] = time.monotonic()
+            return node.run(node_inputs)
+
+        def finish(name: str, status: str, text: str, error: Optional[str] = None):
+            result.results[name] = text
+            now = time.monotonic()
+            started = node_started.get(name)
+            entry = {
+                "node": name,
+                "status": status,
+                "ready": round(ready_at[name] - started_at, 3),
+                "started": round(started - started_at, 3) if started is not None else None,
+                "finished": round(now - started_at, 3),
+                "seconds": round(now - started, 3) if started is not None else 0.0,
+            }
+            if error:
+                entry["error"] = error
+            result.trace.append(entry)
+
+        while pending or running:
+            now = time.monotonic()
+            for name in [name for name in pending if all(dep in result.results for dep in self.nodes[name].depends_on)]:
+                node = self.nodes[name]
+                ready_at.setdefault(name, now)
+                node_inputs = {**inputs, **{dep: result.results[dep] for dep in node.depends_on}}
+                future = pool.try_submit(call, node, node_inputs)
+                if future is not None:
+                    running[future] = name
+                    pending.remove(name)
+                elif now - ready_at[name] >= self.queue_timeout:
+                    pending.remove(name)
+                    finish(name, STATUS_REJECTED, node.rejected_text.format(name=name))
+
+            # 超时从节点真正开始执行时计算；还有节点在等待空闲名额或尚未开始时定期检查
+            now = time.monotonic()
+            deadlines, polling = [], False
+            for name in running.values():
+                node = self.nodes[name]
+                if name not in node_started:
+                    polling = True
+                elif node.timeout:
+                    deadlines.append(node_started[name] + node.timeout)
+            if any(name in ready_at for name in pending):
+                polling = True
+            if polling:
+                deadlines.append(now + _POLL_INTERVAL)
+            wait_timeout = max(min(deadlines) - now, 0) if deadlines else None
+            if not running:
+                time.sleep(wait_timeout or 0)
+                continue
+            done, _ = concurrent.futures.wait(running, timeout=wait_timeout,
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                name = running.pop(future)
+                node = self.nodes[name]
+                try:
+                    finish(name, STATUS_OK, future.result())
+                except Exception as e:
+                    finish(name, STATUS_ERROR, node.error_text.format(name=name, error=e), str(e))
+
+            now = time.monotonic()
+            for future, name in list(running.items()):
+                node = self.nodes[name]
+                started = node_started.get(name)
+                if node.timeout and started is not None and now >= started + node.timeout:
+                    running.pop(future)
+                    finish(name, STATUS_TIMEOUT, node.timeout_text.format(name=name, timeout=node.timeout))
+
+        result.elapsed_seconds = round(time.monotonic() - started_at, 3)
+        return result
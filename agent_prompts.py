@@ -17,6 +17,10 @@ INFORMATION_COLLECTOR_PROMPT = """你是旅行信息收集专家，负责搜索
 8. 实用信息：签证、货币、紧急联系、当地习俗
 9. 多媒体内容：搜索相关图片和视频，提升用户体验
 
+工具使用：
+- 相互独立的搜索（如航班、酒店、地图、天气）请通过 search_batch 工具一次性并行发起，减少来回调用次数
+- 需要依赖上一步结果的搜索（如用 property_token 查询酒店详情）再单独调用
+
 输出格式：按以下JSON结构组织信息
 {
     "destination_info": {"overview": "", "best_time": "", "culture": "", "safety": "", "visa_requirements": ""},
@@ -48,6 +52,15 @@ INFORMATION_COLLECTOR_PROMPT = """你是旅行信息收集专家，负责搜索
 
 """
 
+# 分类信息收集子智能体系统提示词（并行收集模式下每个类别一个子智能体）
+CATEGORY_COLLECTOR_PROMPT = """你是旅行信息收集专家团队中的一员，只负责收集指定类别的信息。
+
+工作要求：
+1. 只搜索与负责类别相关的信息，不要收集其他类别的内容
+2. 搜索次数尽量少，相互独立的搜索通过 search_batch 工具一次性并行发起
+3. 信息要具体：包含价格、时间、地址、评分、联系方式等实用细节
+4. 只输出一个 JSON 对象，结构与任务中给出的格式一致，不要输出额外说明"""
+
 # 行程规划智能体系统提示词
 ITINERARY_PLANNER_PROMPT = """你是旅行行程规划专家，基于收集的信息制定详细、实用的旅行方案。
 
@@ -0,0 +1,102 @@
+"""
+智能体流式输出模块
+将 agno Agent / Team 的流式运行结果统一转换为事件字典，供各前端逐字渲染：
+  {"type": "content", "delta": "..."}                           新生成的文本片段
+  {"type": "tool_call", "status": "started"/"completed", "tool": "..."}  工具调用进度
+  {"type": "done", "content": "...", "first_token_seconds": 1.23}      完整结果
+以及各 Streamlit 界面共用的事件渲染函数
+"""
+
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+# agno 不同版本中 Agent 和 Team 使用的事件名称
+CONTENT_EVENTS = {"RunResponse", "TeamRunResponse", "RunResponseContent", "TeamRunResponseContent"}
+TOOL_STARTED_EVENTS = {"ToolCallStarted", "TeamToolCallStarted"}
+TOOL_COMPLETED_EVENTS = {"ToolCallCompleted", "TeamToolCallCompleted"}
+
+
+def _event_name(chunk: Any) -> Optional[str]:
+    event = getattr(chunk, "event", None)
+    return getattr(event, "value", event)
+
+
+def _tool_name(chunk: Any) -> str:
+    tools = getattr(chunk, "tools", None) or []
+    if tools and isinstance(tools[-1], dict):
+        return tools[-1].get("tool_name") or tools[-1].get("name") or ""
+    return str(getattr(chunk, "content", "") or "")
+
+
+async def stream_agent_run(runner, message: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    以流式方式运行 Agent 或 Team，逐个产出事件
+
+    Args:
+        runner: agno 的 Agent 或 Team 实例
+        message: 发送给智能体的消息
+
+    Yields:
+        dict: content / tool_call 事件，最后是包含完整内容和首字耗时的 done 事件
+    """
+    started = time.monotonic()
+    first_token_seconds = None
+    parts = []
+
+    response_stream = await runner.arun(message, stream=True, stream_intermediate_steps=True)
+    async for chunk in response_stream:
+        event = _event_name(chunk)
+        if event in TOOL_STARTED_EVENTS:
+            yield {"type": "tool_call", "status": "started", "tool": _tool_name(chunk)}
+        elif event in TOOL_COMPLETED_EVENTS:
+            yield {"type": "tool_call", "status": "completed", "tool": _tool_name(chunk)}
+        elif event is None or event in CONTENT_EVENTS:
+            delta = getattr(chunk, "content", None)
+            if isinstance(delta, str) and delta:
+                if first_token_seconds is None:
+                    first_token_seconds = time.monotonic() - started
+                parts.append(delta)
+                yield {"type": "content", "delta": delta}
+
+    yield {
+        "type": "done",
+        "content": "".join(parts),
+        "first_token_seconds": round(first_token_seconds, 3) if first_token_seconds is not None else None,
+    }
+
+
+def create_stream_renderer():
+    """创建 Streamlit 流式输出渲染器，逐字显示生成的内容和工具调用状态"""
+    # 只有界面使用，非界面代码导入本模块时不加载 streamlit
+    import streamlit as st
+
+    tool_placeholder = st.empty()
+    content_placeholder = st.empty()
+    state = {"text": "", "rendered_at": 0.0}
+
+    def render(event: Dict[str, Any]) -> None:
+        if event["type"] == "tool_call":
+            icon = "🔍" if event["status"] == "started" else "✅"
+            tool_placeholder.caption(f"{icon} 工具调用：{event['tool']}")
+        elif event["type"] == "content":
+            state["text"] += event["delta"]
+            # 限制刷新频率，避免长文本每个片段都重新渲染
+            now = time.monotonic()
+            if now - state["rendered_at"] >= 0.1:
+                content_placeholder.markdown(state["text"] + "▌")
+                state["rendered_at"] = now
+        elif event["type"] == "done":
+            tool_placeholder.empty()
+            content_placeholder.markdown(event["content"])
+
+    return render
+
+
+async def consume_stream(events: AsyncIterator[Dict[str, Any]], render) -> Optional[Dict[str, Any]]:
+    """逐个渲染流式事件，返回最终的 done 事件"""
+    result = None
+    async for event in events:
+        render(event)
+        if event["type"] == "done":
+            result = event
+    return result
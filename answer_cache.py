@@ -0,0 +1,205 @@
+"""
+追问回答缓存模块
+按（旅行计划指纹, 规范化问题）缓存追问的回答，并在本地维护字符 n-gram 的相似度索引，
+同一份计划下换了说法的重复问题（包括每份计划都会被问到的快捷问题）直接复用已有回答
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from follow_up_router import route_follow_up
+
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+ANSWER_CACHE_TTL = int(os.environ.get("ANSWER_CACHE_TTL", str(2 * 60 * 60)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "500"))
+# 近似问题复用回答所需的最低相似度（字符 1-gram + 2-gram 的余弦相似度）
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0.6"))
+
+# 涉及具体日期、数量的词，近似问题中这些词必须完全一致（"第二天"和"第三天"不能互相复用）
+_NUMBER_PATTERN = re.compile(r"第[一二两三四五六七八九十\d]+[天日晚]?|[一二两三四五六七八九十\d]+[天日晚号个家人]|\d+")
+
+
+def normalize_question(question: str) -> str:
+    """统一全角半角和大小写，去掉空白和标点"""
+    text = unicodedata.normalize("NFKC", question or "").casefold()
+    return re.sub(r"[\W_]+", "", text)
+
+
+def question_grams(normalized: str) -> Counter:
+    """字符 1-gram 和 2-gram 计数，中文问题不需要分词"""
+    grams = Counter(normalized)
+    grams.update(normalized[index:index + 2] for index in range(len(normalized) - 1))
+    return grams
+
+
+def cosine_similarity(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def question_signature(question: str) -> Tuple[Any, ...]:
+    """近似问题必须一致的部分：路由意图、涉及的类别和数字/日期词"""
+    route = route_follow_up(question)
+    numbers = tuple(sorted(set(_NUMBER_PATTERN.findall(question))))
+    return route.intent, route.sections, numbers
+
+
+def is_time_sensitive(question: str) -> bool:
+    """询问当前状态（今天天气、现在价格、是否营业等）的问题不缓存"""
+    return "freshness" in route_follow_up(question).matched_rules
+
+
+def plan_fingerprint(travel_context: Any) -> str:
+    """旅行上下文（计划、收集信息、基本信息）的指纹，上下文变化后旧回答不再复用"""
+    payload = json.dumps(travel_context, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    进程内的追问回答缓存
+
+    完全相同（规范化后）的问题直接命中；否则在同一份计划的已缓存问题中，通过 n-gram
+    倒排索引找出候选，取签名一致且相似度不低于阈值的最相近问题。条目按 LRU 淘汰。
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl: int = ANSWER_CACHE_TTL,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        # 计划指纹 -> n-gram -> 规范化问题集合
+        self._index: Dict[str, Dict[str, set]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, plan_key: str, question: str) -> Optional[Dict[str, Any]]:
+        """
+        查找可复用的回答
+
+        Returns:
+            dict: answer、matched_question、similarity；没有可复用的回答时返回 None
+        """
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((plan_key, normalized))
+            similarity = 1.0
+            if entry is None:
+                entry, similarity = self._find_similar(plan_key, question, normalized)
+            if entry is None or entry["expires_at"] <= now:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end((plan_key, entry["normalized"]))
+            if similarity < 1.0:
+                self.similar_hits += 1
+            else:
+                self.hits += 1
+            return {"answer": entry["answer"], "matched_question": entry["question"],
+                    "similarity": round(similarity, 3)}
+
+    def _find_similar(self, plan_key: str, question: str, normalized: str):
+        index = self._index.get(plan_key)
+        if not index:
+            return None, 0.0
+        grams = question_grams(normalized)
+        candidates = set()
+        for gram in grams:
+            candidates |= index.get(gram, set())
+
+        signature = question_signature(question)
+        best, best_score = None, 0.0
+        for candidate in candidates:
+            entry = self._entries[(plan_key, candidate)]
+            if entry["signature"] != signature or entry["expires_at"] <= time.time():
+                continue
+            score = cosine_similarity(grams, entry["grams"])
+            if score > best_score:
+                best, best_score = entry, score
+        if best_score < self.similarity:
+            return None, 0.0
+        return best, best_score
+
+    def set(self, plan_key: str, question: str, answer: str) -> None:
+        """缓存回答；时效性问题和空回答不缓存"""
+        if not answer or self.max_entries <= 0 or is_time_sensitive(question):
+            return
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        entry = {
+            "question": question,
+            "normalized": normalized,
+            "answer": answer,
+            "grams": question_grams(normalized),
+            "signature": question_signature(question),
+            "expires_at": time.time() + self.ttl,
+        }
+        with self._lock:
+            self._remove((plan_key, normalized))
+            self._entries[(plan_key, normalized)] = entry
+            index = self._index.setdefault(plan_key, {})
+            for gram in entry["grams"]:
+                index.setdefault(gram, set()).add(normalized)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        plan_key, normalized = key
+        index = self._index.get(plan_key, {})
+        for gram in entry["grams"]:
+            questions = index.get(gram)
+            if questions is not None:
+                questions.discard(normalized)
+                if not questions:
+                    del index[gram]
+        if not index:
+            self._index.pop(plan_key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.similar_hits) / lookups, 3) if lookups else 0.0,
+        }
+
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """获取进程内共享的回答缓存，未启用时返回 None"""
+    global _answer_cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache()
+        return _answer_cache
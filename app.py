@@ -8,11 +8,13 @@ from dotenv import load_dotenv
 
 from agno.agent import Agent
 from agno.team.team import Team
-from agno.tools.mcp import MultiMCPTools
 from agno.models.openai import OpenAIChat
 from agno.models.google import Gemini
 import streamlit as st
 
+from mcp_connection import create_search_mcp_tools
+from agent_streaming import consume_stream, create_stream_renderer, stream_agent_run
+
 # 加载环境变量
 load_dotenv()
 
@@ -213,7 +215,15 @@ def create_progress_tracker():
     return update_progress
 
 async def run_agents_team(message: str):
-    """使用双智能体团队运行旅行规划任务，实现功能解耦和并行处理。"""
+    """使用双智能体团队运行旅行规划任务，返回完整的旅行计划。"""
+    content = ""
+    async for event in stream_agents_team(message):
+        if event['type'] == 'done':
+            content = event['content']
+    return content
+
+async def stream_agents_team(message: str):
+    """使用双智能体团队以流式方式运行旅行规划任务，实现功能解耦和并行处理。"""
 
     # 从会话状态获取 API 密钥
     searchapi_key = st.session_state.get('searchapi_key')
@@ -259,10 +269,7 @@ async def run_agents_team(message: str):
         research_model = Gemini(id="gemini-2.0-flash-exp", api_key=gemini_key)
         planning_model = Gemini(id="gemini-2.0-flash-exp", api_key=gemini_key)
 
-    async with MultiMCPTools(
-        ["python /mnt/public/code/zzy/wzh/doremi/searchAPI-mcp/mcp_server.py"],
-        env=env,
-    ) as mcp_tools:
+    async with create_search_mcp_tools(env) as mcp_tools:
         
         # 创建双智能体团队 - 功能解耦设计
         
@@ -392,16 +399,9 @@ async def run_agents_team(message: str):
             """
         )
         
-        # 运行团队协作
-        result = await travel_team.arun(message)
-        
-        # 获取响应内容
-        if hasattr(result, 'content'):
-            return result.content
-        elif hasattr(result, 'messages') and result.messages:
-            return result.messages[-1].content if hasattr(result.messages[-1], 'content') else str(result.messages[-1])
-        else:
-            return str(result)  
+        # 以流式方式运行团队协作
+        async for event in stream_agent_run(travel_team, message):
+            yield event
     
 # -------------------- Streamlit 应用 --------------------
     
@@ -661,8 +661,13 @@ if st.button("🚀 启动双智能体规划", type="primary", disabled=not all_k
                 # 更新进度
                 progress_tracker(2, 4, "信息收集专家正在搜索数据...")
                 
-                # 运行智能体团队
-                response = asyncio.run(run_agents_team(message))
+                # 流式运行智能体团队，生成的内容实时显示，完成后替换为下方的正式结果
+                live_area = st.empty()
+                with live_area.container():
+                    render = create_stream_renderer()
+                    result = asyncio.run(consume_stream(stream_agents_team(message), render))
+                live_area.empty()
+                response = result['content']
                 
                 # 更新进度
                 progress_tracker(3, 4, "行程规划专家正在整合方案...")
@@ -675,6 +680,8 @@ if st.button("🚀 启动双智能体规划", type="primary", disabled=not all_k
                 
                 # 添加团队协作说明
                 st.info("🤝 **团队协作成果**: 信息收集专家负责数据搜索，行程规划专家负责方案制定")
+                if result['first_token_seconds'] is not None:
+                    st.caption(f"⏱️ 首字响应时间：{result['first_token_seconds']} 秒")
                 
                 # 显示简化版本
                 if len(response) > 2000:
@@ -6,11 +6,12 @@ import io
 import base64
 
 from agno.agent import Agent
-from agno.tools.mcp import MultiMCPTools
 from agno.models.openai import OpenAIChat
 from agno.models.google import Gemini
 import streamlit as st
 
+from mcp_connection import create_search_mcp_tools
+
 # 配置页面 - 必须是第一个 Streamlit 命令
 st.set_page_config(
     page_title="AI 旅行规划助手",
@@ -235,10 +236,7 @@ async def run_travel_agent(message: str):
         # 使用Gemini模型
         travel_model = Gemini(id="gemini-2.0-flash-exp", api_key=gemini_key)
 
-    async with MultiMCPTools(
-        ["python /mnt/public/code/zzy/wzh/doremi/searchAPI-mcp/mcp_server.py"],
-        env=env,
-    ) as mcp_tools:
+    async with create_search_mcp_tools(env) as mcp_tools:
         
         # 创建单个全能旅行规划智能体
         travel_agent = Agent(
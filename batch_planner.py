@@ -0,0 +1,239 @@
+"""
+批量旅行规划模块
+一次处理多条旅行规划请求（例如团队出行、旅行社批量报价）：所有请求共享同一个已打开的
+MultiAgentTravelPlanner（搜索工具会话和模型客户端）以及规划结果缓存，并发规划数和
+信息收集的搜索并发数都有上限，每条结果完成后立即追加写入 JSONL 文件。
+
+命令行用法（输入文件每行一个 JSON 请求）：
+
+    python batch_planner.py requests.jsonl -o results.jsonl --concurrency 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from multi_agent_travel import MultiAgentTravelPlanner, build_travel_message
+from plan_cache import trip_fingerprint
+
+# 同时进行的规划数量（每个规划的行程生成阶段各占用一次模型调用）
+BATCH_PLAN_CONCURRENCY = int(os.environ.get("BATCH_PLAN_CONCURRENCY", "3"))
+# 整个批次同时运行的信息收集智能体数量（共享 SearchAPI 的速率和配额）
+BATCH_SEARCH_CONCURRENCY = int(os.environ.get("BATCH_SEARCH_CONCURRENCY", "6"))
+
+# 结果中写入 JSONL 的字段（travel_info 可由 collected_info 重新解析得到）
+RESULT_FIELDS = ("success", "error", "cached", "detailed_itinerary", "collected_info", "validation_issues")
+
+
+def build_request_message(request: Dict[str, Any]) -> str:
+    """
+    将一条批量请求转换为规划消息
+
+    请求可以直接提供 message，也可以提供与界面表单相同的字段：source、destination、
+    travel_dates（[开始日期, 结束日期]，或分别提供 start_date、end_date）、budget，
+    以及可选的 preferences、accommodation_type、transportation_mode、dietary_restrictions。
+
+    Raises:
+        ValueError: 请求缺少必要字段
+    """
+    if request.get("message"):
+        return request["message"]
+
+    missing = [key for key in ("source", "destination", "budget") if request.get(key) in (None, "")]
+    travel_dates = request.get("travel_dates") or [request.get("start_date"), request.get("end_date")]
+    if len(travel_dates) != 2 or not all(travel_dates):
+        missing.append("travel_dates")
+    if missing:
+        raise ValueError(f"请求缺少字段: {', '.join(missing)}")
+
+    def as_list(value):
+        if isinstance(value, str):
+            return [item.strip() for item in value.replace("，", ",").split(",") if item.strip()]
+        return list(value or [])
+
+    return build_travel_message(
+        request["source"],
+        request["destination"],
+        travel_dates,
+        request["budget"],
+        as_list(request.get("preferences")),
+        request.get("accommodation_type") or "任何",
+        as_list(request.get("transportation_mode")),
+        as_list(request.get("dietary_restrictions")) or ["无"],
+    )
+
+
+def _dedup_key(message: str) -> str:
+    """批次内相同行程的请求只规划一次（指纹与规划结果缓存一致）"""
+    fingerprint = trip_fingerprint(message)
+    return json.dumps(fingerprint, sort_keys=True, ensure_ascii=False) if fingerprint else message
+
+
+async def plan_batch(requests: Iterable[Dict[str, Any]], output_path: Optional[str] = None,
+                     model_provider="OpenAI", openai_key=None, gemini_key=None, searchapi_key=None,
+                     collection_mode=None, concurrency: int = BATCH_PLAN_CONCURRENCY,
+                     search_concurrency: int = BATCH_SEARCH_CONCURRENCY, use_cache: bool = True,
+                     on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """
+    批量完成旅行规划
+
+    Args:
+        requests: 请求字典序列，格式见 build_request_message，可带 id 字段（默认使用序号）；
+            load_requests 读取的请求带有 _index（在输入文件中的序号），结果的 index 使用该序号
+        output_path: 结果 JSONL 文件路径，每条结果完成后立即追加写入；None 表示不写文件
+        model_provider: 模型提供商
+        openai_key: OpenAI API密钥
+        gemini_key: Gemini API密钥
+        searchapi_key: SearchAPI密钥
+        collection_mode: 信息收集模式，默认读取 TRAVEL_COLLECTION_MODE
+        concurrency: 同时进行的规划数量
+        search_concurrency: 整个批次同时运行的信息收集智能体数量
+        use_cache: 是否使用规划结果缓存
+        on_result: 每条结果完成后的回调
+
+    Returns:
+        list: 按输入顺序排列的结果，每条包含 id、index、elapsed_seconds 和 RESULT_FIELDS 中的字段
+    """
+    requests = list(requests)
+    planner = MultiAgentTravelPlanner(
+        model_provider=model_provider,
+        openai_key=openai_key,
+        gemini_key=gemini_key,
+        searchapi_key=searchapi_key,
+        collection_mode=collection_mode
+    )
+    plan_slots = asyncio.Semaphore(max(concurrency, 1))
+    in_flight: Dict[str, asyncio.Task] = {}
+    output = open(output_path, "a", encoding="utf-8") if output_path else None
+
+    async def plan_once(message: str) -> Dict[str, Any]:
+        async with plan_slots:
+            return await planner.plan_travel_with_multi_agents(message, use_cache=use_cache)
+
+    async def run(index: int, request: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.monotonic()
+        # 断点续跑时请求经过过滤，序号以输入文件中的位置为准
+        index = request.get("_index", index)
+        try:
+            if "_invalid" in request:
+                raise ValueError(request["_invalid"])
+            message = build_request_message(request)
+        except (ValueError, TypeError, AttributeError) as e:
+            result = {'error': str(e), 'success': False}
+        else:
+            key = _dedup_key(message)
+            if key not in in_flight:
+                in_flight[key] = asyncio.ensure_future(plan_once(message))
+            result = await asyncio.shield(in_flight[key])
+
+        record = {
+            "id": request.get("id", index),
+            "index": index,
+            **{field: result.get(field) for field in RESULT_FIELDS if field in result},
+            "elapsed_seconds": round(time.monotonic() - started, 2),
+        }
+        if output is not None:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+        if on_result:
+            on_result(record)
+        return record
+
+    try:
+        async with planner:
+            planner.collection_semaphore = asyncio.Semaphore(max(search_concurrency, 1))
+            return list(await asyncio.gather(*(run(index, request) for index, request in enumerate(requests))))
+    finally:
+        if output is not None:
+            output.close()
+
+
+def load_requests(path: str) -> List[Dict[str, Any]]:
+    """
+    读取 JSONL 请求文件，跳过空行；无法解析的行作为失败请求保留在结果中
+
+    每条请求记录其在文件中的序号（_index），没有 id 的请求以该序号作为 id，
+    断点续跑时编号保持不变
+    """
+    requests = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                request = {"id": f"line-{line_number}", "_invalid": f"第 {line_number} 行不是有效的 JSON: {e}"}
+            if not isinstance(request, dict):
+                request = {"id": f"line-{line_number}", "_invalid": f"第 {line_number} 行不是 JSON 对象"}
+            request["_index"] = len(requests)
+            request.setdefault("id", request["_index"])
+            requests.append(request)
+    return requests
+
+
+def load_completed_ids(path: str) -> set:
+    """读取已有结果文件中成功完成的请求 id，用于断点续跑"""
+    if not os.path.exists(path):
+        return set()
+    completed = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and record.get("success"):
+                completed.add(str(record.get("id")))
+    return completed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="批量旅行规划：读取 JSONL 请求，结果逐条写入 JSONL")
+    parser.add_argument("input", help="请求文件，每行一个 JSON 对象")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="结果文件（追加写入）")
+    parser.add_argument("--provider", default="OpenAI", choices=("OpenAI", "Gemini"), help="模型提供商")
+    parser.add_argument("--mode", choices=("single", "parallel", "pipeline"), help="信息收集模式")
+    parser.add_argument("--concurrency", type=int, default=BATCH_PLAN_CONCURRENCY, help="同时进行的规划数量")
+    parser.add_argument("--search-concurrency", type=int, default=BATCH_SEARCH_CONCURRENCY,
+                        help="同时运行的信息收集智能体数量")
+    parser.add_argument("--no-cache", action="store_true", help="不使用规划结果缓存")
+    parser.add_argument("--resume", action="store_true", help="跳过结果文件中已成功完成的请求")
+    args = parser.parse_args(argv)
+
+    requests = load_requests(args.input)
+    if args.resume:
+        completed = load_completed_ids(args.output)
+        requests = [request for request in requests if str(request["id"]) not in completed]
+    total = len(requests)
+    finished = 0
+
+    def report(record):
+        nonlocal finished
+        finished += 1
+        status = "缓存" if record.get("cached") else ("成功" if record.get("success") else f"失败: {record.get('error')}")
+        print(f"[{finished}/{total}] {record['id']} {status}（{record['elapsed_seconds']}s）", file=sys.stderr)
+
+    started = time.monotonic()
+    records = asyncio.run(plan_batch(
+        requests,
+        output_path=args.output,
+        model_provider=args.provider,
+        collection_mode=args.mode,
+        concurrency=args.concurrency,
+        search_concurrency=args.search_concurrency,
+        use_cache=not args.no_cache,
+        on_result=report,
+    ))
+    succeeded = sum(1 for record in records if record.get("success"))
+    print(f"完成 {succeeded}/{total} 条规划，用时 {time.monotonic() - started:.1f}s，结果已写入 {args.output}",
+          file=sys.stderr)
+    return 0 if succeeded == total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+上下文压缩模块
+在把收集到的旅行信息、旅行计划和追问上下文放入提示词之前，按 token 预算进行
+去重、截断和摘要，保证规划和追问的提示词长度有上限，不随信息收集的冗长程度增长
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Union
+
+from token_counter import count_tokens, get_encoding
+from travel_info_parser import parse_json_output
+
+# 规划提示词中收集信息部分的 token 预算
+PLANNING_CONTEXT_TOKEN_BUDGET = int(os.environ.get("PLANNING_CONTEXT_TOKEN_BUDGET", "6000"))
+# 追问提示词中旅行计划上下文的 token 预算
+FOLLOW_UP_CONTEXT_TOKEN_BUDGET = int(os.environ.get("FOLLOW_UP_CONTEXT_TOKEN_BUDGET", "3000"))
+
+# 超出预算时各类别的保留优先级，越靠后越先被裁剪
+CATEGORY_PRIORITY = (
+    "destination_info",
+    "flights_info",
+    "hotels_info",
+    "attractions_info",
+    "restaurants_info",
+    "transportation_info",
+    "weather_info",
+    "local_tips",
+    "media_info",
+)
+
+# 单个字符串字段的最大长度（字符），超出部分摘取前几句
+MAX_STRING_CHARS = 400
+# 列表逐步裁剪时每个列表保留的条目数
+LIST_LIMITS = (8, 5, 3, 2, 1)
+
+
+def truncate_to_tokens(text: str, budget: int, model: Optional[str] = None) -> str:
+    """把文本截断到 token 预算以内，截断时追加省略标记"""
+    if count_tokens(text, model) <= budget:
+        return text
+    marker = "\n…（内容过长已截断）"
+    budget = max(budget - count_tokens(marker, model), 0)
+
+    encoding = get_encoding(model)
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:budget]) + marker
+
+    # 估算模式下按字节比例截断，再逐步收缩到预算以内
+    cut = len(text) * budget // max(count_tokens(text, model), 1)
+    while cut > 0 and count_tokens(text[:cut], model) > budget:
+        cut = cut * 9 // 10
+    return text[:cut] + marker
+
+
+def summarize_text(text: str, max_chars: int = MAX_STRING_CHARS) -> str:
+    """抽取式摘要：保留开头的完整句子，总长度不超过 max_chars"""
+    text = re.sub(r"\s+", " ", text).strip()
+    if len(text) <= max_chars:
+        return text
+    sentences = re.split(r"(?<=[。！？.!?；;])\s*", text)
+    summary = ""
+    for sentence in sentences:
+        if len(summary) + len(sentence) > max_chars:
+            break
+        summary += sentence
+    return (summary or text[:max_chars]) + "…"
+
+
+def _dedupe_key(item: Any) -> str:
+    if isinstance(item, dict):
+        for field in ("place_id", "property_token", "name", "title"):
+            if item.get(field):
+                return f"{field}:{str(item[field]).strip().lower()}"
+        return json.dumps(item, sort_keys=True, ensure_ascii=False)
+    return str(item).strip().lower()
+
+
+def _clean(value: Any, list_limit: Optional[int]) -> Any:
+    """去掉空值、列表去重、长字符串摘要，list_limit 不为空时限制每个列表的条目数"""
+    if isinstance(value, dict):
+        cleaned = {key: _clean(item, list_limit) for key, item in value.items()}
+        return {key: item for key, item in cleaned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        seen = set()
+        items = []
+        for item in value:
+            key = _dedupe_key(item)
+            if key in seen:
+                continue
+            seen.add(key)
+            item = _clean(item, list_limit)
+            if item not in (None, "", [], {}):
+                items.append(item)
+        return items[:list_limit] if list_limit is not None else items
+    if isinstance(value, str):
+        return summarize_text(value)
+    return value
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def compress_collected_info(collected_info: Union[str, Dict[str, Any]],
+                            budget: int = PLANNING_CONTEXT_TOKEN_BUDGET,
+                            model: Optional[str] = None) -> str:
+    """
+    把收集到的旅行信息压缩到 token 预算以内
+
+    JSON 结构的信息依次进行：去空值、列表去重、长文本摘要、逐步减少每个列表的条目数、
+    按 CATEGORY_PRIORITY 从低到高移除类别；非 JSON 文本去掉重复段落后按 token 截断。
+
+    Args:
+        collected_info: 信息收集智能体输出的字符串或已解析的字典
+        budget: token 预算
+        model: 计数使用的模型名称
+
+    Returns:
+        str: 压缩后的文本（JSON 信息输出为紧凑 JSON）
+    """
+    data = collected_info
+    if isinstance(collected_info, str):
+        data, _ = parse_json_output(collected_info)
+    if not isinstance(data, dict):
+        return compress_text(str(collected_info), budget, model)
+
+    text = _dumps(data)
+    if count_tokens(text, model) <= budget:
+        return text
+
+    for list_limit in (None, *LIST_LIMITS):
+        compressed = _clean(data, list_limit)
+        text = _dumps(compressed)
+        if count_tokens(text, model) <= budget:
+            return text
+
+    # 仍超出预算时，从优先级最低的类别开始移除
+    ordered = sorted(compressed, key=lambda key: CATEGORY_PRIORITY.index(key) if key in CATEGORY_PRIORITY else -1)
+    while len(ordered) > 1:
+        compressed.pop(ordered.pop())
+        text = _dumps({**compressed, "omitted": "部分类别因长度限制已省略"})
+        if count_tokens(text, model) <= budget:
+            return text
+
+    return truncate_to_tokens(_dumps(compressed), budget, model)
+
+
+def compress_text(text: str, budget: int, model: Optional[str] = None) -> str:
+    """去掉重复段落，并按 ### 章节均匀分配预算截断，保留每个章节的开头部分"""
+    paragraphs: List[str] = []
+    seen = set()
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        key = re.sub(r"\s+", " ", paragraph).strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            paragraphs.append(paragraph.strip("\n"))
+    text = "\n\n".join(paragraphs)
+    if count_tokens(text, model) <= budget:
+        return text
+
+    sections = re.split(r"\n(?=#{1,3} )", text)
+    if len(sections) == 1:
+        return truncate_to_tokens(text, budget, model)
+
+    # 短章节原样保留，剩余预算在长章节之间平均分配
+    sizes = [count_tokens(section, model) for section in sections]
+    remaining, long_sections = budget, len(sections)
+    for size in sorted(sizes):
+        share = remaining // long_sections
+        if size > share:
+            break
+        remaining -= size
+        long_sections -= 1
+    share = remaining // max(long_sections, 1)
+    return "\n".join(
+        section if size <= share else truncate_to_tokens(section, share, model)
+        for section, size in zip(sections, sizes)
+    )
+
+
+def compress_travel_context(travel_context: Union[str, Dict[str, Any]],
+                            budget: int = FOLLOW_UP_CONTEXT_TOKEN_BUDGET,
+                            model: Optional[str] = None) -> str:
+    """
+    压缩追问使用的旅行上下文
+
+    出发地、日期、预算等短字段原样保留；旅行计划和收集信息等长字段共享剩余预算，
+    旅行计划按章节截断，收集信息按 compress_collected_info 压缩。
+    """
+    if not isinstance(travel_context, dict):
+        return compress_text(str(travel_context), budget, model)
+
+    short_fields, long_fields = {}, {}
+    for key, value in travel_context.items():
+        text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+        if count_tokens(text, model) <= 100:
+            short_fields[key] = value
+        else:
+            long_fields[key] = value
+
+    header = json.dumps(short_fields, ensure_ascii=False, default=str)
+    remaining = max(budget - count_tokens(header, model), 0)
+    parts = [header]
+    for index, (key, value) in enumerate(long_fields.items()):
+        share = remaining // (len(long_fields) - index)
+        if key == "collected_info" or isinstance(value, (dict, list)):
+            compressed = compress_collected_info(value if isinstance(value, (str, dict)) else _dumps(value), share, model)
+        else:
+            compressed = compress_text(str(value), share, model)
+        remaining -= count_tokens(compressed, model)
+        parts.append(f"【{key}】\n{compressed}")
+    return "\n\n".join(parts)
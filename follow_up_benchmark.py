@@ -0,0 +1,179 @@
+"""
+追问路由基准测试
+用带标注的问题集评估 follow_up_router 的准确率和路由耗时，并与原先的关键词判断对比。
+问题集分为两部分：调优集（编写和调整路由规则时参考过，其准确率偏乐观，只用于回归验证）
+和保留集（未参与规则调优，作为路由准确率报告）。调整规则时不要参考保留集的误判：
+
+    python follow_up_benchmark.py
+"""
+
+import statistics
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from follow_up_router import INTENT_ANSWER, INTENT_REPLAN, INTENT_SEARCH, route_follow_up
+
+# 调优集：(问题, 期望意图)，编写路由规则时参考过
+TUNING_QUESTIONS: List[Tuple[str, str]] = [
+    ("为什么第一天安排这么多景点？", INTENT_ANSWER),
+    ("这个计划总共要花多少钱？", INTENT_ANSWER),
+    ("行程里的酒店离地铁站远吗？", INTENT_ANSWER),
+    ("需要带什么衣服？", INTENT_ANSWER),
+    ("去日本需要办签证吗？", INTENT_ANSWER),
+    ("计划中的餐厅需要提前预订吗？", INTENT_ANSWER),
+    ("帮我总结一下整个行程", INTENT_ANSWER),
+    ("第二天去哪些地方？", INTENT_ANSWER),
+    ("从机场到酒店要多久？", INTENT_ANSWER),
+    ("方案里推荐的航班几点起飞？", INTENT_ANSWER),
+    ("当地有什么需要注意的习俗？", INTENT_ANSWER),
+    ("这个行程适合带小孩吗？", INTENT_ANSWER),
+    ("预算分解里交通费用是怎么算的？", INTENT_ANSWER),
+    ("晚上出门安全吗？", INTENT_ANSWER),
+    ("酒店的价格是多少？", INTENT_ANSWER),
+    ("博物馆门票多少钱？", INTENT_ANSWER),
+    ("要不要买交通卡？", INTENT_ANSWER),
+    ("最后一天几点退房？", INTENT_ANSWER),
+    ("当地用什么货币，汇率大概多少？", INTENT_ANSWER),
+    ("天气怎么样，会下雨吗？", INTENT_ANSWER),
+    ("帮我搜索一下附近的温泉", INTENT_SEARCH),
+    ("有没有更便宜的酒店？", INTENT_SEARCH),
+    ("现在的机票价格是多少？", INTENT_SEARCH),
+    ("推荐几家评价更好的餐厅", INTENT_SEARCH),
+    ("还有其他航班可以选吗？", INTENT_SEARCH),
+    ("酒店附近有什么好吃的？", INTENT_SEARCH),
+    ("比较一下这两家酒店", INTENT_SEARCH),
+    ("明天天气怎么样？", INTENT_SEARCH),
+    ("这家博物馆周一开门吗？", INTENT_SEARCH),
+    ("查一下去迪士尼的交通方式", INTENT_SEARCH),
+    ("有性价比更高的住宿吗？", INTENT_SEARCH),
+    ("给我看看目的地的照片", INTENT_SEARCH),
+    ("最新的签证政策是什么？", INTENT_SEARCH),
+    ("有没有直飞的航班？", INTENT_SEARCH),
+    ("帮我找一家高档的日料店", INTENT_SEARCH),
+    ("目的地最佳的观景台是哪个？", INTENT_SEARCH),
+    ("那家餐厅的口碑怎么样？", INTENT_SEARCH),
+    ("还有空房吗？", INTENT_SEARCH),
+    ("有没有别的景点推荐？", INTENT_SEARCH),
+    ("市中心有哪些豪华酒店？", INTENT_SEARCH),
+    ("把第三天改成购物日", INTENT_REPLAN),
+    ("第二天太赶了，能轻松一点吗？", INTENT_REPLAN),
+    ("最后一天下午想去海边，帮我调整一下", INTENT_REPLAN),
+    ("取消第四天的博物馆行程", INTENT_REPLAN),
+    ("重新安排第一天的日程", INTENT_REPLAN),
+    ("第五天加一个温泉体验", INTENT_REPLAN),
+    ("把第二天和第三天的安排换一下", INTENT_REPLAN),
+    ("如果第三天下雨，行程怎么调整？", INTENT_REPLAN),
+    ("删掉第一天晚上的夜市", INTENT_REPLAN),
+    ("能把行程延长一天吗？", INTENT_REPLAN),
+    ("第二天上午多留点时间休息", INTENT_REPLAN),
+    ("把迪士尼提前到第一天", INTENT_REPLAN),
+    ("第三天换成去京都一日游", INTENT_REPLAN),
+    ("修改第四天的午餐安排", INTENT_REPLAN),
+    ("第二天晚上换一家评价更好的餐厅", INTENT_REPLAN),
+]
+
+# 保留集：(问题, 期望意图)，未参与规则调优
+HELD_OUT_QUESTIONS: List[Tuple[str, str]] = [
+    ("酒店含早餐吗？", INTENT_ANSWER),
+    ("这趟旅行大概要走多少路？", INTENT_ANSWER),
+    ("行程里哪天最累？", INTENT_ANSWER),
+    ("需要准备多少现金？", INTENT_ANSWER),
+    ("机场离市区有多远？", INTENT_ANSWER),
+    ("计划里的景点要排队吗？", INTENT_ANSWER),
+    ("住的地方方便打车吗？", INTENT_ANSWER),
+    ("为什么选这家酒店？", INTENT_ANSWER),
+    ("行程里有适合拍照的地方吗？", INTENT_ANSWER),
+    ("有没有评分更高的民宿？", INTENT_SEARCH),
+    ("帮我查查当地的演唱会", INTENT_SEARCH),
+    ("附近有没有24小时便利店？", INTENT_SEARCH),
+    ("这周末有什么展览？", INTENT_SEARCH),
+    ("找一家能看夜景的餐厅", INTENT_SEARCH),
+    ("有没有更早的航班？", INTENT_SEARCH),
+    ("美术馆今天开门吗？", INTENT_SEARCH),
+    ("第二天的天气怎么样？", INTENT_SEARCH),
+    ("我想多待一天", INTENT_REPLAN),
+    ("第三天少安排一个景点", INTENT_REPLAN),
+    ("把住宿换成民宿", INTENT_REPLAN),
+    ("第一天晚上加一个夜游项目", INTENT_REPLAN),
+    ("行程缩短成三天", INTENT_REPLAN),
+    ("最后一天留出购物时间", INTENT_REPLAN),
+    ("去掉所有需要爬山的安排", INTENT_REPLAN),
+]
+
+QUESTION_SETS = {"tuning": TUNING_QUESTIONS, "held_out": HELD_OUT_QUESTIONS}
+SET_LABELS = {"tuning": "调优集", "held_out": "保留集"}
+
+# 原先 handle_follow_up_question 使用的关键词判断
+LEGACY_SEARCH_KEYWORDS = [
+    '搜索', '查找', '推荐更多', '其他选择', '最新', '价格', '评价',
+    '替代', '附近', '比较', '更好的', '便宜', '高档', '最佳'
+]
+
+# 基准测试假设的收集信息：所有类别都有内容
+ALL_SECTIONS = (
+    "destination_info", "flights_info", "hotels_info", "restaurants_info", "attractions_info",
+    "transportation_info", "weather_info", "local_tips", "media_info",
+)
+
+
+def legacy_route(question: str) -> str:
+    needs_search = any(keyword in question.lower() for keyword in LEGACY_SEARCH_KEYWORDS)
+    return INTENT_SEARCH if needs_search else INTENT_ANSWER
+
+
+def evaluate(router, questions: List[Tuple[str, str]], repeat: int = 200) -> Dict[str, object]:
+    """
+    评估路由函数
+
+    Args:
+        router: 接收问题、返回意图的函数
+        questions: 带标注的问题集
+        repeat: 每个问题重复计时的次数
+
+    Returns:
+        dict: 准确率、误判列表、混淆计数，以及单次路由耗时的均值和 p95（微秒）
+    """
+    latencies = []
+    mistakes = []
+    confusion = Counter()
+    for question, expected in questions:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            predicted = router(question)
+        latencies.append((time.perf_counter() - started) / repeat * 1e6)
+        confusion[(expected, predicted)] += 1
+        if predicted != expected:
+            mistakes.append((question, expected, predicted))
+
+    latencies.sort()
+    return {
+        "accuracy": round(1 - len(mistakes) / len(questions), 3),
+        "mistakes": mistakes,
+        "confusion": dict(confusion),
+        "mean_us": round(statistics.mean(latencies), 1),
+        "p95_us": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+    }
+
+
+def run_benchmark(repeat: int = 200) -> Dict[str, Dict[str, Dict[str, object]]]:
+    """在调优集和保留集上分别对比新的路由器和原先的关键词判断，返回 {路由: {问题集: 结果}}"""
+    routers = {
+        "router": lambda question: route_follow_up(question, ALL_SECTIONS).intent,
+        "legacy": legacy_route,
+    }
+    return {
+        name: {split: evaluate(router, questions, repeat) for split, questions in QUESTION_SETS.items()}
+        for name, router in routers.items()
+    }
+
+
+if __name__ == "__main__":
+    results = run_benchmark()
+    for name, splits in results.items():
+        for split, result in splits.items():
+            print(f"[{name}/{SET_LABELS[split]}] 准确率 {result['accuracy']:.1%}，"
+                  f"平均 {result['mean_us']} µs，p95 {result['p95_us']} µs")
+            for question, expected, predicted in result["mistakes"]:
+                print(f"    ✗ {question}  期望 {expected}，实际 {predicted}")
+    print("路由准确率以保留集为准，调优集的结果只用于规则调整后的回归验证")
@@ -0,0 +1,155 @@
+"""
+追问路由模块
+在本地用规则打分判断追问的意图，选择代价最低的处理方式，并决定暴露给智能体的搜索工具：
+  answer_from_plan - 直接基于现有计划和收集信息回答，不连接搜索工具
+  targeted_search  - 需要最新或计划中没有的信息，只暴露相关类别的搜索工具
+  replan_day       - 调整某一天或某一段的日程，由规划智能体基于现有信息重新安排
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Tuple
+
+INTENT_ANSWER = "answer_from_plan"
+INTENT_SEARCH = "targeted_search"
+INTENT_REPLAN = "replan_day"
+
+INTENT_LABELS = {
+    INTENT_ANSWER: "基于现有计划回答",
+    INTENT_SEARCH: "定向搜索",
+    INTENT_REPLAN: "调整日程",
+}
+
+# 得分相同时优先选择代价更低的处理方式
+INTENT_COST_ORDER = (INTENT_ANSWER, INTENT_REPLAN, INTENT_SEARCH)
+
+# 追问关键词 -> 相关的 TravelInfo 类别
+SECTION_KEYWORDS = {
+    "flights_info": ("航班", "机票", "飞机", "起飞", "降落", "航空", "直飞", "转机", "flight"),
+    "hotels_info": ("酒店", "住宿", "民宿", "入住", "退房", "旅馆", "hotel"),
+    "restaurants_info": ("餐厅", "美食", "吃", "菜", "饮食", "早餐", "午餐", "晚餐", "小吃", "咖啡", "restaurant"),
+    "attractions_info": ("景点", "门票", "游览", "活动", "博物馆", "公园", "体验", "展览", "演出", "寺", "神社"),
+    "transportation_info": ("交通", "地铁", "公交", "打车", "出租车", "租车", "机场", "接送", "怎么去", "怎么走"),
+    "weather_info": ("天气", "下雨", "雨天", "温度", "气温", "穿", "衣服", "季节", "台风"),
+    "local_tips": ("签证", "货币", "汇率", "语言", "习俗", "紧急", "小费", "插座", "电话卡"),
+    "media_info": ("图片", "照片", "视频"),
+}
+
+# TravelInfo 类别 -> 定向搜索时暴露的 mcp_server.py 工具
+SECTION_SEARCH_TOOLS = {
+    "flights_info": ("search_google_flights", "search_google_flights_calendar"),
+    "hotels_info": ("search_google_hotels", "search_google_hotels_property"),
+    "restaurants_info": ("search_google_maps", "search_google_maps_reviews"),
+    "attractions_info": ("search_google_maps", "search_google_maps_reviews", "search_google"),
+    "transportation_info": ("search_google_maps", "search_google"),
+    "weather_info": ("search_google",),
+    "local_tips": ("search_google",),
+    "media_info": ("search_google_images", "search_google_videos"),
+}
+# 问题没有明确类别时的搜索工具
+DEFAULT_SEARCH_TOOLS = ("search_google", "search_google_maps")
+# 问题涉及当前日期时附带的时间工具
+TIME_TOOL = "get_current_time"
+
+# 规则：(名称, 意图, 权重, 正则)
+ROUTING_RULES = (
+    ("explicit_search", INTENT_SEARCH, 3.0, r"搜索|搜一下|查找|查一下|查查|帮我找|search|find"),
+    ("freshness", INTENT_SEARCH, 3.0, r"最新|现在|目前|实时|今天|明天|这几天|还有(没有)?(票|房|空房|位)|营业|开门|关门|还开"),
+    ("alternatives", INTENT_SEARCH, 2.0,
+     r"其他|别的|更多|替代|备选|换一?(家|个|间)|附近|周边|比较|对比|更(便宜|好|近|高档|安静)|便宜|性价比|高档|豪华|最佳|排名|评价|评分|口碑"),
+    ("availability", INTENT_SEARCH, 1.5, r"有没有|有哪些|还有哪些|有什么好"),
+    ("media", INTENT_SEARCH, 2.0, r"图片|照片|视频"),
+    ("price", INTENT_SEARCH, 1.0, r"价格|多少钱|票价|房价|费用|贵不贵|价钱"),
+    ("day_reference", INTENT_REPLAN, 1.5, r"第[一二三四五六七八九十\d]+天|day\s*\d|最后一天|那天|当天|上午|下午|晚上"),
+    ("edit", INTENT_REPLAN, 2.0,
+     r"重新(安排|规划)|调整|修改|改(成|为|到|一下)|换成|替换|延长|缩短|提前|推迟|加(一|个|入)|删(掉|除)|去掉|取消|太(紧|赶|累|满)|轻松一点|空出|多留|换一下|对调|互换"),
+    # 单独出现时是在找替代选项，和具体某天一起出现时是在调整那天的安排
+    ("swap", INTENT_REPLAN, 1.0, r"换一?(家|个|间)|换掉"),
+    ("explain", INTENT_ANSWER, 1.5,
+     r"为什么|是什么|什么意思|解释|总结|概括|(计划|行程|方案)(中|里)|需要(带|准备)|注意(什么|事项)|几点|多久|多长时间|哪一天|安全吗|适合|可以吗|要不要"),
+)
+
+_COMPILED_RULES = tuple((name, intent, weight, re.compile(pattern, re.IGNORECASE))
+                        for name, intent, weight, pattern in ROUTING_RULES)
+_TIME_PATTERN = re.compile(r"现在|目前|今天|明天|这几天")
+
+# 基础分：没有任何信号时直接基于计划回答
+ANSWER_PRIOR = 1.0
+# 日程调整至少需要的得分（只提到"第二天"而没有调整意图时仍然是普通提问）
+REPLAN_THRESHOLD = 2.0
+
+
+@dataclass(frozen=True)
+class FollowUpRoute:
+    """追问的路由结果"""
+    intent: str
+    sections: Tuple[str, ...] = ()
+    tools: Tuple[str, ...] = ()
+    scores: Dict[str, float] = field(default_factory=dict)
+    matched_rules: Tuple[str, ...] = ()
+
+    @property
+    def label(self) -> str:
+        return INTENT_LABELS[self.intent]
+
+    @property
+    def needs_search(self) -> bool:
+        return bool(self.tools)
+
+
+def match_sections(question: str) -> Tuple[str, ...]:
+    """问题涉及的 TravelInfo 类别"""
+    text = question.lower()
+    return tuple(name for name, keywords in SECTION_KEYWORDS.items() if any(keyword in text for keyword in keywords))
+
+
+def select_tools(sections: Iterable[str], question: str) -> Tuple[str, ...]:
+    """按问题涉及的类别挑选搜索工具，保持顺序并去重"""
+    tools = [tool for section in sections for tool in SECTION_SEARCH_TOOLS.get(section, ())]
+    if not tools:
+        tools = list(DEFAULT_SEARCH_TOOLS)
+    if _TIME_PATTERN.search(question):
+        tools.append(TIME_TOOL)
+    return tuple(dict.fromkeys(tools))
+
+
+def route_follow_up(question: str, available_sections: Optional[Iterable[str]] = None) -> FollowUpRoute:
+    """
+    判断追问的处理方式
+
+    各意图按匹配到的规则累计得分，再结合现有收集信息调整：问价格且收集信息中已有相关
+    类别时倾向直接回答；有搜索信号且相关类别缺失时倾向搜索。得分最高的意图胜出，
+    得分相同时选择代价更低的意图。
+
+    Args:
+        question: 用户的追问
+        available_sections: 收集信息中有内容的 TravelInfo 类别，None 表示没有收集信息
+
+    Returns:
+        FollowUpRoute: 意图、相关类别、需要暴露的搜索工具和各意图得分
+    """
+    scores = {INTENT_ANSWER: ANSWER_PRIOR, INTENT_SEARCH: 0.0, INTENT_REPLAN: 0.0}
+    matched = []
+    for name, intent, weight, pattern in _COMPILED_RULES:
+        if pattern.search(question):
+            scores[intent] += weight
+            matched.append(name)
+
+    sections = match_sections(question)
+    available = set(available_sections or ())
+    covered = bool(sections) and all(section in available for section in sections)
+    if covered and "price" in matched:
+        scores[INTENT_ANSWER] += 1.0
+    elif sections and not covered and scores[INTENT_SEARCH] > 0:
+        scores[INTENT_SEARCH] += 1.0
+        matched.append("missing_section")
+
+    if scores[INTENT_REPLAN] < REPLAN_THRESHOLD:
+        scores[INTENT_REPLAN] = 0.0
+
+    intent = max(INTENT_COST_ORDER, key=lambda name: (scores[name], -INTENT_COST_ORDER.index(name)))
+    tools = ()
+    if intent == INTENT_SEARCH or (intent == INTENT_REPLAN and scores[INTENT_SEARCH] >= 2.0):
+        # 调整日程同时要求最新信息（例如"第三天换一家评价更好的餐厅"）时也提供搜索工具
+        tools = select_tools(sections, question)
+    return FollowUpRoute(intent, sections, tools, scores, tuple(matched))
@@ -0,0 +1,81 @@
+"""
+常用城市的离线行政区划表
+数据来自高德行政区域查询接口（adcode 与城市中心点坐标），覆盖直辖市、省会和主要旅游城市，
+这些城市的地理编码和天气查询无需调用高德地理编码接口
+"""
+
+from typing import Dict, Optional, Tuple
+
+# (名称, 简称, adcode, 中心点 "经度,纬度")
+OFFLINE_ADCODES: Tuple[Tuple[str, str, str, str], ...] = (
+    ("北京市", "北京", "110000", "116.405285,39.904989"),
+    ("天津市", "天津", "120000", "117.190182,39.125596"),
+    ("上海市", "上海", "310000", "121.472644,31.231706"),
+    ("重庆市", "重庆", "500000", "106.504962,29.533155"),
+    ("石家庄市", "石家庄", "130100", "114.502461,38.045474"),
+    ("太原市", "太原", "140100", "112.549248,37.857014"),
+    ("呼和浩特市", "呼和浩特", "150100", "111.670801,40.818311"),
+    ("沈阳市", "沈阳", "210100", "123.429096,41.796767"),
+    ("大连市", "大连", "210200", "121.618622,38.91459"),
+    ("长春市", "长春", "220100", "125.3245,43.886841"),
+    ("哈尔滨市", "哈尔滨", "230100", "126.642464,45.756967"),
+    ("南京市", "南京", "320100", "118.767413,32.041544"),
+    ("无锡市", "无锡", "320200", "120.301663,31.574729"),
+    ("苏州市", "苏州", "320500", "120.619585,31.299379"),
+    ("杭州市", "杭州", "330100", "120.153576,30.287459"),
+    ("宁波市", "宁波", "330200", "121.549792,29.868388"),
+    ("合肥市", "合肥", "340100", "117.283042,31.86119"),
+    ("黄山市", "黄山", "341000", "118.317325,29.709239"),
+    ("福州市", "福州", "350100", "119.306239,26.075302"),
+    ("厦门市", "厦门", "350200", "118.11022,24.490474"),
+    ("南昌市", "南昌", "360100", "115.892151,28.676493"),
+    ("济南市", "济南", "370100", "117.000923,36.675807"),
+    ("青岛市", "青岛", "370200", "120.355173,36.082982"),
+    ("郑州市", "郑州", "410100", "113.665412,34.757975"),
+    ("洛阳市", "洛阳", "410300", "112.434468,34.663041"),
+    ("武汉市", "武汉", "420100", "114.298572,30.584355"),
+    ("长沙市", "长沙", "430100", "112.982279,28.19409"),
+    ("张家界市", "张家界", "430800", "110.479921,29.127401"),
+    ("广州市", "广州", "440100", "113.280637,23.125178"),
+    ("深圳市", "深圳", "440300", "114.085947,22.547"),
+    ("珠海市", "珠海", "440400", "113.553986,22.224979"),
+    ("南宁市", "南宁", "450100", "108.320004,22.82402"),
+    ("桂林市", "桂林", "450300", "110.299121,25.274215"),
+    ("海口市", "海口", "460100", "110.33119,20.031971"),
+    ("三亚市", "三亚", "460200", "109.508268,18.247872"),
+    ("成都市", "成都", "510100", "104.065735,30.659462"),
+    ("贵阳市", "贵阳", "520100", "106.713478,26.578343"),
+    ("昆明市", "昆明", "530100", "102.712251,25.040609"),
+    ("丽江市", "丽江", "530700", "100.233026,26.872108"),
+    ("大理白族自治州", "大理", "532900", "100.225668,25.589449"),
+    ("拉萨市", "拉萨", "540100", "91.132212,29.660361"),
+    ("西安市", "西安", "610100", "108.948024,34.263161"),
+    ("兰州市", "兰州", "620100", "103.823557,36.058039"),
+    ("西宁市", "西宁", "630100", "101.778916,36.623178"),
+    ("银川市", "银川", "640100", "106.278179,38.46637"),
+    ("乌鲁木齐市", "乌鲁木齐", "650100", "87.617733,43.792818"),
+    ("香港特别行政区", "香港", "810000", "114.173355,22.320048"),
+    ("澳门特别行政区", "澳门", "820000", "113.54909,22.198951"),
+)
+
+# 名称或简称 -> (名称, adcode, 中心点)
+_LOOKUP: Dict[str, Tuple[str, str, str]] = {}
+for _name, _short, _adcode, _location in OFFLINE_ADCODES:
+    _LOOKUP[_name] = _LOOKUP[_short] = (_name, _adcode, _location)
+
+
+def lookup_offline(address: str) -> Optional[Dict[str, str]]:
+    """
+    在离线表中查找城市
+
+    Args:
+        address: 城市名称或简称（如 "杭州市"、"杭州"），需与表中名称完全一致
+
+    Returns:
+        dict: formatted_address、adcode、location；不在表中时返回 None
+    """
+    entry = _LOOKUP.get((address or "").strip())
+    if entry is None:
+        return None
+    name, adcode, location = entry
+    return {"formatted_address": name, "city": name, "adcode": adcode, "location": location}
@@ -0,0 +1,374 @@
+"""
+高德地图（AMap）Web 服务客户端
+为 agent.py 的地图、天气、酒店和景点工具提供共享的连接池（requests.Session）和异步
+变体（httpx.AsyncClient），统一超时设置，对网络错误、5xx 和高德的限流 infocode 进行
+带抖动的指数退避重试，并按接口统计调用次数、重试次数和耗时。地理编码结果经
+geocode_cache 缓存，天气和周边搜索解析城市、地址时共用。
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from geocode_cache import get_geocode_cache
+
+logger = logging.getLogger(__name__)
+
+GAODE_BASE_URL = os.environ.get("GAODE_BASE_URL", "https://restapi.amap.com")
+GAODE_CONNECT_TIMEOUT = float(os.environ.get("GAODE_CONNECT_TIMEOUT", "3"))
+GAODE_READ_TIMEOUT = float(os.environ.get("GAODE_READ_TIMEOUT", "10"))
+# 连接池大小（同时进行的请求数超过时排队等待空闲连接）
+GAODE_POOL_SIZE = int(os.environ.get("GAODE_POOL_SIZE", "10"))
+GAODE_RETRY_COUNT = int(os.environ.get("GAODE_RETRY_COUNT", "3"))
+GAODE_RETRY_BACKOFF_BASE = float(os.environ.get("GAODE_RETRY_BACKOFF_BASE", "0.5"))
+GAODE_RETRY_BACKOFF_MAX = float(os.environ.get("GAODE_RETRY_BACKOFF_MAX", "8"))
+# 每个接口保留最近多少次调用的耗时用于计算分位数
+GAODE_METRICS_WINDOW = int(os.environ.get("GAODE_METRICS_WINDOW", "500"))
+
+# 接口名称 -> 路径
+GAODE_ENDPOINTS = {
+    "geocode": "/v3/geocode/geo",
+    "place_around": "/v3/place/around",
+    "driving": "/v3/direction/driving",
+    "weather": "/v3/weather/weatherInfo",
+}
+
+# 高德的限流类 infocode，稍后重试通常可以成功：访问过于频繁、服务端 QPS 超限、
+# 网关超时、服务繁忙以及各级 QPS 超限（日配额用完的 10003 重试无效，不在其中）
+RATE_LIMIT_INFOCODES = {"10004", "10014", "10015", "10016", "10019", "10020", "10021"}
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+MISSING_KEY_ERROR = {"error": "高德地图API密钥未配置"}
+
+# "经度,纬度" 形式的坐标
+_COORDINATE_PATTERN = re.compile(r"^-?\d+(\.\d+)?,-?\d+(\.\d+)?$")
+
+# 重试原因
+_REASON_RATE_LIMIT = "rate_limited"
+_REASON_TRANSIENT = "transient"
+
+
+class GaodeMetrics:
+    """按接口统计调用次数、失败次数、重试次数和耗时（同步和异步客户端共用）"""
+
+    def __init__(self, window: int = GAODE_METRICS_WINDOW):
+        self.window = max(window, 1)
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, retries: int, rate_limited: int, failed: bool) -> None:
+        with self._lock:
+            metrics = self._endpoints.setdefault(endpoint, {
+                "calls": 0, "failures": 0, "retries": 0, "rate_limited": 0,
+                "total_seconds": 0.0, "latencies": deque(maxlen=self.window),
+            })
+            metrics["calls"] += 1
+            metrics["failures"] += int(failed)
+            metrics["retries"] += retries
+            metrics["rate_limited"] += rate_limited
+            metrics["total_seconds"] += seconds
+            metrics["latencies"].append(seconds)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各接口的统计，耗时单位为毫秒，分位数基于最近 GAODE_METRICS_WINDOW 次调用"""
+        with self._lock:
+            result = {}
+            for endpoint, metrics in self._endpoints.items():
+                latencies = sorted(metrics["latencies"])
+                result[endpoint] = {
+                    "calls": metrics["calls"],
+                    "failures": metrics["failures"],
+                    "retries": metrics["retries"],
+                    "rate_limited": metrics["rate_limited"],
+                    "avg_ms": round(metrics["total_seconds"] / metrics["calls"] * 1000, 1),
+                    "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+                    "p95_ms": round(latencies[math.ceil(len(latencies) * 0.95) - 1] * 1000, 1),
+                    "max_ms": round(latencies[-1] * 1000, 1),
+                }
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+gaode_metrics = GaodeMetrics()
+
+
+def _interpret(status_code: int, load_json: Callable[[], Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    解析一次响应
+
+    Returns:
+        tuple: (结果, 重试原因)；成功或不可重试的错误时重试原因为 None。高德返回的 JSON
+        （包括 status 为 "0" 的业务错误）原样作为结果，由调用方根据 info 处理
+    """
+    try:
+        payload = load_json()
+    except ValueError:
+        payload = None
+
+    if status_code in RETRYABLE_STATUS_CODES:
+        if not isinstance(payload, dict):
+            payload = {"error": f"高德地图API暂时不可用: HTTP {status_code}"}
+        return payload, _REASON_RATE_LIMIT if status_code == 429 else _REASON_TRANSIENT
+    if not isinstance(payload, dict):
+        return {"error": f"高德地图API返回了无效的响应: HTTP {status_code}"}, None
+    if payload.get("status") == "0" and str(payload.get("infocode")) in RATE_LIMIT_INFOCODES:
+        return payload, _REASON_RATE_LIMIT
+    return payload, None
+
+
+def _backoff(attempt: int, reason: str) -> float:
+    """第 attempt 次重试前的等待秒数；高德按秒统计 QPS，限流时至少等待 1 秒"""
+    delay = random.uniform(0, min(GAODE_RETRY_BACKOFF_MAX, GAODE_RETRY_BACKOFF_BASE * 2 ** (attempt - 1)))
+    return max(delay, 1.0) if reason == _REASON_RATE_LIMIT else delay
+
+
+def _is_failure(result: Dict[str, Any]) -> bool:
+    return "error" in result or result.get("status") == "0"
+
+
+def _poi_params(location: str, keywords: str = "", poi_type: Optional[str] = None) -> Dict[str, Any]:
+    params = {"location": location, "keywords": keywords}
+    if poi_type:
+        params["types"] = poi_type
+    return params
+
+
+def _as_coordinates(location: str) -> Optional[str]:
+    """location 已经是坐标时返回去掉空白的坐标，否则返回 None"""
+    compact = "".join((location or "").split()).replace("，", ",")
+    return compact if _COORDINATE_PATTERN.match(compact) else None
+
+
+def _location_from_geocode(address: str, geocode_resp: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """从地理编码结果中取出坐标，失败时返回 (None, 错误)"""
+    if geocode_resp.get("status") != "1" or not geocode_resp.get("geocodes"):
+        return None, {"error": f"无法解析位置 '{address}' 的坐标"}
+    location = geocode_resp["geocodes"][0].get("location")
+    if not location:
+        return None, {"error": f"无法从地理编码响应中找到位置 '{address}' 的坐标"}
+    return location, None
+
+
+def _adcode_from_geocode(city: str, geocode_resp: Dict[str, Any]) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """从地理编码结果中取出 adcode，失败时返回 (None, 错误)"""
+    if geocode_resp.get("status") != "1" or not geocode_resp.get("geocodes"):
+        return None, {"error": f"无法解析城市 '{city}' 的地理编码"}
+    adcode = geocode_resp["geocodes"][0].get("adcode")
+    if not adcode:
+        return None, {"error": f"无法从地理编码响应中找到城市 '{city}' 的 adcode"}
+    return adcode, None
+
+
+async def _run_cache(geocode_cache, method, *args):
+    """调用地理编码缓存方法：SQLite 后端放到线程中执行，避免阻塞事件循环"""
+    if geocode_cache.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+class GaodeClient:
+    """
+    同步高德客户端
+
+    所有请求复用同一个 requests.Session 的连接池，可以在 LangChain 智能体的多个线程中共享。
+    api_key 为 None 时每次请求读取 GAODE_API_KEY 环境变量。
+    """
+
+    def __init__(self, api_key: Optional[str] = None, pool_size: int = GAODE_POOL_SIZE,
+                 metrics: GaodeMetrics = gaode_metrics):
+        self.api_key = api_key
+        self.metrics = metrics
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """调用高德接口，按需重试，返回高德的 JSON 或 {"error": ...}"""
+        key = self.api_key or os.getenv("GAODE_API_KEY")
+        if not key:
+            return dict(MISSING_KEY_ERROR)
+
+        started = time.perf_counter()
+        attempt = rate_limited = 0
+        while True:
+            try:
+                response = self.session.get(
+                    GAODE_BASE_URL + GAODE_ENDPOINTS[endpoint],
+                    params={**params, "key": key},
+                    timeout=(GAODE_CONNECT_TIMEOUT, GAODE_READ_TIMEOUT),
+                )
+                result, reason = _interpret(response.status_code, response.json)
+            except requests.RequestException as e:
+                # 超时和连接错误均可重试（错误信息不包含带 key 的请求 URL）
+                result, reason = {"error": f"调用高德地图API时出错: {type(e).__name__}"}, _REASON_TRANSIENT
+
+            rate_limited += reason == _REASON_RATE_LIMIT
+            if reason is None or attempt >= GAODE_RETRY_COUNT:
+                self.metrics.record(endpoint, time.perf_counter() - started, attempt, rate_limited,
+                                    _is_failure(result))
+                return result
+
+            attempt += 1
+            delay = _backoff(attempt, reason)
+            logger.info(f"高德接口 {endpoint} 请求失败（{reason}），{delay:.1f} 秒后第 {attempt} 次重试")
+            time.sleep(delay)
+
+    def geocode(self, address: str) -> Dict[str, Any]:
+        """地理编码，优先使用离线表和地理编码缓存"""
+        geocode_cache = get_geocode_cache()
+        cached = geocode_cache.get(address) if geocode_cache else None
+        if cached is not None:
+            return cached
+        response = self.request("geocode", {"address": address})
+        if geocode_cache:
+            geocode_cache.set(address, response)
+        return response
+
+    def search_poi(self, location: str, keywords: str = "", poi_type: Optional[str] = None) -> Dict[str, Any]:
+        """周边搜索，location 也可以是地址或城市名称（通过地理编码转为坐标）"""
+        coordinates = _as_coordinates(location)
+        if coordinates is None:
+            coordinates, error = _location_from_geocode(location, self.geocode(location))
+            if error:
+                return error
+        return self.request("place_around", _poi_params(coordinates, keywords, poi_type))
+
+    def route(self, origin: str, destination: str, strategy: str = "0") -> Dict[str, Any]:
+        return self.request("driving", {"origin": origin, "destination": destination, "strategy": strategy})
+
+    def weather(self, city: str) -> Dict[str, Any]:
+        """先将城市名称解析为 adcode，再查询未来几天的天气预报"""
+        if not (self.api_key or os.getenv("GAODE_API_KEY")):
+            return dict(MISSING_KEY_ERROR)
+        adcode, error = _adcode_from_geocode(city, self.geocode(city))
+        if error:
+            return error
+        return self.request("weather", {"city": adcode, "extensions": "all"})
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncGaodeClient:
+    """
+    异步高德客户端，接口与 GaodeClient 相同
+
+    httpx.AsyncClient 只能在创建它的事件循环中使用，通过 get_async_gaode_client()
+    获取当前事件循环共享的实例。
+    """
+
+    def __init__(self, api_key: Optional[str] = None, pool_size: int = GAODE_POOL_SIZE,
+                 metrics: GaodeMetrics = gaode_metrics):
+        self.api_key = api_key
+        self.metrics = metrics
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(GAODE_READ_TIMEOUT, connect=GAODE_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=max(pool_size, 1), max_keepalive_connections=max(pool_size, 1)),
+        )
+
+    async def request(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """调用高德接口，按需重试，返回高德的 JSON 或 {"error": ...}"""
+        key = self.api_key or os.getenv("GAODE_API_KEY")
+        if not key:
+            return dict(MISSING_KEY_ERROR)
+
+        started = time.perf_counter()
+        attempt = rate_limited = 0
+        while True:
+            try:
+                response = await self.client.get(GAODE_BASE_URL + GAODE_ENDPOINTS[endpoint],
+                                                 params={**params, "key": key})
+                result, reason = _interpret(response.status_code, response.json)
+            except httpx.TransportError as e:
+                result, reason = {"error": f"调用高德地图API时出错: {type(e).__name__}"}, _REASON_TRANSIENT
+
+            rate_limited += reason == _REASON_RATE_LIMIT
+            if reason is None or attempt >= GAODE_RETRY_COUNT:
+                self.metrics.record(endpoint, time.perf_counter() - started, attempt, rate_limited,
+                                    _is_failure(result))
+                return result
+
+            attempt += 1
+            delay = _backoff(attempt, reason)
+            logger.info(f"高德接口 {endpoint} 请求失败（{reason}），{delay:.1f} 秒后第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+
+    async def geocode(self, address: str) -> Dict[str, Any]:
+        """地理编码，优先使用离线表和地理编码缓存"""
+        geocode_cache = get_geocode_cache()
+        cached = await _run_cache(geocode_cache, geocode_cache.get, address) if geocode_cache else None
+        if cached is not None:
+            return cached
+        response = await self.request("geocode", {"address": address})
+        if geocode_cache:
+            await _run_cache(geocode_cache, geocode_cache.set, address, response)
+        return response
+
+    async def search_poi(self, location: str, keywords: str = "", poi_type: Optional[str] = None) -> Dict[str, Any]:
+        """周边搜索，location 也可以是地址或城市名称（通过地理编码转为坐标）"""
+        coordinates = _as_coordinates(location)
+        if coordinates is None:
+            coordinates, error = _location_from_geocode(location, await self.geocode(location))
+            if error:
+                return error
+        return await self.request("place_around", _poi_params(coordinates, keywords, poi_type))
+
+    async def route(self, origin: str, destination: str, strategy: str = "0") -> Dict[str, Any]:
+        return await self.request("driving", {"origin": origin, "destination": destination, "strategy": strategy})
+
+    async def weather(self, city: str) -> Dict[str, Any]:
+        """先将城市名称解析为 adcode，再查询未来几天的天气预报"""
+        if not (self.api_key or os.getenv("GAODE_API_KEY")):
+            return dict(MISSING_KEY_ERROR)
+        adcode, error = _adcode_from_geocode(city, await self.geocode(city))
+        if error:
+            return error
+        return await self.request("weather", {"city": adcode, "extensions": "all"})
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+
+_gaode_client: Optional[GaodeClient] = None
+_gaode_client_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncGaodeClient]" = weakref.WeakKeyDictionary()
+
+
+def get_gaode_client() -> GaodeClient:
+    """获取进程内共享的同步客户端"""
+    global _gaode_client
+    with _gaode_client_lock:
+        if _gaode_client is None:
+            _gaode_client = GaodeClient()
+        return _gaode_client
+
+
+def get_async_gaode_client() -> AsyncGaodeClient:
+    """获取当前事件循环共享的异步客户端，需在协程中调用"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.client.is_closed:
+        client = _async_clients[loop] = AsyncGaodeClient()
+    return client
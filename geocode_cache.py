@@ -0,0 +1,115 @@
+"""
+高德地理编码缓存模块
+持久化缓存地址 -> 地理编码结果（经纬度、adcode），供 gaode_client 的地理编码、天气和周边
+搜索共用；常用城市直接由 gaode_adcodes 的离线表解析，不调用高德接口
+"""
+
+import os
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+from gaode_adcodes import OFFLINE_ADCODES, lookup_offline
+from search_cache import create_cache
+
+GEOCODE_CACHE_ENABLED = os.environ.get("GEOCODE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+GEOCODE_CACHE_BACKEND = os.environ.get("GEOCODE_CACHE_BACKEND", "sqlite")
+GEOCODE_CACHE_PATH = os.environ.get(
+    "GEOCODE_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "travel_agent", "geocode_cache.db"),
+)
+# 地址的坐标和行政区划很少变化，默认缓存 30 天
+GEOCODE_CACHE_TTL = int(os.environ.get("GEOCODE_CACHE_TTL", str(30 * 24 * 60 * 60)))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.environ.get("GEOCODE_CACHE_MAX_ENTRIES", "5000"))
+# 写入后清理过期和超量条目的最小间隔（秒）
+GEOCODE_CACHE_PURGE_INTERVAL = float(os.environ.get("GEOCODE_CACHE_PURGE_INTERVAL", "3600"))
+GEOCODE_OFFLINE_TABLE = os.environ.get("GEOCODE_OFFLINE_TABLE", "true").lower() in ("1", "true", "yes")
+
+
+def normalize_address(address: str) -> str:
+    """统一全角半角和大小写，去掉空白"""
+    return "".join(unicodedata.normalize("NFKC", address or "").casefold().split())
+
+
+def offline_response(address: str) -> Optional[Dict[str, Any]]:
+    """离线表中的城市构造与高德地理编码接口相同结构的响应"""
+    geocode = lookup_offline(normalize_address(address))
+    if geocode is None:
+        return None
+    return {"status": "1", "info": "OK", "infocode": "10000", "count": "1", "geocodes": [geocode],
+            "source": "offline"}
+
+
+class GeocodeCache:
+    """
+    地理编码缓存：先查离线表，再查持久化缓存；只缓存成功且有结果的响应
+
+    写入后按 purge_interval 间隔顺带清理过期和超量条目（首次写入时先清理一次）。
+    """
+
+    def __init__(self, cache, ttl: int = GEOCODE_CACHE_TTL, offline: bool = GEOCODE_OFFLINE_TABLE,
+                 purge_interval: float = GEOCODE_CACHE_PURGE_INTERVAL):
+        self.cache = cache
+        self.ttl = ttl
+        self.offline = offline
+        self.purge_interval = purge_interval
+        self.offline_hits = 0
+        self._next_purge = 0.0
+        self._purge_lock = threading.Lock()
+
+    @property
+    def blocking(self) -> bool:
+        """读写是否会阻塞（SQLite 后端），异步代码中应放到线程中执行"""
+        return getattr(self.cache, "blocking", False)
+
+    def get(self, address: str) -> Optional[Dict[str, Any]]:
+        if self.offline:
+            response = offline_response(address)
+            if response is not None:
+                self.offline_hits += 1
+                return response
+        key = normalize_address(address)
+        return self.cache.get(key) if key else None
+
+    def set(self, address: str, response: Dict[str, Any]) -> None:
+        key = normalize_address(address)
+        if key and response.get("status") == "1" and response.get("geocodes"):
+            self.cache.set(key, response, self.ttl, engine="geocode")
+            self._purge_if_due()
+
+    def _purge_if_due(self) -> None:
+        now = time.monotonic()
+        with self._purge_lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.purge_interval
+        self.cache.purge_expired()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.cache.stats(),
+            "ttl": self.ttl,
+            "offline_hits": self.offline_hits,
+            "offline_entries": len(OFFLINE_ADCODES) if self.offline else 0,
+        }
+
+
+_geocode_cache: Optional[GeocodeCache] = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache() -> Optional[GeocodeCache]:
+    """获取进程内共享的地理编码缓存，未启用时返回 None"""
+    global _geocode_cache
+    if not GEOCODE_CACHE_ENABLED:
+        return None
+    with _geocode_cache_lock:
+        if _geocode_cache is None:
+            try:
+                cache = create_cache(GEOCODE_CACHE_BACKEND, GEOCODE_CACHE_MAX_ENTRIES, GEOCODE_CACHE_PATH)
+            except Exception:
+                # SQLite 文件不可用时退回内存缓存
+                cache = create_cache("memory", GEOCODE_CACHE_MAX_ENTRIES)
+            _geocode_cache = GeocodeCache(cache)
+        return _geocode_cache
@@ -0,0 +1,177 @@
+"""
+SearchAPI MCP 连接管理模块
+统一创建搜索工具的 MultiMCPTools，支持复用常驻的 mcp_server.py 进程，
+避免每次规划、追问都重新启动 Python 解释器和 FastMCP 服务器
+"""
+
+import asyncio
+import atexit
+import hashlib
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from agno.tools import Toolkit
+from agno.tools.mcp import MultiMCPTools
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+# 连接模式：
+#   managed - 自动启动并复用本机常驻的 mcp_server.py（SSE 传输），默认
+#   sse     - 连接 SEARCHAPI_MCP_URL 指定的已运行服务器
+#   stdio   - 每次调用都启动新的 mcp_server.py 子进程（旧行为）
+MCP_MODE = os.environ.get("SEARCHAPI_MCP_MODE", "managed")
+MCP_SERVER_URL = os.environ.get("SEARCHAPI_MCP_URL", "http://127.0.0.1:8000/sse")
+MCP_SERVER_SCRIPT = os.environ.get(
+    "SEARCHAPI_MCP_SERVER_SCRIPT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py"),
+)
+MCP_STARTUP_TIMEOUT = float(os.environ.get("SEARCHAPI_MCP_STARTUP_TIMEOUT", "20"))
+
+
+class ManagedMCPServer:
+    """由当前进程启动并负责关闭的常驻 mcp_server.py 进程"""
+
+    def __init__(self, env: Dict[str, str]):
+        self.env = env
+        self.port: Optional[int] = None
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/sse"
+
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self) -> None:
+        """在空闲端口上以 SSE 传输启动服务器，并等待端口可连接"""
+        self.port = _find_free_port()
+        self.process = subprocess.Popen(
+            [sys.executable, MCP_SERVER_SCRIPT],
+            env={
+                **self.env,
+                "MCP_TRANSPORT": "sse",
+                "FASTMCP_HOST": "127.0.0.1",
+                "FASTMCP_PORT": str(self.port),
+            },
+        )
+
+        deadline = time.monotonic() + MCP_STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"MCP 服务器启动失败，退出码: {self.process.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.2)
+
+        self.stop()
+        raise RuntimeError(f"MCP 服务器在 {MCP_STARTUP_TIMEOUT} 秒内未就绪")
+
+    def stop(self) -> None:
+        """终止服务器进程"""
+        if self.is_running():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+# 按 SearchAPI Key 区分的常驻服务器，不同用户的密钥不会混用
+_managed_servers: Dict[str, ManagedMCPServer] = {}
+_managed_lock = threading.Lock()
+
+
+def _find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def ensure_managed_server(env: Dict[str, str]) -> str:
+    """确保当前 SearchAPI Key 对应的常驻服务器在运行，返回其 SSE 地址"""
+    key_id = hashlib.sha256(env.get("SEARCHAPI_API_KEY", "").encode("utf-8")).hexdigest()[:12]
+    with _managed_lock:
+        server = _managed_servers.get(key_id)
+        if server is None or not server.is_running():
+            server = ManagedMCPServer(env)
+            server.start()
+            _managed_servers[key_id] = server
+        return server.url
+
+
+def shutdown_managed_servers() -> None:
+    """关闭所有由当前进程启动的常驻服务器"""
+    with _managed_lock:
+        for server in _managed_servers.values():
+            server.stop()
+        _managed_servers.clear()
+
+
+atexit.register(shutdown_managed_servers)
+
+
+class SSEMCPTools(MultiMCPTools):
+    """
+    通过 SSE 传输连接已运行的 MCP 服务器
+
+    agno 1.2.13 的 MultiMCPTools 只能启动 stdio 子进程，这里在进入上下文时自行建立 SSE 会话，
+    工具注册沿用 MultiMCPTools.initialize。未指定 url 时在进入上下文时才确保常驻服务器在运行
+    （启动等待在线程中进行，不阻塞事件循环）。
+    """
+
+    def __init__(self, url: Optional[str] = None, env: Optional[Dict[str, str]] = None, **kwargs):
+        super().__init__(server_params_list=[], **kwargs)
+        self.url = url
+        self.server_env = env or {}
+
+    async def __aenter__(self) -> "SSEMCPTools":
+        url = self.url or await asyncio.to_thread(ensure_managed_server, self.server_env)
+        try:
+            read, write = await self._async_exit_stack.enter_async_context(sse_client(url))
+            session = await self._async_exit_stack.enter_async_context(ClientSession(read, write))
+            await self.initialize(session)
+        except BaseException:
+            await self._async_exit_stack.aclose()
+            raise
+        return self
+
+
+def create_search_mcp_tools(env: Dict[str, str]) -> MultiMCPTools:
+    """
+    创建 SearchAPI 搜索工具
+
+    Args:
+        env: 传给 MCP 服务器的环境变量（包含 SEARCHAPI_API_KEY）
+
+    Returns:
+        MultiMCPTools: 需要配合 async with 使用
+    """
+    if MCP_MODE == "sse":
+        return SSEMCPTools(MCP_SERVER_URL)
+    if MCP_MODE == "managed":
+        return SSEMCPTools(env=env)
+    return MultiMCPTools([f"{sys.executable} {MCP_SERVER_SCRIPT}"], env=env)
+
+
+def select_search_tools(mcp_tools: MultiMCPTools, tool_names: Iterable[str]):
+    """
+    从已连接的搜索工具中挑选一部分暴露给智能体
+
+    工具函数仍通过原有的 MCP 会话调用，只是智能体看不到其他工具，减少工具描述占用的
+    token 和误调用。指定的工具都不存在（或工具尚未初始化）时返回完整的工具集。
+    """
+    functions = getattr(mcp_tools, "functions", None) or {}
+    selected = {name: functions[name] for name in tool_names if name in functions}
+    if not selected:
+        return mcp_tools
+    subset = Toolkit(name="searchapi_subset")
+    subset.functions = selected
+    return subset
@@ -1,10 +1,24 @@
 # 建议将此代码保存为 mcp_server.py
 
 import os
-from typing import Any, Dict, List, Optional, Union
+import json
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 import httpx
 from mcp.server.fastmcp import FastMCP
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+from team_config import ERROR_HANDLING
+from search_cache import DEFAULT_CACHE_PATH, create_cache, get_engine_ttl, make_cache_key
+from search_quota import QuotaLedger, RateLimiter
+from search_projection import project_response
+
+logger = logging.getLogger(__name__)
 
 # 从环境变量中读取 API Key，更安全
 SEARCHAPI_API_KEY = os.environ.get("SEARCHAPI_API_KEY", "5722Vw5rYoJTVHyffqNph3F4")
@@ -13,12 +27,277 @@ if not SEARCHAPI_API_KEY:
     print("错误：请设置环境变量 SEARCHAPI_API_KEY")
     # exit(1) # 如果希望在API Key缺失时阻止服务器启动，可以取消此注释
 
-# 初始化 FastMCP 服务器
-mcp = FastMCP("searchapi")
-
 # 常量
 SEARCHAPI_URL = "https://www.searchapi.io/api/v1/search"
 
+# HTTP 连接池配置（均可通过环境变量覆盖）
+HTTP_CLIENT_CONFIG = {
+    "timeout": float(os.environ.get("SEARCHAPI_TIMEOUT", "15")),
+    "max_connections": int(os.environ.get("SEARCHAPI_MAX_CONNECTIONS", "20")),
+    "max_keepalive_connections": int(os.environ.get("SEARCHAPI_MAX_KEEPALIVE", "10")),
+    "keepalive_expiry": float(os.environ.get("SEARCHAPI_KEEPALIVE_EXPIRY", "60")),
+    "http2": os.environ.get("SEARCHAPI_HTTP2", "false").lower() == "true",
+}
+
+# 搜索结果缓存配置
+CACHE_ENABLED = os.environ.get("SEARCHAPI_CACHE_ENABLED", "true").lower() == "true"
+CACHE_BACKEND = os.environ.get("SEARCHAPI_CACHE_BACKEND", "sqlite")
+CACHE_PATH = os.environ.get("SEARCHAPI_CACHE_PATH")
+CACHE_MAX_ENTRIES = int(os.environ.get("SEARCHAPI_CACHE_MAX_ENTRIES", "1000"))
+CACHE_VACUUM_INTERVAL = float(os.environ.get("SEARCHAPI_CACHE_VACUUM_INTERVAL", "600"))
+# 过期缓存的保留时间（秒），配额耗尽时可用于降级返回
+CACHE_STALE_GRACE = int(os.environ.get("SEARCHAPI_CACHE_STALE_GRACE", str(7 * 24 * 60 * 60)))
+
+try:
+    response_cache = create_cache(CACHE_BACKEND, max_entries=CACHE_MAX_ENTRIES, path=CACHE_PATH,
+                                  stale_grace=CACHE_STALE_GRACE)
+except Exception as e:
+    # 持久化缓存不可用（如目录只读）时退回内存缓存，不影响搜索功能
+    logger.warning(f"无法初始化 {CACHE_BACKEND} 缓存后端，改用内存缓存: {e}")
+    response_cache = create_cache("memory", max_entries=CACHE_MAX_ENTRIES, stale_grace=CACHE_STALE_GRACE)
+
+# 限流配置：每秒请求数和突发容量，引擎级限制格式为 {"google_flights": [1, 3]}
+RATE_LIMIT = float(os.environ.get("SEARCHAPI_RATE_LIMIT", "5"))
+RATE_BURST = int(os.environ.get("SEARCHAPI_RATE_BURST", "10"))
+ENGINE_RATE_LIMITS = {
+    engine: (float(limit[0]), int(limit[1]))
+    for engine, limit in json.loads(os.environ.get("SEARCHAPI_ENGINE_RATE_LIMITS", "{}")).items()
+}
+
+rate_limiter = RateLimiter(RATE_LIMIT, RATE_BURST, ENGINE_RATE_LIMITS)
+
+# 每日配额配置：0 表示不限制；配额耗尽时 degrade 返回过期缓存，refuse 直接拒绝
+QUOTA_PATH = os.environ.get(
+    "SEARCHAPI_QUOTA_PATH", os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), "searchapi_quota.db")
+)
+DAILY_BUDGET = int(os.environ.get("SEARCHAPI_DAILY_BUDGET", "0"))
+ENGINE_DAILY_BUDGETS = {
+    engine: int(budget)
+    for engine, budget in json.loads(os.environ.get("SEARCHAPI_ENGINE_DAILY_BUDGETS", "{}")).items()
+}
+QUOTA_POLICY = os.environ.get("SEARCHAPI_QUOTA_POLICY", "degrade")
+
+try:
+    quota_ledger = QuotaLedger(QUOTA_PATH, DAILY_BUDGET, ENGINE_DAILY_BUDGETS)
+except Exception as e:
+    logger.warning(f"无法打开配额账本 {QUOTA_PATH}，改为仅在当前进程内统计: {e}")
+    quota_ledger = QuotaLedger(None, DAILY_BUDGET, ENGINE_DAILY_BUDGETS)
+
+# 重试配置：重试次数和单次调用的总等待时间沿用 team_config.ERROR_HANDLING
+RETRY_COUNT = ERROR_HANDLING["api_failures"]["retry_count"]
+MAX_WAIT_TIME = ERROR_HANDLING["timeout_handling"]["max_wait_time"]
+RETRY_BACKOFF_BASE = float(os.environ.get("SEARCHAPI_RETRY_BACKOFF_BASE", "0.5"))
+RETRY_BACKOFF_MAX = float(os.environ.get("SEARCHAPI_RETRY_BACKOFF_MAX", "8"))
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_STATS = {
+    "retries": 0,
+    "exhausted": 0,
+}
+
+# 熔断配置：同一引擎连续失败达到阈值后熔断，冷却期内直接失败
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("SEARCHAPI_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("SEARCHAPI_BREAKER_RESET", "30"))
+
+# 响应精简配置：默认将航班、酒店、地图结果裁剪为摘要，每个列表最多保留的条目数
+PROJECTION_ENABLED = os.environ.get("SEARCHAPI_PROJECTION", "true").lower() == "true"
+PROJECTION_MAX_ITEMS = int(os.environ.get("SEARCHAPI_PROJECTION_MAX_ITEMS", "10"))
+PROJECTION_STATS = {
+    "projected_calls": 0,
+    "raw_bytes": 0,
+    "projected_bytes": 0,
+    "saved_tokens": 0,
+}
+
+# 正在进行中的上游请求（缓存键 -> Task），用于合并并发的相同请求
+_inflight_requests: Dict[str, "asyncio.Task"] = {}
+COALESCE_STATS = {
+    "upstream_requests": 0,
+    "coalesced_requests": 0,
+}
+
+class SearchUnavailable(Exception):
+    """上游当前不可调用（配额耗尽或熔断中）"""
+
+
+class CircuitBreaker:
+    """按引擎的熔断器：连续失败达到阈值后熔断，冷却期结束后放行一个探测请求"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self.trips = 0
+        self.rejected = 0
+
+    def _state(self, engine: Optional[str]) -> Dict[str, Any]:
+        return self._states.setdefault(engine or "unknown", {"failures": 0, "opened_at": None, "half_open": False})
+
+    def allow(self, engine: Optional[str]) -> bool:
+        """判断是否允许请求该引擎"""
+        state = self._state(engine)
+        if state["opened_at"] is None:
+            return True
+
+        now = time.monotonic()
+        if now - state["opened_at"] >= self.reset_timeout:
+            # 半开状态：放行一个探测请求，探测未完成前其他请求继续快速失败
+            state["opened_at"] = now
+            state["half_open"] = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def is_open(self, engine: Optional[str]) -> bool:
+        """引擎当前是否处于熔断（含半开探测中），只查询状态，不计入拒绝次数"""
+        return self._state(engine)["opened_at"] is not None
+
+    def retry_in(self, engine: Optional[str]) -> float:
+        """距离下次允许探测的秒数"""
+        opened_at = self._state(engine)["opened_at"]
+        if opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - opened_at))
+
+    def record_success(self, engine: Optional[str]) -> None:
+        state = self._state(engine)
+        state.update(failures=0, opened_at=None, half_open=False)
+
+    def record_failure(self, engine: Optional[str]) -> None:
+        state = self._state(engine)
+        state["failures"] += 1
+        if state["half_open"] or state["failures"] >= self.failure_threshold:
+            if state["opened_at"] is None:
+                self.trips += 1
+                logger.warning(f"SearchAPI 引擎 {engine} 连续失败 {state['failures']} 次，已熔断")
+            state["opened_at"] = time.monotonic()
+            state["half_open"] = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "trips": self.trips,
+            "rejected_requests": self.rejected,
+            "open_engines": {
+                engine: round(self.retry_in(engine), 1)
+                for engine, state in self._states.items()
+                if state["opened_at"] is not None
+            },
+        }
+
+
+circuit_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+# 进程级共享的 HTTP 客户端及连接统计
+_http_client: Optional[httpx.AsyncClient] = None
+HTTP_CLIENT_STATS = {
+    "requests": 0,
+    "new_connections": 0,
+    "reused_connections": 0,
+}
+
+
+def _http2_available() -> bool:
+    """检查是否安装了 HTTP/2 所需的 h2 包"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取进程级共享的 httpx.AsyncClient，首次调用时按配置创建连接池"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        http2 = HTTP_CLIENT_CONFIG["http2"]
+        if http2 and not _http2_available():
+            logger.warning("已启用 SEARCHAPI_HTTP2 但未安装 h2 包，回退到 HTTP/1.1")
+            http2 = False
+
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_CLIENT_CONFIG["timeout"],
+            limits=httpx.Limits(
+                max_connections=HTTP_CLIENT_CONFIG["max_connections"],
+                max_keepalive_connections=HTTP_CLIENT_CONFIG["max_keepalive_connections"],
+                keepalive_expiry=HTTP_CLIENT_CONFIG["keepalive_expiry"],
+            ),
+            http2=http2,
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """关闭共享的 HTTP 客户端，释放连接池中的所有连接"""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+        logger.info(f"SearchAPI HTTP 客户端已关闭，连接统计: {HTTP_CLIENT_STATS}")
+    _http_client = None
+
+
+class _ConnectionTracker:
+    """通过 httpcore 的 trace 扩展区分单个请求使用的是新建连接还是复用连接"""
+
+    def __init__(self):
+        self.new_connection = False
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connection = True
+
+    def record(self) -> None:
+        HTTP_CLIENT_STATS["requests"] += 1
+        if self.new_connection:
+            HTTP_CLIENT_STATS["new_connections"] += 1
+        else:
+            HTTP_CLIENT_STATS["reused_connections"] += 1
+
+
+async def run_cache(method, *args, **kwargs):
+    """调用缓存方法：SQLite 后端放到线程中执行，避免磁盘 IO 阻塞事件循环；内存后端直接调用"""
+    if response_cache.blocking:
+        return await asyncio.to_thread(method, *args, **kwargs)
+    return method(*args, **kwargs)
+
+
+async def cache_maintenance_loop(interval: float) -> None:
+    """后台缓存维护任务：启动时先清理一次，之后按固定间隔清理过期条目"""
+    while True:
+        try:
+            removed = await run_cache(response_cache.purge_expired)
+            if removed:
+                logger.info(f"已清理 {removed} 条过期缓存")
+        except Exception as e:
+            logger.warning(f"缓存维护失败: {e}")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """FastMCP 服务器生命周期：启动时预建客户端和缓存维护任务，关闭时释放资源"""
+    get_http_client()
+    maintenance_task = None
+    if CACHE_ENABLED and CACHE_VACUUM_INTERVAL > 0:
+        maintenance_task = asyncio.create_task(cache_maintenance_loop(CACHE_VACUUM_INTERVAL))
+    try:
+        yield
+    finally:
+        if maintenance_task is not None:
+            maintenance_task.cancel()
+            try:
+                await maintenance_task
+            except asyncio.CancelledError:
+                pass
+        await close_http_client()
+        response_cache.close()
+        quota_ledger.close()
+
+
+# 初始化 FastMCP 服务器
+mcp = FastMCP("searchapi", lifespan=server_lifespan)
+
 def add_optional_params(params: Dict[str, Any], optional_params: Dict[str, Any]) -> None:
     """添加有值的可选参数，自动处理类型转换"""
     for key, value in optional_params.items():
@@ -29,36 +308,186 @@ def add_optional_params(params: Dict[str, Any], optional_params: Dict[str, Any])
             else:
                 params[key] = str(value)
 
+async def search_and_project(params: Dict[str, Any], raw: Union[str, bool] = False) -> Dict[str, Any]:
+    """请求searchapi.io，并在未要求原始结果时返回精简后的摘要"""
+    result = await make_searchapi_request(params)
+
+    if isinstance(raw, str):
+        raw = raw.lower() == "true"
+    if raw or not PROJECTION_ENABLED:
+        return result
+
+    projected = project_response(params.get("engine"), result, PROJECTION_MAX_ITEMS)
+    report = projected.get("projection_report")
+    if report:
+        PROJECTION_STATS["projected_calls"] += 1
+        PROJECTION_STATS["raw_bytes"] += report["raw_bytes"]
+        PROJECTION_STATS["projected_bytes"] += report["projected_bytes"]
+        PROJECTION_STATS["saved_tokens"] += report["saved_tokens"]
+    return projected
+
 async def make_searchapi_request(params: Dict[str, Any]) -> Dict[str, Any]:
-    """向searchapi.io发送请求并处理错误情况"""
-    # 确保API Key被添加到参数中
-    params["api_key"] = SEARCHAPI_API_KEY
-    
-    async with httpx.AsyncClient() as client:
+    """向searchapi.io发送请求，优先返回缓存结果"""
+    engine = params.get("engine")
+    ttl = get_engine_ttl(engine)
+    cache_key = make_cache_key(params)
+
+    if CACHE_ENABLED and ttl > 0:
+        cached = await run_cache(response_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
+    # 相同参数的请求正在进行时，直接等待同一个结果，不再重复请求上游
+    task = _inflight_requests.get(cache_key)
+    if task is not None:
+        COALESCE_STATS["coalesced_requests"] += 1
+    else:
+        COALESCE_STATS["upstream_requests"] += 1
+        task = asyncio.create_task(_fetch_and_cache(params, cache_key, engine, ttl))
+        _inflight_requests[cache_key] = task
+        task.add_done_callback(lambda _: _inflight_requests.pop(cache_key, None))
+
+    # shield 保证某个调用方被取消时不会连带取消其他调用方共享的请求
+    return await asyncio.shield(task)
+
+async def _fetch_and_cache(params: Dict[str, Any], cache_key: str, engine: Optional[str], ttl: int) -> Dict[str, Any]:
+    """请求上游并写入缓存，上游不可用时按配置降级"""
+    try:
+        result = await fetch_with_retry(params, engine)
+    except SearchUnavailable as e:
+        return await _degraded_result(cache_key, str(e))
+
+    # 错误结果不缓存，避免把临时故障固化下来
+    if CACHE_ENABLED and ttl > 0 and "error" not in result:
+        await run_cache(response_cache.set, cache_key, result, ttl, engine=engine)
+
+    return result
+
+async def _degraded_result(cache_key: str, reason: str) -> Dict[str, Any]:
+    """降级结果：degrade 策略下优先返回过期缓存，否则返回错误"""
+    stale = await run_cache(response_cache.get_stale, cache_key) if QUOTA_POLICY == "degrade" else None
+    if stale is not None:
+        return {**stale, "stale_cache_notice": f"{reason}，以下为历史缓存结果，价格等信息可能已变化"}
+    return {"error": f"{reason}，请稍后再试或基于已有信息回答"}
+
+async def fetch_with_retry(params: Dict[str, Any], engine: Optional[str]) -> Dict[str, Any]:
+    """
+    经过熔断、配额和限流检查后请求上游，对超时、429 和 5xx 进行带抖动的指数退避重试
+
+    Raises:
+        SearchUnavailable: 引擎熔断中或今日配额已用完
+    """
+    if not circuit_breaker.allow(engine):
+        raise SearchUnavailable(
+            f"searchapi.io 暂时不可用（引擎 {engine} 已熔断，约 {circuit_breaker.retry_in(engine):.0f} 秒后重试）"
+        )
+
+    deadline = time.monotonic() + MAX_WAIT_TIME
+    attempt = 0
+    while True:
+        # 账本的 BEGIN IMMEDIATE 事务可能等待其他进程的写锁，放到线程中执行
+        if not await asyncio.to_thread(quota_ledger.consume, engine):
+            raise SearchUnavailable(f"今日SearchAPI搜索配额已用完（引擎: {engine}）")
+        await rate_limiter.acquire(SEARCHAPI_API_KEY, engine)
+
+        remaining = deadline - time.monotonic()
+        retry_after = None
         try:
-            response = await client.get(SEARCHAPI_URL, params=params, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPError as e:
-            error_detail = None
-            try:
-                if hasattr(e, 'response') and e.response:
-                    error_detail = e.response.json()
-            except ValueError:
-                if hasattr(e, 'response') and e.response:
-                    error_detail = e.response.text
-            
-            error_message = f"调用searchapi.io时出错: {e}"
-            if error_detail:
-                error_message += f", 详情: {error_detail}"
-            
-            return {"error": error_message}
+            response = await fetch_searchapi(params, timeout=max(1.0, min(HTTP_CLIENT_CONFIG["timeout"], remaining)))
+        except httpx.TransportError as e:
+            # 超时和连接错误均可重试
+            result = {"error": f"调用searchapi.io时出错: {type(e).__name__} {e}"}
         except Exception as e:
             return {"error": f"处理请求时发生未知错误: {e}"}
+        else:
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                result = _error_from_response(response)
+                retry_after = _parse_retry_after(response)
+            else:
+                # 4xx 属于请求本身的问题，说明服务可达，不计入熔断
+                circuit_breaker.record_success(engine)
+                if response.is_error:
+                    return _error_from_response(response)
+                try:
+                    return response.json()
+                except ValueError as e:
+                    return {"error": f"处理请求时发生未知错误: 响应不是有效的JSON: {e}"}
+
+        circuit_breaker.record_failure(engine)
+        attempt += 1
+        delay = retry_after if retry_after is not None else random.uniform(
+            0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** (attempt - 1))
+        )
+        if attempt > RETRY_COUNT or time.monotonic() + delay >= deadline or circuit_breaker.is_open(engine):
+            RETRY_STATS["exhausted"] += 1
+            return result
+
+        RETRY_STATS["retries"] += 1
+        logger.info(f"SearchAPI 请求失败（{result['error']}），{delay:.1f} 秒后第 {attempt} 次重试")
+        await asyncio.sleep(delay)
+
+async def fetch_searchapi(params: Dict[str, Any], timeout: Optional[float] = None) -> httpx.Response:
+    """向searchapi.io发送单次请求"""
+    # 确保API Key被添加到参数中
+    params["api_key"] = SEARCHAPI_API_KEY
+
+    client = get_http_client()
+    tracker = _ConnectionTracker()
+    response = await client.get(
+        SEARCHAPI_URL,
+        params=params,
+        timeout=timeout or HTTP_CLIENT_CONFIG["timeout"],
+        extensions={"trace": tracker},
+    )
+    tracker.record()
+    return response
+
+def _error_from_response(response: httpx.Response) -> Dict[str, Any]:
+    """根据错误响应构造错误信息（不包含带 api_key 的请求 URL）"""
+    try:
+        error_detail = response.json()
+    except ValueError:
+        error_detail = response.text
+
+    error_message = f"调用searchapi.io时出错: HTTP {response.status_code} {response.reason_phrase}"
+    if error_detail:
+        error_message += f", 详情: {error_detail}"
+    return {"error": error_message}
+
+def _parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """解析 Retry-After 响应头，支持秒数和 HTTP 日期两种格式"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
 
 @mcp.tool()
-async def search_google_maps(query: str, location_ll: str = None) -> Dict[str, Any]:
-    """搜索Google地图上的地点或服务"""
+async def get_searchapi_stats() -> Dict[str, Any]:
+    """获取SearchAPI服务的运行统计（缓存命中率、请求合并、重试熔断、限流、每日配额、响应精简、连接复用情况），用于诊断，规划旅行时无需调用"""
+    return {
+        "cache": {**(await run_cache(response_cache.stats)), "enabled": CACHE_ENABLED},
+        "coalescing": {**COALESCE_STATS, "in_flight": len(_inflight_requests)},
+        "retry": {**RETRY_STATS, "retry_count": RETRY_COUNT, "max_wait_time": MAX_WAIT_TIME},
+        "circuit_breaker": circuit_breaker.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "quota": {**(await asyncio.to_thread(quota_ledger.stats)), "policy": QUOTA_POLICY},
+        "projection": {**PROJECTION_STATS, "enabled": PROJECTION_ENABLED},
+        "http": dict(HTTP_CLIENT_STATS),
+    }
+
+@mcp.tool()
+async def search_google_maps(query: str, location_ll: str = None, raw: Union[str, bool] = False) -> Dict[str, Any]:
+    """搜索Google地图上的地点或服务，默认返回精简摘要，raw为true时返回完整原始结果"""
     params = {
         "engine": "google_maps",
         "q": query
@@ -67,7 +496,7 @@ async def search_google_maps(query: str, location_ll: str = None) -> Dict[str, A
     if location_ll:
         params["ll"] = location_ll
     
-    return await make_searchapi_request(params)
+    return await search_and_project(params, raw)
 
 @mcp.tool()
 async def search_google_flights(
@@ -104,9 +533,10 @@ async def search_google_flights(
     infants_in_seat: str = None,
     infants_on_lap: str = None,
     departure_token: str = None,
-    booking_token: str = None
+    booking_token: str = None,
+    raw: Union[str, bool] = False
 ) -> Dict[str, Any]:
-    """搜索Google航班信息"""
+    """搜索Google航班信息，默认返回精简摘要，raw为true时返回完整原始结果"""
     params = {
         "engine": "google_flights",
         "flight_type": flight_type
@@ -162,7 +592,7 @@ async def search_google_flights(
     # 添加有值的可选参数
     add_optional_params(params, optional_params)
     
-    return await make_searchapi_request(params)
+    return await search_and_project(params, raw)
 
 @mcp.tool()
 async def search_google_hotels(
@@ -189,9 +619,10 @@ async def search_google_hotels(
     bathrooms: str = None,
     adults: str = None,
     children_ages: str = None,
-    next_page_token: str = None
+    next_page_token: str = None,
+    raw: Union[str, bool] = False
 ) -> Dict[str, Any]:
-    """搜索Google酒店信息"""
+    """搜索Google酒店信息，默认返回精简摘要，raw为true时返回完整原始结果"""
     params = {
         "engine": "google_hotels",
         "q": q,
@@ -227,7 +658,7 @@ async def search_google_hotels(
     # 添加有值的可选参数
     add_optional_params(params, optional_params)
     
-    return await make_searchapi_request(params)
+    return await search_and_project(params, raw)
 
 @mcp.tool()
 async def search_google_maps_reviews(
@@ -268,7 +699,7 @@ async def search_google_maps_reviews(
     # 添加有值的可选参数
     add_optional_params(params, optional_params)
     
-    return await make_searchapi_request(params)
+    return await search_and_project(params)
 
 @mcp.tool()
 async def search_google_hotels_property(
@@ -303,7 +734,7 @@ async def search_google_hotels_property(
     # 添加有值的可选参数
     add_optional_params(params, optional_params)
     
-    return await make_searchapi_request(params)
+    return await search_and_project(params)
 
 @mcp.tool()
 async def search_google_flights_calendar(
@@ -357,7 +788,7 @@ async def search_google_flights_calendar(
     # 添加有值的可选参数
     add_optional_params(params, optional_params)
     
-    return await make_searchapi_request(params)
+    return await search_and_project(params)
 
 @mcp.tool()
 async def get_current_time(
@@ -536,7 +967,7 @@ async def search_google(
         if value is not None:
             params[key] = value
     
-    return await make_searchapi_request(params)
+    return await search_and_project(params)
 
 @mcp.tool()
 async def search_google_videos(
@@ -589,7 +1020,7 @@ async def search_google_videos(
         if value is not None:
             params[key] = value
     
-    return await make_searchapi_request(params)
+    return await search_and_project(params)
 
 @mcp.tool()
 async def search_google_images(
@@ -654,7 +1085,82 @@ async def search_google_images(
         if value is not None:
             params[key] = value
     
-    return await make_searchapi_request(params)
+    return await search_and_project(params)
+
+# 批量搜索支持的引擎及对应的工具函数
+BATCH_ENGINE_TOOLS = {
+    "google_maps": search_google_maps,
+    "google_flights": search_google_flights,
+    "google_hotels": search_google_hotels,
+    "google_maps_reviews": search_google_maps_reviews,
+    "google_hotels_property": search_google_hotels_property,
+    "google_flights_calendar": search_google_flights_calendar,
+    "google": search_google,
+    "google_videos": search_google_videos,
+    "google_images": search_google_images,
+}
+BATCH_MAX_SEARCHES = int(os.environ.get("SEARCHAPI_BATCH_MAX_SEARCHES", "20"))
+BATCH_MAX_CONCURRENCY = int(os.environ.get("SEARCHAPI_BATCH_MAX_CONCURRENCY", "6"))
+
+@mcp.tool()
+async def search_batch(
+    searches: Union[str, List[Dict[str, Any]]],
+    max_concurrency: str = None
+) -> Dict[str, Any]:
+    """
+    一次并行执行多个搜索，适合同时收集航班、酒店、地图、天气等信息
+
+    searches 为搜索列表（或其JSON字符串），每项格式为 {"engine": 引擎名, "params": 参数}，
+    引擎名可选 google_maps、google_flights、google_hotels、google_maps_reviews、
+    google_hotels_property、google_flights_calendar、google、google_videos、google_images，
+    params 与对应 search_* 工具的参数相同。结果按输入顺序返回。
+    """
+    if isinstance(searches, str):
+        try:
+            searches = json.loads(searches)
+        except ValueError as e:
+            return {"error": f"searches 不是有效的JSON: {e}"}
+    if not isinstance(searches, list) or not searches:
+        return {"error": "searches 必须是非空的搜索列表"}
+    if len(searches) > BATCH_MAX_SEARCHES:
+        return {"error": f"单次最多执行 {BATCH_MAX_SEARCHES} 个搜索，当前为 {len(searches)} 个"}
+
+    try:
+        concurrency = int(max_concurrency) if max_concurrency is not None else BATCH_MAX_CONCURRENCY
+    except (TypeError, ValueError):
+        return {"error": "max_concurrency 必须是整数"}
+    semaphore = asyncio.Semaphore(max(1, min(concurrency, BATCH_MAX_CONCURRENCY)))
+
+    async def run_search(index: int, spec: Any) -> Dict[str, Any]:
+        if not isinstance(spec, dict):
+            return {"index": index, "error": "搜索项必须是包含 engine 和 params 的对象"}
+        engine = spec.get("engine")
+        tool = BATCH_ENGINE_TOOLS.get(engine)
+        if tool is None:
+            return {"index": index, "engine": engine, "error": f"不支持的引擎: {engine}"}
+        params = spec.get("params") or {}
+        if not isinstance(params, dict):
+            return {"index": index, "engine": engine, "error": "params 必须是对象"}
+
+        async with semaphore:
+            try:
+                result = await tool(**params)
+            except TypeError as e:
+                return {"index": index, "engine": engine, "error": f"参数错误: {e}"}
+            except Exception as e:
+                return {"index": index, "engine": engine, "error": f"处理请求时发生未知错误: {e}"}
+        return {"index": index, "engine": engine, "result": result}
+
+    started = time.monotonic()
+    results = await asyncio.gather(*(run_search(i, spec) for i, spec in enumerate(searches)))
+    failed = sum(1 for item in results if "error" in item or "error" in item.get("result", {}))
+
+    return {
+        "results": results,
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+    }
 
 if __name__ == "__main__":
     # 从环境变量获取 transport 类型，默认为 stdio
@@ -13,6 +13,7 @@ from fpdf import FPDF
 # 导入多智能体模块
 from multi_agent_travel import (
     MultiAgentTravelPlanner,
+    PlannerSession,
     run_multi_agent_travel_planner,
     handle_multi_agent_follow_up,
     build_travel_message,
@@ -22,6 +23,9 @@ from multi_agent_travel import (
 # 导入提示词模块
 from travel_prompts import QUICK_QUESTIONS
 
+# 导入流式输出渲染
+from agent_streaming import create_stream_renderer
+
 # 配置页面 - 必须是第一个 Streamlit 命令
 st.set_page_config(
     page_title="多智能体AI旅行规划助手",
@@ -430,6 +434,29 @@ def setup_input_form():
     }
 
 
+def get_planner_session():
+    """获取当前用户的规划会话，模型或密钥变化时重新创建（相同凭据的用户共享后台运行环境）"""
+    session = st.session_state.get('planner_session')
+    if session is not None and session.matches(
+        st.session_state.model_provider,
+        st.session_state.openai_key,
+        st.session_state.gemini_key,
+        st.session_state.searchapi_key
+    ):
+        return session
+    
+    if session is not None:
+        session.close()
+    session = PlannerSession(
+        model_provider=st.session_state.model_provider,
+        openai_key=st.session_state.openai_key,
+        gemini_key=st.session_state.gemini_key,
+        searchapi_key=st.session_state.searchapi_key
+    )
+    st.session_state['planner_session'] = session
+    return session
+
+
 def handle_multi_agent_travel_planning(form_data, all_keys_filled):
     """处理多智能体旅行规划请求"""
     # 提交按钮和重置按钮
@@ -443,10 +470,17 @@ def handle_multi_agent_travel_planning(form_data, all_keys_filled):
             if st.button("🔄 重新规划", help="清除当前计划，开始新的规划"):
                 st.session_state['travel_plan'] = None
                 st.session_state['collected_info'] = None
+                st.session_state['travel_info'] = {}
                 st.session_state['travel_context'] = {}
                 st.session_state['messages'] = []
                 st.rerun()
 
+    # 相同行程的规划结果会直接从缓存返回，价格变化较快时可以只刷新航班、住宿和预算章节
+    refresh_prices = st.checkbox(
+        "💲 使用缓存方案时重新查询航班和酒店价格",
+        help="相同的出发地、目的地、日期、预算档位和偏好会直接返回缓存的方案，勾选后只更新价格相关的章节"
+    )
+
     if submit_button:
         if not form_data['source'] or not form_data['destination']:
             st.error("❌ 请填写出发地和目的地")
@@ -474,19 +508,42 @@ def handle_multi_agent_travel_planning(form_data, all_keys_filled):
             # 运行多智能体系统
             with st.spinner("🤖 多智能体系统正在工作..."):
                 try:
-                    # 使用 asyncio 运行异步函数
-                    result = asyncio.run(run_multi_agent_travel_planner(
-                        travel_message,
-                        model_provider=st.session_state.model_provider,
-                        openai_key=st.session_state.openai_key,
-                        gemini_key=st.session_state.gemini_key,
-                        searchapi_key=st.session_state.searchapi_key,
-                        progress_callback=progress_callback
-                    ))
+                    # 复用会话中的规划器，两个阶段及后续追问共享搜索工具和模型客户端
+                    # 行程规划阶段的内容边生成边显示，完成后由下方的结果标签页替代
+                    live_area = st.empty()
+                    with live_area.container():
+                        st.markdown("### ✍️ 行程方案实时生成")
+                        render = create_stream_renderer()
+                        final_event = {'type': 'error', 'error': '规划未完成'}
+                        for event in get_planner_session().stream_plan(
+                            travel_message,
+                            progress_callback=progress_callback,
+                            refresh_prices=refresh_prices
+                        ):
+                            render(event)
+                            if event['type'] in ('done', 'error'):
+                                final_event = event
+                    live_area.empty()
+                    
+                    if final_event['type'] == 'done':
+                        result = {
+                            'collected_info': final_event['collected_info'],
+                            'travel_info': final_event['travel_info'],
+                            'validation_issues': final_event['validation_issues'],
+                            'detailed_itinerary': final_event['content'],
+                            'first_token_seconds': final_event['first_token_seconds'],
+                            'cached': final_event.get('cached', False),
+                            'cache_age_seconds': final_event.get('cache_age_seconds', 0),
+                            'prices_refreshed': final_event.get('prices_refreshed', False),
+                            'success': True
+                        }
+                    else:
+                        result = {'error': final_event['error'], 'success': False}
                     
                     if result['success']:
                         # 保存结果到会话状态
                         st.session_state['collected_info'] = result['collected_info']
+                        st.session_state['travel_info'] = result['travel_info'].to_dict()
                         st.session_state['travel_plan'] = result['detailed_itinerary']
                         st.session_state['travel_context'] = {
                             'source': form_data['source'],
@@ -497,6 +554,12 @@ def handle_multi_agent_travel_planning(form_data, all_keys_filled):
                         }
                         
                         st.success("🎉 多智能体旅行规划完成！")
+                        if result['prices_refreshed']:
+                            st.caption("♻️ 使用缓存的行程方案，航班、住宿和预算章节已按最新价格更新")
+                        elif result['cached']:
+                            st.caption(f"♻️ 使用 {result['cache_age_seconds'] // 60} 分钟前缓存的行程方案，价格可能已变化")
+                        elif result['first_token_seconds'] is not None:
+                            st.caption(f"⏱️ 行程方案首字响应时间：{result['first_token_seconds']} 秒")
                         
                         # 显示结果
                         st.markdown("---")
@@ -511,7 +574,15 @@ def handle_multi_agent_travel_planning(form_data, all_keys_filled):
                         
                         with tab2:
                             st.markdown("### 🔍 信息收集智能体收集的详细信息")
-                            st.markdown(result['collected_info'])
+                            # 能解析出结构化信息时按类别展示（含图片和视频），否则显示原文
+                            if st.session_state['travel_info']:
+                                display_travel_info_with_media(st.session_state['travel_info'])
+                                if result['validation_issues']:
+                                    with st.expander("⚠️ 信息格式校验提示"):
+                                        for issue in result['validation_issues']:
+                                            st.caption(issue)
+                            else:
+                                st.markdown(result['collected_info'])
                         
                         # 生成下载选项
                         generate_download_options(result['detailed_itinerary'], form_data)
@@ -775,6 +846,8 @@ def init_session_state():
         st.session_state['travel_plan'] = None
     if 'collected_info' not in st.session_state:
         st.session_state['collected_info'] = None
+    if 'travel_info' not in st.session_state:
+        st.session_state['travel_info'] = {}
     if 'travel_context' not in st.session_state:
         st.session_state['travel_context'] = {}
     if 'model_provider' not in st.session_state:
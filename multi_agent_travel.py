@@ -6,18 +6,51 @@
 """
 
 import asyncio
+import hashlib
 import os
 import json
+import queue
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
 from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from agno.agent import Agent
-from agno.tools.mcp import MultiMCPTools
 from agno.models.openai import OpenAIChat
 from agno.models.google import Gemini
+from openai import AsyncOpenAI
 
 # 导入API配置
 from api_config import get_api_key, validate_api_setup
 
+# 导入搜索工具连接管理
+from mcp_connection import create_search_mcp_tools, select_search_tools
+
+# 导入追问路由
+from follow_up_router import INTENT_REPLAN, SECTION_KEYWORDS, route_follow_up
+
+# 导入流式输出
+from agent_streaming import stream_agent_run
+
+# 导入旅行信息解析
+from travel_info_parser import parse_collector_output, parse_json_output, validate_travel_info
+
+# 导入上下文压缩
+from context_compression import (
+    FOLLOW_UP_CONTEXT_TOKEN_BUDGET,
+    compress_collected_info,
+    compress_text,
+    compress_travel_context
+)
+
+# 导入快捷问题预取
+from quick_prefetch import QuickQuestionPrefetcher, rank_quick_questions
+
+# 导入规划结果缓存和追问回答缓存
+from plan_cache import get_plan_cache
+from answer_cache import get_answer_cache, plan_fingerprint
+
 # 导入提示词模块
 from travel_prompts import (
     TRAVEL_MESSAGE_TEMPLATE,
@@ -28,6 +61,7 @@ from travel_prompts import (
 try:
     from agent_prompts import (
         INFORMATION_COLLECTOR_PROMPT,
+        CATEGORY_COLLECTOR_PROMPT,
         ITINERARY_PLANNER_PROMPT,
         FOLLOW_UP_AGENT_PROMPT,
         FOLLOW_UP_NO_SEARCH_PROMPT
@@ -35,6 +69,7 @@ try:
 except ImportError:
     # 如果无法导入，使用内联简化版本
     INFORMATION_COLLECTOR_PROMPT = "你是旅行信息收集专家，负责搜索和收集全面的旅行信息。按JSON格式组织输出。"
+    CATEGORY_COLLECTOR_PROMPT = "你是旅行信息收集专家，只负责收集指定类别的信息。只输出一个JSON对象。"
     ITINERARY_PLANNER_PROMPT = "你是旅行行程规划专家，基于收集的信息制定详细、实用的旅行方案。"
     FOLLOW_UP_AGENT_PROMPT = "你是旅行咨询专家，回答用户对已有旅行计划的追问和修改需求。"
     FOLLOW_UP_NO_SEARCH_PROMPT = "你是旅行咨询专家，基于已有旅行计划回答用户追问。"
@@ -52,13 +87,201 @@ class TravelInfo:
     weather_info: Dict[str, Any] = None
     local_tips: Dict[str, Any] = None
     media_info: Dict[str, Any] = None  # 多媒体信息字段，包含图片和视频
+    
+    def section(self, name: str) -> Dict[str, Any]:
+        """获取单个类别的信息，不存在时返回空字典"""
+        return getattr(self, name, None) or {}
+    
+    def to_dict(self, fields=None) -> Dict[str, Any]:
+        """转换为字典，只包含有内容的类别，fields 指定时只输出这些类别"""
+        return {
+            name: value for name, value in asdict(self).items()
+            if value and (fields is None or name in fields)
+        }
+    
+    def to_json(self, fields=None) -> str:
+        """转换为 JSON 字符串"""
+        return json.dumps(self.to_dict(fields), ensure_ascii=False, indent=2)
+    
+    def is_empty(self) -> bool:
+        return not self.to_dict()
+    
+    def sections_for_question(self, question: str) -> Dict[str, Any]:
+        """根据追问内容挑选相关类别（始终包含目的地信息），没有匹配时返回全部类别"""
+        matched = [
+            name for name, keywords in FOLLOW_UP_SECTION_KEYWORDS.items()
+            if any(keyword in question.lower() for keyword in keywords)
+        ]
+        if not matched:
+            return self.to_dict()
+        return self.to_dict(["destination_info", *matched])
+
 
+# 追问关键词 -> 相关的 TravelInfo 类别（与追问路由共用）
+FOLLOW_UP_SECTION_KEYWORDS = SECTION_KEYWORDS
+
+
+def parse_travel_info(collected_info) -> tuple:
+    """
+    把信息收集结果解析为 TravelInfo
+    
+    Args:
+        collected_info: 信息收集智能体的输出文本或已解析的字典
+        
+    Returns:
+        (TravelInfo, 校验问题列表)
+    """
+    if isinstance(collected_info, TravelInfo):
+        return collected_info, []
+    if isinstance(collected_info, dict):
+        sections, issues = validate_travel_info(collected_info)
+    else:
+        sections, issues = parse_collector_output(collected_info or "")
+    return TravelInfo(**sections), issues
+
+
+def merge_validation_issues(*issue_lists) -> List[str]:
+    """按出现顺序合并多组校验问题，去掉重复项"""
+    return list(dict.fromkeys(issue for issues in issue_lists for issue in issues))
+
+
+# 信息收集模式：
+#   single   - 一个信息收集智能体依次收集所有类别（默认）
+#   parallel - 每个类别由一个子智能体并发收集，结果合并为 TravelInfo
+#   pipeline - 在 parallel 的基础上流水线规划：目的地、景点、天气收集完成后
+#              立即起草日程骨架，航班、酒店等结果到达后再补全相关章节
+COLLECTION_MODE = os.environ.get("TRAVEL_COLLECTION_MODE", "single")
+# 并行模式下同时运行的子智能体数量上限
+COLLECTION_MAX_CONCURRENCY = int(os.environ.get("TRAVEL_COLLECTION_CONCURRENCY", "4"))
+
+# 并行收集的类别：TravelInfo 字段 -> (类别名称, 收集任务, 输出格式)
+COLLECTION_CATEGORIES = {
+    "destination_info": (
+        "目的地信息",
+        "目的地基本信息、文化特色、最佳旅行时间、安全须知和签证要求",
+        '{"overview": "", "best_time": "", "culture": "", "safety": "", "visa_requirements": ""}',
+    ),
+    "flights_info": (
+        "航班信息",
+        "去程和返程航班选项、航空公司、时间和价格，给出预订建议",
+        '{"outbound_options": [], "return_options": [], "price_range": "", "recommendations": ""}',
+    ),
+    "hotels_info": (
+        "住宿信息",
+        "豪华、中档、经济型住宿选项，包含位置、价格、设施和评价",
+        '{"luxury": [], "mid_range": [], "budget": [], "location_recommendations": ""}',
+    ),
+    "restaurants_info": (
+        "餐饮信息",
+        "高档餐厅、当地特色美食、休闲餐饮和平价选择，注意用户的饮食限制",
+        '{"fine_dining": [], "local_cuisine": [], "casual_dining": [], "budget_options": []}',
+    ),
+    "attractions_info": (
+        "景点活动",
+        "必游景点、文化古迹、户外活动和娱乐项目，包含门票和开放时间",
+        '{"must_visit": [], "cultural_sites": [], "outdoor_activities": [], "entertainment": []}',
+    ),
+    "transportation_info": (
+        "当地交通",
+        "机场往返、公共交通、租车和打车方式及费用",
+        '{"airport_transfer": [], "public_transport": [], "rental_options": [], "taxi_rideshare": []}',
+    ),
+    "weather_info": (
+        "天气信息",
+        "旅行期间的天气预报、穿着建议和季节注意事项",
+        '{"forecast": "", "clothing_suggestions": "", "seasonal_considerations": ""}',
+    ),
+    "local_tips": (
+        "实用信息",
+        "货币、语言、当地习俗和紧急联系方式",
+        '{"currency": "", "language": "", "customs": "", "emergency_contacts": ""}',
+    ),
+    "media_info": (
+        "多媒体内容",
+        "目的地、景点、酒店、美食和文化相关的图片和视频",
+        '{"images": {"destination_images": [], "attractions_images": {}, "hotels_images": {}, '
+        '"restaurants_images": {}, "culture_images": [], "city_landmarks": []}, '
+        '"videos": {"destination_videos": [], "attractions_videos": {}, "culture_videos": [], '
+        '"food_videos": [], "travel_guides": []}}',
+    ),
+}
+
+
+# 流水线规划中用于起草日程骨架的类别，其余类别到达后再补全方案
+PIPELINE_DRAFT_FIELDS = ("destination_info", "attractions_info", "weather_info")
+
+# 使用缓存方案时可以单独刷新的价格敏感类别，以及需要据此重新生成的章节
+PRICE_SENSITIVE_FIELDS = ("flights_info", "hotels_info")
+PRICE_SENSITIVE_SECTIONS = ("航班", "住宿", "预算")
+
+# 行程方案各章节的顺序，按标题中的关键词匹配
+ITINERARY_SECTION_ORDER = ("航班", "住宿", "日程", "餐饮", "交通", "预算", "实用信息", "备选")
+
+
+def split_markdown_sections(text: str) -> List[tuple]:
+    """按 ### 标题拆分 Markdown，返回 [(标题, 内容)]，第一个标题之前的内容标题为空"""
+    sections = []
+    heading, lines = "", []
+    for line in (text or "").splitlines():
+        if line.startswith("### "):
+            if heading or any(l.strip() for l in lines):
+                sections.append((heading, "\n".join(lines).strip()))
+            heading, lines = line[4:].strip(), []
+        else:
+            lines.append(line)
+    if heading or any(l.strip() for l in lines):
+        sections.append((heading, "\n".join(lines).strip()))
+    return sections
+
+
+def itinerary_section_rank(heading: str) -> int:
+    """章节在 ITINERARY_SECTION_ORDER 中的位置，无标题为 -1，未知章节排在最后"""
+    if not heading:
+        return -1
+    for index, keyword in enumerate(ITINERARY_SECTION_ORDER):
+        if keyword in heading:
+            return index
+    return len(ITINERARY_SECTION_ORDER)
+
+
+def _join_sections(sections: List[tuple]) -> str:
+    return "\n\n".join(f"### {heading}\n{body}" if heading else body for heading, body in sections)
+
+
+def merge_itinerary_sections(*texts: str) -> str:
+    """合并多段行程方案，按 ITINERARY_SECTION_ORDER 排列章节，同类章节保持原有先后顺序"""
+    sections = [section for text in texts for section in split_markdown_sections(text)]
+    sections.sort(key=lambda section: itinerary_section_rank(section[0]))
+    return _join_sections(sections)
+
+
+def replace_itinerary_sections(base: str, updates: str) -> str:
+    """用 updates 中的章节替换 base 中同类的章节（按 ITINERARY_SECTION_ORDER 的关键词匹配），其余章节保持不变"""
+    updated = {}
+    for heading, body in split_markdown_sections(updates):
+        if heading:
+            updated.setdefault(itinerary_section_rank(heading), []).append((heading, body))
+    
+    sections, replaced = [], set()
+    for heading, body in split_markdown_sections(base):
+        rank = itinerary_section_rank(heading)
+        if rank not in updated:
+            sections.append((heading, body))
+        elif rank not in replaced:
+            # 同类章节有多个时（例如流水线规划的日程骨架和日程调整）整体替换一次
+            sections.extend(updated[rank])
+            replaced.add(rank)
+    # base 中没有的章节按顺序补在后面
+    for rank in sorted(set(updated) - replaced):
+        sections.extend(updated[rank])
+    return _join_sections(sections)
 
 
 class MultiAgentTravelPlanner:
     """多智能体旅行规划系统"""
     
-    def __init__(self, model_provider="OpenAI", openai_key=None, gemini_key=None, searchapi_key=None):
+    def __init__(self, model_provider="OpenAI", openai_key=None, gemini_key=None, searchapi_key=None,
+                 collection_mode=None):
         """
         初始化多智能体旅行规划系统
         
@@ -67,12 +290,120 @@ class MultiAgentTravelPlanner:
             openai_key: OpenAI API密钥（可选，将从环境变量获取）
             gemini_key: Gemini API密钥（可选，将从环境变量获取）
             searchapi_key: SearchAPI密钥（可选，将从环境变量获取）
+            collection_mode: 信息收集模式 ("single"、"parallel" 或 "pipeline"，默认读取 TRAVEL_COLLECTION_MODE)
         """
         self.model_provider = model_provider
         # 优先使用传入的参数，否则从环境变量获取
         self.openai_key = openai_key or get_api_key("openai_key")
         self.gemini_key = gemini_key or get_api_key("gemini_key") 
         self.searchapi_key = searchapi_key or get_api_key("searchapi_key")
+        self.collection_mode = collection_mode or COLLECTION_MODE
+        # 多个规划共享的信息收集并发上限（批量规划时设置），为 None 时每次收集单独限流
+        self.collection_semaphore = None
+        
+        # 会话期间共享的搜索工具和模型客户端，由 open()/close() 管理
+        self._session_open = False
+        self._mcp_tools = None
+        self._mcp_task = None
+        self._mcp_stop = None
+        self._mcp_lock = asyncio.Lock()
+        self._openai_client = None
+    
+    async def open(self):
+        """
+        打开规划会话
+
+        会话打开后，信息收集、行程规划以及后续的多次追问共享同一个搜索工具会话
+        和模型客户端，直到调用 close()。也可以使用 async with 管理生命周期。
+        """
+        if not self._session_open:
+            self._validate_keys()
+            self._session_open = True
+        return self
+    
+    async def close(self):
+        """关闭规划会话，释放搜索工具会话和模型客户端"""
+        if not self._session_open:
+            return
+        self._session_open = False
+        
+        mcp_task, self._mcp_task = self._mcp_task, None
+        self._mcp_tools = None
+        if mcp_task is not None:
+            self._mcp_stop.set()
+            try:
+                await mcp_task
+            except Exception:
+                pass
+        
+        openai_client, self._openai_client = self._openai_client, None
+        if openai_client is not None:
+            await openai_client.close()
+    
+    async def __aenter__(self):
+        return await self.open()
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    @asynccontextmanager
+    async def _session_scope(self):
+        """未打开会话时临时打开一个，覆盖一次完整的规划流程"""
+        if self._session_open:
+            yield
+            return
+        await self.open()
+        try:
+            yield
+        finally:
+            await self.close()
+    
+    async def _hold_search_tools(self, ready: asyncio.Future, stop: asyncio.Event):
+        """
+        在独立任务中持有搜索工具会话
+
+        MCP 客户端的上下文必须在同一个任务中进入和退出，因此由专门的任务
+        进入上下文并等待关闭信号，会话内的各次调用只借用已连接的工具。
+        """
+        try:
+            async with create_search_mcp_tools(self._get_environment()) as mcp_tools:
+                ready.set_result(mcp_tools)
+                await stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                raise
+    
+    @asynccontextmanager
+    async def _search_tools(self):
+        """获取搜索工具：会话打开时复用同一个连接，否则为本次调用临时创建"""
+        if not self._session_open:
+            async with create_search_mcp_tools(self._get_environment()) as mcp_tools:
+                yield mcp_tools
+            return
+        
+        async with self._mcp_lock:
+            if self._mcp_task is not None and self._mcp_task.done():
+                # 持有连接的任务已退出（如 SSE 连接断开），丢弃失效的工具并重新连接
+                if not self._mcp_task.cancelled():
+                    self._mcp_task.exception()
+                self._mcp_task = None
+                self._mcp_tools = None
+            if self._mcp_tools is None:
+                ready = asyncio.get_running_loop().create_future()
+                self._mcp_stop = asyncio.Event()
+                self._mcp_task = asyncio.create_task(self._hold_search_tools(ready, self._mcp_stop))
+                self._mcp_tools = await ready
+        yield self._mcp_tools
+    
+    def _get_openai_client(self):
+        """会话打开时返回共享的 AsyncOpenAI 客户端（复用连接池），否则返回 None"""
+        if not self._session_open:
+            return None
+        if self._openai_client is None:
+            self._openai_client = AsyncOpenAI(api_key=self.openai_key, base_url="https://api.xi-ai.cn/v1")
+        return self._openai_client
         
     def _validate_keys(self):
         """验证API密钥是否完整"""
@@ -90,6 +421,7 @@ class MultiAgentTravelPlanner:
                 id="gpt-4.1",  # 使用xi-ai支持的模型
                 api_key=self.openai_key,
                 base_url="https://api.xi-ai.cn/v1",
+                async_client=self._get_openai_client(),
             )
         elif self.model_provider == 'Gemini':
             return Gemini(id="gemini-2.0-flash-exp", api_key=self.gemini_key)
@@ -110,13 +442,14 @@ class MultiAgentTravelPlanner:
             
         return env
     
-    async def collect_travel_information(self, travel_request: str, progress_callback=None):
+    async def collect_travel_information(self, travel_request: str, progress_callback=None, issues=None):
         """
         使用信息收集智能体收集旅行信息
         
         Args:
             travel_request: 旅行请求
             progress_callback: 进度回调函数
+            issues: 可选列表，并行和流水线模式下各类别的校验问题追加到其中
             
         Returns:
             str: 收集到的详细旅行信息（JSON格式）
@@ -127,14 +460,14 @@ class MultiAgentTravelPlanner:
         # 验证API密钥
         self._validate_keys()
         
-        # 获取环境变量和模型
-        env = self._get_environment()
+        if self.collection_mode in ("parallel", "pipeline"):
+            travel_info = await self.collect_travel_info_parallel(travel_request, progress_callback, issues)
+            return json.dumps(asdict(travel_info), ensure_ascii=False, indent=2)
+        
+        # 获取模型（搜索工具的环境变量在 _search_tools 中设置）
         model = self._get_model()
         
-        async with MultiMCPTools(
-            ["python /mnt/public/code/zzy/wzh/doremi/searchAPI-mcp/mcp_server.py"],
-            env=env,
-        ) as mcp_tools:
+        async with self._search_tools() as mcp_tools:
             
             if progress_callback:
                 progress_callback(2, 8, "信息收集智能体开始工作...")
@@ -172,7 +505,8 @@ class MultiAgentTravelPlanner:
                 progress_callback(3, 8, "正在搜索目的地信息...")
             
             # 运行信息收集智能体
-            collection_result = await collector_agent.arun(collection_request)
+            async with self._collection_semaphore():
+                collection_result = await collector_agent.arun(collection_request)
             
             if progress_callback:
                 progress_callback(4, 8, "信息收集完成！")
@@ -185,44 +519,136 @@ class MultiAgentTravelPlanner:
             else:
                 return str(collection_result)
     
-    async def create_detailed_itinerary(self, travel_request: str, collected_info: str, progress_callback=None):
+    async def _collect_category(self, field: str, travel_request: str, mcp_tools, semaphore: asyncio.Semaphore,
+                                issues: Optional[List[str]] = None):
+        """由子智能体收集单个类别的信息，返回解析后的字典，校验问题追加到 issues"""
+        issues = [] if issues is None else issues
+        label, task, output_format = COLLECTION_CATEGORIES[field]
+        
+        async with semaphore:
+            category_agent = Agent(
+                tools=[mcp_tools],
+                model=self._get_model(),
+                name=f"{label}收集专家",
+                instructions=CATEGORY_COLLECTOR_PROMPT,
+                goal=f"收集{label}"
+            )
+            
+            category_request = f"""
+            用户的旅行需求：
+            {travel_request}
+            
+            你负责的类别：{label}
+            收集内容：{task}
+            
+            请只输出以下格式的 JSON 对象：
+            {output_format}
+            """
+            
+            result = await category_agent.arun(category_request)
+        
+        content = result.content if hasattr(result, 'content') else str(result)
+        data, _ = parse_json_output(content)
+        if data is None:
+            # 无法解析为 JSON 时保留原文，避免丢失已收集的信息
+            issues.append(f"{field} 无法从输出中解析出 JSON，已保存在 raw 字段中")
+            return {"raw": content}
+        # 子智能体有时会把内容包在类别名下
+        if len(data) == 1 and field in data:
+            data = data[field]
+        sections, section_issues = validate_travel_info({field: data}, [field])
+        issues.extend(section_issues)
+        return sections[field] or {}
+    
+    def _collection_semaphore(self) -> asyncio.Semaphore:
+        """信息收集的并发限制：优先使用共享的 collection_semaphore，否则每次收集单独创建"""
+        return self.collection_semaphore or asyncio.Semaphore(max(COLLECTION_MAX_CONCURRENCY, 1))
+    
+    def _start_collection_tasks(self, travel_request: str, mcp_tools, progress_callback=None,
+                                priority=(), issues: Optional[List[str]] = None) -> Dict[str, asyncio.Task]:
         """
-        使用行程规划智能体制定详细行程
+        为每个类别启动一个收集任务，返回 TravelInfo 字段 -> 任务
+        
+        并发数不超过 COLLECTION_MAX_CONCURRENCY，priority 中的类别优先获得并发名额；
+        单个类别失败时任务返回 {"error": ...}，不影响其他类别。各类别的校验问题和
+        失败原因追加到 issues。
+        """
+        issues = [] if issues is None else issues
+        fields = [*priority, *(field for field in COLLECTION_CATEGORIES if field not in priority)]
+        semaphore = self._collection_semaphore()
+        completed = 0
+        
+        async def collect(field):
+            nonlocal completed
+            try:
+                return await self._collect_category(field, travel_request, mcp_tools, semaphore, issues)
+            except Exception as e:
+                issues.append(f"{field} 收集失败: {e}")
+                return {"error": str(e)}
+            finally:
+                completed += 1
+                if progress_callback:
+                    label = COLLECTION_CATEGORIES[field][0]
+                    progress_callback(3, 8, f"已完成{label}收集（{completed}/{len(fields)}）")
+        
+        return {field: asyncio.create_task(collect(field)) for field in fields}
+    
+    async def collect_travel_info_parallel(self, travel_request: str, progress_callback=None,
+                                           issues: Optional[List[str]] = None) -> TravelInfo:
+        """
+        并行收集各类别的旅行信息
+        
+        每个 TravelInfo 类别由一个子智能体负责，所有子智能体共享同一个搜索工具会话，
+        并发数不超过 COLLECTION_MAX_CONCURRENCY。单个类别失败不影响其他类别，
+        失败的类别以 {"error": ...} 记录。
         
         Args:
-            travel_request: 原始旅行请求
-            collected_info: 收集到的旅行信息
+            travel_request: 用户的旅行请求
             progress_callback: 进度回调函数
+            issues: 可选列表，各类别的校验问题和失败原因追加到其中
             
         Returns:
-            str: 详细的旅行行程方案
+            TravelInfo: 合并后的旅行信息
         """
-        if progress_callback:
-            progress_callback(5, 8, "正在启动行程规划智能体...")
+        self._validate_keys()
         
-        # 获取模型（不需要重新验证密钥和环境）
-        model = self._get_model()
+        async with self._search_tools() as mcp_tools:
+            if progress_callback:
+                progress_callback(2, 8, f"{len(COLLECTION_CATEGORIES)} 个信息收集子智能体开始并行工作...")
+            
+            tasks = self._start_collection_tasks(travel_request, mcp_tools, progress_callback, issues=issues)
+            results = await asyncio.gather(*tasks.values())
         
         if progress_callback:
-            progress_callback(6, 8, "行程规划智能体开始制定方案...")
+            progress_callback(4, 8, "信息收集完成！")
         
-        # 创建行程规划智能体（不需要搜索工具，基于已收集的信息进行规划）
-        planner_agent = Agent(
-            model=model,
+        return TravelInfo(**dict(zip(tasks, results)))
+    
+    def _create_planner_agent(self):
+        """创建行程规划智能体（不需要搜索工具，基于已收集的信息进行规划）"""
+        return Agent(
+            model=self._get_model(),
             name="旅行行程规划专家",
             instructions=ITINERARY_PLANNER_PROMPT,
             goal="基于收集的信息制定详细、实用的旅行行程方案"
         )
-        
-        # 构建行程规划请求
-        planning_request = f"""
+    
+    def _build_planning_request(self, travel_request: str, collected_info, travel_info=None) -> str:
+        """构建行程规划请求，travel_info 为 collected_info 已解析的结果，省略时在这里解析"""
+        if travel_info is None:
+            travel_info, _ = parse_travel_info(collected_info)
+        if isinstance(collected_info, TravelInfo):
+            collected_info = collected_info.to_dict()
+        # 能解析出结构化信息时按类别压缩，否则按原文压缩（收集结果不是 JSON 时原文就是全部信息）
+        context = compress_collected_info(travel_info.to_dict() or collected_info)
+        return f"""
         基于以下收集到的详细旅行信息，请制定一个完整的旅行行程方案。
 
         ## 用户的旅行需求：
         {travel_request}
 
         ## 收集到的详细旅行信息：
-        {collected_info}
+        {context}
 
         请基于以上信息制定一个详细、实用的旅行方案，包括：
 
@@ -266,6 +692,119 @@ class MultiAgentTravelPlanner:
 
         请确保方案具体可行，包含足够的细节供用户直接执行。
         """
+    
+    def _build_draft_request(self, travel_request: str, draft_info: Dict[str, Any]) -> str:
+        """构建流水线规划第一步的日程骨架请求（航班、住宿信息尚未到达）"""
+        return f"""
+        航班和住宿信息仍在收集中，请先基于已收集的信息起草旅行方案的以下章节。
+
+        ## 用户的旅行需求：
+        {travel_request}
+
+        ## 已收集的信息（目的地、景点、天气）：
+        {compress_collected_info(draft_info)}
+
+        请只输出以下章节，每个章节以 ### 标题开头：
+
+        ### 📅 详细日程安排
+        - 按天分解的活动安排：时间、景点游览、交通方式、预估费用
+        - 第一天和最后一天的到达、离开时间写作"待航班确认"，用餐写作"待餐饮推荐"
+
+        ### 📝 实用信息与注意事项
+        - 天气和穿着建议、当地习俗和注意事项、安全提醒
+
+        ### 🔄 备选方案
+        - 雨天或突发情况的备选活动
+        """
+    
+    def _build_completion_request(self, travel_request: str, draft: str, late_info: Dict[str, Any]) -> str:
+        """构建流水线规划第二步的补全请求，只生成依赖航班、住宿等信息的章节"""
+        return f"""
+        旅行方案的日程骨架已经完成，现在航班、住宿、餐饮和交通信息已收集完毕，
+        请补全方案中依赖这些信息的章节。
+
+        ## 用户的旅行需求：
+        {travel_request}
+
+        ## 已完成的日程骨架：
+        {draft}
+
+        ## 新收集的信息：
+        {compress_collected_info(late_info)}
+
+        请只输出以下章节，每个章节以 ### 标题开头，不要重复日程骨架的内容：
+
+        ### 🛫 航班预订建议
+        - 具体推荐的航班信息（航班号、时间、价格、预订建议）
+
+        ### 🏨 住宿安排
+        - 根据用户偏好和预算推荐的住宿，包含价格、位置和预订建议
+
+        ### 📅 日程调整
+        - 根据航班时间和酒店位置，列出第一天、最后一天以及其他需要调整的具体安排
+
+        ### 🍽️ 餐饮推荐
+        - 每天各餐的具体餐厅推荐、特色菜品和价格区间
+
+        ### 🚗 交通安排
+        - 机场往返、日常出行方案和交通费用
+
+        ### 💰 详细预算分解
+        - 各项费用的详细分解，确保总费用在用户预算范围内
+        """
+    
+    def _build_price_refresh_request(self, travel_request: str, itinerary: str, price_info: Dict[str, Any]) -> str:
+        """构建缓存方案的价格刷新请求，只重新生成航班、住宿和预算章节"""
+        return f"""
+        以下旅行方案来自缓存，航班和酒店的价格可能已经变化。请根据最新收集的航班和酒店信息，
+        重新生成方案中与价格相关的章节，日程安排等其他章节保持不变。
+
+        ## 用户的旅行需求：
+        {travel_request}
+
+        ## 现有旅行方案：
+        {compress_text(itinerary, FOLLOW_UP_CONTEXT_TOKEN_BUDGET)}
+
+        ## 最新的航班和酒店信息：
+        {compress_collected_info(price_info)}
+
+        请只输出以下章节，每个章节以 ### 标题开头：
+
+        ### 🛫 航班预订建议
+        - 具体推荐的航班信息（航班号、时间、价格、预订建议）
+
+        ### 🏨 住宿安排
+        - 根据用户偏好和预算推荐的住宿，包含价格、位置和预订建议
+
+        ### 💰 详细预算分解
+        - 按最新价格重新计算的各项费用，确保总费用在用户预算范围内
+        """
+    
+    async def create_detailed_itinerary(self, travel_request: str, collected_info, progress_callback=None,
+                                        travel_info=None):
+        """
+        使用行程规划智能体制定详细行程
+        
+        Args:
+            travel_request: 原始旅行请求
+            collected_info: 收集到的旅行信息（文本或 TravelInfo）
+            progress_callback: 进度回调函数
+            travel_info: collected_info 已解析的 TravelInfo，省略时重新解析
+            
+        Returns:
+            str: 详细的旅行行程方案
+        """
+        if progress_callback:
+            progress_callback(5, 8, "正在启动行程规划智能体...")
+        
+        # 创建行程规划智能体
+        planner_agent = self._create_planner_agent()
+        
+        if progress_callback:
+            progress_callback(6, 8, "行程规划智能体开始制定方案...")
+        
+        # 构建行程规划请求
+        planning_request = self._build_planning_request(travel_request, collected_info, travel_info)
         
         if progress_callback:
             progress_callback(7, 8, "正在制定详细行程方案...")
@@ -284,27 +823,358 @@ class MultiAgentTravelPlanner:
         else:
             return str(planning_result)
     
-    async def plan_travel_with_multi_agents(self, message: str, progress_callback=None):
+    async def stream_detailed_itinerary(self, travel_request: str, collected_info, progress_callback=None,
+                                        travel_info=None):
+        """
+        以流式方式制定详细行程
+        
+        Args:
+            travel_request: 原始旅行请求
+            collected_info: 收集到的旅行信息（文本或 TravelInfo）
+            progress_callback: 进度回调函数
+            travel_info: collected_info 已解析的 TravelInfo，省略时重新解析
+            
+        Yields:
+            dict: agent_streaming 定义的 content / tool_call / done 事件
+        """
+        if progress_callback:
+            progress_callback(5, 8, "正在启动行程规划智能体...")
+        
+        planner_agent = self._create_planner_agent()
+        planning_request = self._build_planning_request(travel_request, collected_info, travel_info)
+        
+        if progress_callback:
+            progress_callback(6, 8, "行程规划智能体正在生成方案...")
+        
+        async for event in stream_agent_run(planner_agent, planning_request):
+            if event["type"] == "done" and progress_callback:
+                progress_callback(8, 8, "详细旅行方案制定完成！")
+            yield event
+    
+    def _cache_namespace(self) -> str:
+        return f"multi_agent:{self.model_provider}"
+    
+    async def _load_cached_plan(self, message: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的规划结果，返回与 plan_travel_with_multi_agents 相同结构的字典"""
+        plan_cache = get_plan_cache()
+        cached = await plan_cache.aget(self._cache_namespace(), message) if plan_cache else None
+        if cached is None:
+            return None
+        travel_info, validation_issues = parse_travel_info(cached['collected_info'])
+        return {
+            'collected_info': cached['collected_info'],
+            'travel_info': travel_info,
+            'validation_issues': validation_issues,
+            'detailed_itinerary': cached['detailed_itinerary'],
+            'cached': True,
+            'cache_age_seconds': cached['cache_age_seconds'],
+            'success': True
+        }
+    
+    async def _store_plan(self, message: str, result: Dict[str, Any]) -> None:
+        """缓存规划结果，只保存收集信息原文和行程方案"""
+        plan_cache = get_plan_cache()
+        if plan_cache and result.get('detailed_itinerary'):
+            await plan_cache.aset(self._cache_namespace(), message, {
+                'collected_info': result['collected_info'],
+                'detailed_itinerary': result['detailed_itinerary'],
+            })
+    
+    async def refresh_price_sections(self, message: str, cached: Dict[str, Any], progress_callback=None):
+        """
+        刷新缓存方案中的价格敏感章节
+        
+        只重新收集 PRICE_SENSITIVE_FIELDS 类别，并重新生成航班、住宿和预算章节替换到
+        缓存方案中，其余章节和信息沿用缓存。刷新后的结果重新写入缓存。
+        
+        Args:
+            message: 用户的旅行规划请求消息
+            cached: _load_cached_plan 返回的缓存结果
+            progress_callback: 进度回调函数
+            
+        Returns:
+            dict: 与 plan_travel_with_multi_agents 相同结构的字典
+        """
+        self._validate_keys()
+        
+        async with self._session_scope():
+            async with self._search_tools() as mcp_tools:
+                if progress_callback:
+                    progress_callback(2, 8, "使用缓存方案，正在重新查询航班和酒店价格...")
+                semaphore = self._collection_semaphore()
+                results = await asyncio.gather(
+                    *(self._collect_category(field, message, mcp_tools, semaphore) for field in PRICE_SENSITIVE_FIELDS),
+                    return_exceptions=True
+                )
+            price_info = {
+                field: {"error": str(result)} if isinstance(result, Exception) else result
+                for field, result in zip(PRICE_SENSITIVE_FIELDS, results)
+            }
+            
+            if progress_callback:
+                progress_callback(6, 8, "正在更新航班、住宿和预算章节...")
+            request = self._build_price_refresh_request(message, cached['detailed_itinerary'], price_info)
+            refresh_result = await self._create_planner_agent().arun(request)
+        
+        updates = refresh_result.content if hasattr(refresh_result, 'content') else str(refresh_result)
+        # 只接受价格相关的章节，避免模型改写其他章节
+        updates = "\n\n".join(
+            f"### {heading}\n{body}" for heading, body in split_markdown_sections(updates)
+            if any(keyword in heading for keyword in PRICE_SENSITIVE_SECTIONS)
+        )
+        travel_info = TravelInfo(**{**cached['travel_info'].to_dict(), **price_info})
+        result = {
+            **cached,
+            'collected_info': json.dumps(asdict(travel_info), ensure_ascii=False, indent=2),
+            'travel_info': travel_info,
+            'detailed_itinerary': replace_itinerary_sections(cached['detailed_itinerary'], updates),
+            'cache_age_seconds': 0,
+            'prices_refreshed': True
+        }
+        await self._store_plan(message, result)
+        
+        if progress_callback:
+            progress_callback(8, 8, "价格信息已更新！")
+        return result
+    
+    async def plan_travel_with_multi_agents(self, message: str, progress_callback=None,
+                                            use_cache=True, refresh_prices=False):
         """
         使用多智能体系统完成完整的旅行规划
         
         Args:
             message: 用户的旅行规划请求消息
             progress_callback: 可选的进度回调函数
+            use_cache: 是否使用规划结果缓存，命中时直接返回缓存方案
+            refresh_prices: 命中缓存时是否重新查询航班、酒店价格并更新相关章节
             
         Returns:
-            dict: 包含详细信息收集结果和完整行程方案的字典
+            dict: 包含详细信息收集结果和完整行程方案的字典，命中缓存时 cached 为 True
         """
         try:
-            # 第一阶段：信息收集
-            collected_info = await self.collect_travel_information(message, progress_callback)
+            cached = await self._load_cached_plan(message) if use_cache else None
+            if cached is not None:
+                if refresh_prices:
+                    return await self.refresh_price_sections(message, cached, progress_callback)
+                if progress_callback:
+                    progress_callback(8, 8, "已使用缓存的旅行方案！")
+                return cached
+            
+            if self.collection_mode == "pipeline":
+                result = await self.plan_travel_pipelined(message, progress_callback)
+            else:
+                # 两个阶段共享同一个搜索工具会话和模型客户端
+                async with self._session_scope():
+                    # 第一阶段：信息收集
+                    collection_issues = []
+                    collected_info = await self.collect_travel_information(message, progress_callback,
+                                                                           collection_issues)
+                    
+                    travel_info, validation_issues = parse_travel_info(collected_info)
+                    validation_issues = merge_validation_issues(collection_issues, validation_issues)
+                    
+                    # 第二阶段：行程规划
+                    detailed_itinerary = await self.create_detailed_itinerary(message, collected_info, progress_callback,
+                                                                              travel_info)
+                
+                result = {
+                    'collected_info': collected_info,
+                    'travel_info': travel_info,
+                    'validation_issues': validation_issues,
+                    'detailed_itinerary': detailed_itinerary,
+                    'success': True
+                }
             
-            # 第二阶段：行程规划
-            detailed_itinerary = await self.create_detailed_itinerary(message, collected_info, progress_callback)
+            if use_cache and result['success']:
+                await self._store_plan(message, result)
+            return result
             
+        except Exception as e:
             return {
-                'collected_info': collected_info,
-                'detailed_itinerary': detailed_itinerary,
+                'error': str(e),
+                'success': False
+            }
+    
+    async def stream_travel_with_multi_agents(self, message: str, progress_callback=None,
+                                              use_cache=True, refresh_prices=False):
+        """
+        以流式方式完成完整的旅行规划
+        
+        信息收集阶段的结果不直接展示，完成后流式产出行程规划内容。最后的 done 事件
+        额外包含 collected_info、travel_info 和 validation_issues；出错时产出 {"type": "error", "error": ...} 后结束。
+        命中缓存时一次性产出缓存方案，done 事件的 cached 为 True。
+        
+        Args:
+            message: 用户的旅行规划请求消息
+            progress_callback: 可选的进度回调函数
+            use_cache: 是否使用规划结果缓存
+            refresh_prices: 命中缓存时是否重新查询航班、酒店价格并更新相关章节
+            
+        Yields:
+            dict: agent_streaming 定义的事件
+        """
+        try:
+            cached = await self._load_cached_plan(message) if use_cache else None
+            if cached is not None:
+                if refresh_prices:
+                    cached = await self.refresh_price_sections(message, cached, progress_callback)
+                elif progress_callback:
+                    progress_callback(8, 8, "已使用缓存的旅行方案！")
+                yield {"type": "content", "delta": cached['detailed_itinerary']}
+                yield {
+                    "type": "done",
+                    "content": cached['detailed_itinerary'],
+                    "first_token_seconds": None,
+                    **{key: value for key, value in cached.items() if key not in ('detailed_itinerary', 'success')},
+                }
+                return
+            
+            async with self._session_scope():
+                if self.collection_mode == "pipeline":
+                    events = self._stream_pipelined(message, progress_callback)
+                else:
+                    events = self._stream_sequential(message, progress_callback)
+                async for event in events:
+                    if event["type"] == "done" and use_cache:
+                        await self._store_plan(message, {
+                            'collected_info': event['collected_info'],
+                            'detailed_itinerary': event['content'],
+                        })
+                    yield event
+        except Exception as e:
+            yield {"type": "error", "error": str(e)}
+    
+    async def _stream_sequential(self, message: str, progress_callback=None):
+        """先完成信息收集，再流式生成行程方案的事件流"""
+        collection_issues = []
+        collected_info = await self.collect_travel_information(message, progress_callback, collection_issues)
+        travel_info, validation_issues = parse_travel_info(collected_info)
+        validation_issues = merge_validation_issues(collection_issues, validation_issues)
+        
+        async for event in self.stream_detailed_itinerary(message, collected_info, progress_callback, travel_info):
+            if event["type"] == "done":
+                event = {
+                    **event,
+                    "collected_info": collected_info,
+                    "travel_info": travel_info,
+                    "validation_issues": validation_issues,
+                }
+            yield event
+    
+    async def _stream_pipelined(self, message: str, progress_callback=None):
+        """
+        流水线规划的事件流
+        
+        各类别并行收集；PIPELINE_DRAFT_FIELDS 到齐后立即起草日程骨架（与航班、酒店等
+        类别的收集同时进行），全部类别到齐后只生成依赖这些信息的章节，最后按章节合并。
+        起草和补全阶段的文本片段依次产出，done 事件包含合并后的完整方案和 collected_info。
+        """
+        started = time.monotonic()
+        first_token_seconds = None
+        timings = {}
+        validation_issues = []
+        self._validate_keys()
+        
+        async with self._search_tools() as mcp_tools:
+            if progress_callback:
+                progress_callback(2, 8, f"{len(COLLECTION_CATEGORIES)} 个信息收集子智能体开始并行工作...")
+            
+            tasks = self._start_collection_tasks(message, mcp_tools, progress_callback, PIPELINE_DRAFT_FIELDS,
+                                                 validation_issues)
+            draft_events = asyncio.Queue()
+            draft_task = None
+            
+            async def run_draft(draft_info):
+                try:
+                    request = self._build_draft_request(message, draft_info)
+                    async for event in stream_agent_run(self._create_planner_agent(), request):
+                        draft_events.put_nowait(event)
+                finally:
+                    draft_events.put_nowait(None)
+            
+            try:
+                draft_info = {field: await tasks[field] for field in PIPELINE_DRAFT_FIELDS}
+                timings["draft_ready_seconds"] = round(time.monotonic() - started, 3)
+                if progress_callback:
+                    progress_callback(5, 8, "基础信息已就绪，行程规划智能体开始起草日程...")
+                
+                # 起草日程骨架的同时，航班、酒店等类别继续收集
+                draft_task = asyncio.create_task(run_draft(draft_info))
+                draft = ""
+                while True:
+                    event = await draft_events.get()
+                    if event is None:
+                        break
+                    if event["type"] == "done":
+                        draft = event["content"]
+                    else:
+                        if event["type"] == "content" and first_token_seconds is None:
+                            first_token_seconds = round(time.monotonic() - started, 3)
+                        yield event
+                await draft_task
+                timings["draft_done_seconds"] = round(time.monotonic() - started, 3)
+                
+                results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+                timings["collection_done_seconds"] = round(time.monotonic() - started, 3)
+            finally:
+                for task in [*tasks.values(), draft_task]:
+                    if task is not None and not task.done():
+                        task.cancel()
+        
+        if progress_callback:
+            progress_callback(6, 8, "信息收集完成，正在补全航班、住宿等章节...")
+        
+        late_info = {field: value for field, value in results.items() if field not in PIPELINE_DRAFT_FIELDS}
+        request = self._build_completion_request(message, draft, late_info)
+        completion = ""
+        yield {"type": "content", "delta": "\n\n"}
+        async for event in stream_agent_run(self._create_planner_agent(), request):
+            if event["type"] == "done":
+                completion = event["content"]
+            else:
+                if event["type"] == "content" and first_token_seconds is None:
+                    first_token_seconds = round(time.monotonic() - started, 3)
+                yield event
+        timings["total_seconds"] = round(time.monotonic() - started, 3)
+        
+        if progress_callback:
+            progress_callback(8, 8, "详细旅行方案制定完成！")
+        
+        travel_info = TravelInfo(**results)
+        yield {
+            "type": "done",
+            "content": merge_itinerary_sections(draft, completion),
+            "first_token_seconds": first_token_seconds,
+            "collected_info": json.dumps(asdict(travel_info), ensure_ascii=False, indent=2),
+            "travel_info": travel_info,
+            "validation_issues": merge_validation_issues(validation_issues),
+            "timings": timings,
+        }
+    
+    async def plan_travel_pipelined(self, message: str, progress_callback=None):
+        """
+        以流水线方式完成旅行规划
+        
+        Args:
+            message: 用户的旅行规划请求消息
+            progress_callback: 可选的进度回调函数
+            
+        Returns:
+            dict: 与 plan_travel_with_multi_agents 相同，另含各阶段耗时 timings
+        """
+        try:
+            async with self._session_scope():
+                result = None
+                async for event in self._stream_pipelined(message, progress_callback):
+                    if event["type"] == "done":
+                        result = event
+            
+            return {
+                'collected_info': result['collected_info'],
+                'travel_info': result['travel_info'],
+                'validation_issues': result['validation_issues'],
+                'detailed_itinerary': result['content'],
+                'timings': result['timings'],
                 'success': True
             }
             
@@ -314,7 +1184,8 @@ class MultiAgentTravelPlanner:
                 'success': False
             }
     
-    async def handle_follow_up_question(self, question: str, travel_context: dict, progress_callback=None):
+    async def handle_follow_up_question(self, question: str, travel_context: dict, progress_callback=None,
+                                        use_cache=True):
         """
         处理基于现有旅行计划的追问
         
@@ -322,6 +1193,7 @@ class MultiAgentTravelPlanner:
             question: 用户的追问
             travel_context: 旅行上下文信息
             progress_callback: 进度回调函数
+            use_cache: 是否使用回答缓存，同一份计划下相同或相近的问题直接复用已有回答
             
         Returns:
             str: 针对追问的详细回答
@@ -329,80 +1201,110 @@ class MultiAgentTravelPlanner:
         if progress_callback:
             progress_callback(1, 4, "正在分析您的问题...")
         
+        answer_cache = get_answer_cache() if use_cache else None
+        if answer_cache is not None:
+            plan_key = plan_fingerprint(travel_context)
+            cached = answer_cache.get(plan_key, question)
+            if cached is not None:
+                if progress_callback:
+                    progress_callback(4, 4, "已复用相同问题的回答！")
+                return cached['answer']
+        
         # 验证API密钥
         self._validate_keys()
         
-        # 获取环境变量和模型
-        env = self._get_environment()
+        # 获取模型（搜索工具的环境变量在 _search_tools 中设置）
         model = self._get_model()
         
-        # 根据问题类型决定是否需要搜索工具
-        needs_search = any(keyword in question.lower() for keyword in [
-            '搜索', '查找', '推荐更多', '其他选择', '最新', '价格', '评价', 
-            '替代', '附近', '比较', '更好的', '便宜', '高档', '最佳'
-        ])
+        # 收集信息只保留与问题相关的类别，再把旅行上下文压缩到追问的 token 预算以内
+        available_sections = None
+        if isinstance(travel_context, dict) and travel_context.get('collected_info'):
+            travel_info, _ = parse_travel_info(travel_context['collected_info'])
+            available_sections = travel_info.to_dict().keys()
+            if not travel_info.is_empty():
+                travel_context = {**travel_context, 'collected_info': travel_info.sections_for_question(question)}
+        context = compress_travel_context(travel_context)
         
-        if needs_search:
+        # 本地判断问题意图，选择代价最低的处理方式和需要的搜索工具
+        route = route_follow_up(question, available_sections)
+        if progress_callback:
+            progress_callback(1, 4, f"问题类型：{route.label}")
+        
+        if route.intent == INTENT_REPLAN:
+            # 调整日程由规划智能体完成，只输出需要修改的部分
+            instructions = ITINERARY_PLANNER_PROMPT
+            goal = "根据用户的要求调整旅行计划中的日程安排"
+            follow_up_request = f"""
+            用户的旅行计划上下文信息：
+            {context}
+            
+            用户希望调整的内容：
+            {question}
+            
+            请只重新安排用户提到的日期或时段，输出调整后的完整安排（以 ### 标题开头），
+            并简要说明调整了哪些内容以及对交通和预算的影响，其余日程保持不变。
+            """
+        elif route.needs_search:
+            instructions = FOLLOW_UP_AGENT_PROMPT
+            goal = "为用户的旅行计划追问提供专业、详细的咨询服务"
+            follow_up_request = f"""
+            用户的旅行计划上下文信息：
+            {context}
+            
+            用户的具体问题：
+            {question}
+            
+            请基于上述旅行计划上下文，针对用户的问题提供详细、实用的回答。
+            如果需要最新信息，请主动搜索获取。
+            """
+        else:
+            instructions = FOLLOW_UP_NO_SEARCH_PROMPT
+            goal = "为用户提供基于现有计划的专业咨询"
+            follow_up_request = f"""
+            基于以下旅行计划上下文，请回答用户的问题：
+            
+            旅行计划上下文：
+            {context}
+            
+            用户问题：
+            {question}
+            
+            请提供详细、实用的回答。
+            """
+        
+        if route.needs_search:
             if progress_callback:
                 progress_callback(2, 4, "正在搜索最新信息...")
             
-            async with MultiMCPTools(
-                ["python /mnt/public/code/zzy/wzh/doremi/searchAPI-mcp/mcp_server.py"],
-                env=env,
-            ) as mcp_tools:
-                # 使用带搜索工具的智能体
+            async with self._search_tools() as mcp_tools:
+                # 只暴露与问题相关的搜索工具
                 follow_up_agent = Agent(
-                    tools=[mcp_tools],
+                    tools=[select_search_tools(mcp_tools, route.tools)],
                     model=model,
                     name="旅行咨询专家",
-                    instructions=FOLLOW_UP_AGENT_PROMPT,
-                    goal="为用户的旅行计划追问提供专业、详细的咨询服务"
+                    instructions=instructions,
+                    goal=goal
                 )
                 
                 if progress_callback:
                     progress_callback(3, 4, "正在生成详细回答...")
                 
-                # 构建追问处理请求
-                follow_up_request = f"""
-                用户的旅行计划上下文信息：
-                {travel_context}
-                
-                用户的具体问题：
-                {question}
-                
-                请基于上述旅行计划上下文，针对用户的问题提供详细、实用的回答。
-                如果需要最新信息，请主动搜索获取。
-                """
-                
                 result = await follow_up_agent.arun(follow_up_request)
         else:
             if progress_callback:
                 progress_callback(2, 4, "正在分析现有计划...")
             
-            # 不需要搜索的问题，直接基于现有信息回答
+            # 不需要搜索的问题，不连接搜索工具
             follow_up_agent = Agent(
                 model=model,
                 name="旅行咨询专家",
-                instructions=FOLLOW_UP_NO_SEARCH_PROMPT,
-                goal="为用户提供基于现有计划的专业咨询"
+                instructions=instructions,
+                goal=goal
             )
             
             if progress_callback:
                 progress_callback(3, 4, "正在生成专业建议...")
             
-            # 构建基于现有信息的回答请求
-            follow_up_request = f"""
-            基于以下旅行计划上下文，请回答用户的问题：
-            
-            旅行计划上下文：
-            {travel_context}
-            
-            用户问题：
-            {question}
-            
-            请提供详细、实用的回答。
-            """
-            
             result = await follow_up_agent.arun(follow_up_request)
         
         if progress_callback:
@@ -410,11 +1312,15 @@ class MultiAgentTravelPlanner:
         
         # 获取回答结果
         if hasattr(result, 'content'):
-            return result.content
+            answer = result.content
         elif hasattr(result, 'messages') and result.messages:
-            return result.messages[-1].content if hasattr(result.messages[-1], 'content') else str(result.messages[-1])
+            answer = result.messages[-1].content if hasattr(result.messages[-1], 'content') else str(result.messages[-1])
         else:
-            return str(result)
+            answer = str(result)
+        
+        if answer_cache is not None:
+            answer_cache.set(plan_key, question, answer)
+        return answer
 
 
 def build_travel_message(source, destination, travel_dates, budget, travel_preferences, 
@@ -466,7 +1372,7 @@ def build_context_message(travel_plan, travel_context, user_question):
     end_date = travel_dates[1] if isinstance(travel_dates, list) and len(travel_dates) > 1 else '未设定'
     
     return CONTEXT_MESSAGE_TEMPLATE.format(
-        travel_plan=travel_plan,
+        travel_plan=compress_text(travel_plan or '', FOLLOW_UP_CONTEXT_TOKEN_BUDGET),
         source=travel_context.get('source', '未设定'),
         destination=travel_context.get('destination', '未设定'),
         start_date=start_date,
@@ -507,7 +1413,7 @@ async def run_multi_agent_travel_planner(message: str, model_provider="OpenAI",
 # 异步处理追问的便捷函数
 async def handle_multi_agent_follow_up(question: str, travel_context: dict, 
                                      model_provider="OpenAI", openai_key=None, gemini_key=None, 
-                                     searchapi_key=None, progress_callback=None):
+                                     searchapi_key=None, progress_callback=None, use_cache=True):
     """
     处理多智能体系统的追问
     
@@ -519,6 +1425,7 @@ async def handle_multi_agent_follow_up(question: str, travel_context: dict,
         gemini_key: Gemini API密钥
         searchapi_key: SearchAPI密钥
         progress_callback: 进度回调函数
+        use_cache: 是否使用回答缓存
         
     Returns:
         str: 追问的详细回答
@@ -530,4 +1437,226 @@ async def handle_multi_agent_follow_up(question: str, travel_context: dict,
         searchapi_key=searchapi_key
     )
     
-    return await planner.handle_follow_up_question(question, travel_context, progress_callback)
\ No newline at end of file
+    return await planner.handle_follow_up_question(question, travel_context, progress_callback, use_cache)
+
+class _PlannerRuntime:
+    """后台线程中的常驻事件循环及其中打开的 MultiAgentTravelPlanner，由相同凭据的 PlannerSession 共享"""
+
+    def __init__(self, key, model_provider, openai_key, gemini_key, searchapi_key):
+        self.key = key
+        self.refs = 0
+        self.planner = MultiAgentTravelPlanner(
+            model_provider=model_provider,
+            openai_key=openai_key,
+            gemini_key=gemini_key,
+            searchapi_key=searchapi_key
+        )
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="planner-session", daemon=True)
+        self.thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self.planner.open(), self.loop).result()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        """关闭规划器并停止后台事件循环"""
+        try:
+            asyncio.run_coroutine_threadsafe(self.planner.close(), self.loop).result(timeout=30)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+            if not self.thread.is_alive():
+                self.loop.close()
+
+
+# 凭据摘要 -> 共享的规划器运行环境
+_runtimes: Dict[str, _PlannerRuntime] = {}
+_runtimes_lock = threading.Lock()
+
+
+def _runtime_key(model_provider, openai_key, gemini_key, searchapi_key) -> str:
+    """按模型和密钥区分运行环境（不以明文保存密钥）"""
+    raw = json.dumps([model_provider, openai_key, gemini_key, searchapi_key])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _acquire_runtime(model_provider, openai_key, gemini_key, searchapi_key) -> _PlannerRuntime:
+    """获取相同凭据的共享运行环境（不存在时创建），引用计数加一"""
+    key = _runtime_key(model_provider, openai_key, gemini_key, searchapi_key)
+    with _runtimes_lock:
+        runtime = _runtimes.get(key)
+        if runtime is None:
+            runtime = _PlannerRuntime(key, model_provider, openai_key, gemini_key, searchapi_key)
+            _runtimes[key] = runtime
+        runtime.refs += 1
+        return runtime
+
+
+def _release_runtime(runtime: _PlannerRuntime, wait: bool = True) -> None:
+    """引用计数减一，最后一个会话释放后关闭运行环境"""
+    with _runtimes_lock:
+        runtime.refs -= 1
+        if runtime.refs > 0:
+            return
+        if _runtimes.get(runtime.key) is runtime:
+            del _runtimes[runtime.key]
+    if wait and threading.current_thread() is not runtime.thread:
+        runtime.close()
+    else:
+        # 由垃圾回收触发时可能正处于该运行环境的线程中，不能同步等待关闭
+        threading.Thread(target=runtime.close, name="planner-session-close", daemon=True).start()
+
+
+class PlannerSession:
+    """
+    同步调用的规划会话
+
+    Streamlit 等同步环境每次 asyncio.run 都会创建新的事件循环，无法跨调用复用
+    搜索工具会话和模型客户端。PlannerSession 在后台线程中运行一个常驻事件循环，
+    规划和追问都在该循环中执行，从而共享同一个已打开的 MultiAgentTravelPlanner。
+
+    同一进程内使用相同模型和密钥的会话共享同一个后台线程、事件循环、搜索工具连接和
+    模型客户端（按引用计数管理），快捷问题预取等状态仍属于各自的会话。最后一个会话
+    调用 close() 或被垃圾回收（如浏览器会话结束）后，共享的运行环境随之关闭。
+    """
+
+    def __init__(self, model_provider="OpenAI", openai_key=None, gemini_key=None, searchapi_key=None):
+        self._runtime = _acquire_runtime(
+            model_provider,
+            openai_key or get_api_key("openai_key"),
+            gemini_key or get_api_key("gemini_key"),
+            searchapi_key or get_api_key("searchapi_key")
+        )
+        self.planner = self._runtime.planner
+        self._loop = self._runtime.loop
+        self._closed = False
+        self._prefetcher = None
+        self._prefetch_key = None
+        self._finalizer = weakref.finalize(self, _release_runtime, self._runtime, False)
+
+    def matches(self, model_provider, openai_key=None, gemini_key=None, searchapi_key=None) -> bool:
+        """判断会话是否使用相同的模型和密钥创建"""
+        return (
+            not self._closed
+            and self.planner.model_provider == model_provider
+            and self.planner.openai_key == (openai_key or get_api_key("openai_key"))
+            and self.planner.gemini_key == (gemini_key or get_api_key("gemini_key"))
+            and self.planner.searchapi_key == (searchapi_key or get_api_key("searchapi_key"))
+        )
+
+    def _run(self, method, *args, progress_callback=None, **kwargs):
+        """在后台事件循环中运行规划器方法，进度回调在调用方线程中执行"""
+        if self._closed:
+            raise RuntimeError("规划会话已关闭")
+
+        events = queue.Queue()
+        relay = (lambda *event: events.put(event)) if progress_callback else None
+        future = asyncio.run_coroutine_threadsafe(method(*args, progress_callback=relay, **kwargs), self._loop)
+        future.add_done_callback(lambda _: events.put(None))
+
+        # Streamlit 的界面只能在调用方线程中更新，进度事件在这里回放
+        while True:
+            event = events.get()
+            if event is None:
+                break
+            progress_callback(*event)
+        return future.result()
+
+    def stream_plan(self, message: str, progress_callback=None, use_cache=True, refresh_prices=False):
+        """
+        以流式方式完成旅行规划，逐个返回 stream_travel_with_multi_agents 的事件
+
+        事件在后台事件循环中产生，通过队列交给调用方线程，调用方可以边迭代边更新界面。
+        """
+        if self._closed:
+            raise RuntimeError("规划会话已关闭")
+        # 新的规划开始后，旧计划的预取不再需要
+        self.cancel_prefetch()
+
+        events = queue.Queue()
+        relay = (lambda *event: events.put(("progress", event))) if progress_callback else None
+
+        async def pump():
+            async for event in self.planner.stream_travel_with_multi_agents(
+                    message, progress_callback=relay, use_cache=use_cache, refresh_prices=refresh_prices):
+                events.put(("event", event))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._loop)
+        future.add_done_callback(lambda _: events.put(None))
+        try:
+            while True:
+                item = events.get()
+                if item is None:
+                    break
+                kind, payload = item
+                if kind == "progress":
+                    progress_callback(*payload)
+                else:
+                    yield payload
+            future.result()
+        finally:
+            # 调用方提前结束迭代时取消后台任务
+            if not future.done():
+                future.cancel()
+
+    def plan(self, message: str, progress_callback=None, use_cache=True, refresh_prices=False):
+        """完成一次完整的旅行规划，返回值同 plan_travel_with_multi_agents"""
+        return self._run(self.planner.plan_travel_with_multi_agents, message,
+                         progress_callback=progress_callback, use_cache=use_cache, refresh_prices=refresh_prices)
+
+    def prefetch_quick_questions(self, travel_context: dict, quick_questions: Dict[str, str],
+                                 preferences=(), limit=None) -> List[str]:
+        """
+        在后台预取快捷问题的回答
+
+        按 rank_quick_questions 挑选最可能被点击的问题，在会话的事件循环中并发运行
+        handle_follow_up_question，结果写入回答缓存，随后的 follow_up 调用直接命中。
+        再次预取、开始新的规划或关闭会话时取消尚未完成的预取。
+
+        Returns:
+            list: 开始预取的快捷问题名称
+        """
+        if self._closed:
+            raise RuntimeError("规划会话已关闭")
+        self.cancel_prefetch()
+
+        kwargs = {} if limit is None else {"limit": limit}
+        names = rank_quick_questions(quick_questions, preferences, **kwargs)
+        planner = self.planner
+        self._prefetcher = QuickQuestionPrefetcher(
+            lambda question: planner.handle_follow_up_question(question, travel_context),
+            loop=self._loop
+        )
+        self._prefetch_key = plan_fingerprint(travel_context)
+        self._prefetcher.start([quick_questions[name] for name in names])
+        return names
+
+    def cancel_prefetch(self):
+        """取消尚未完成的快捷问题预取"""
+        prefetcher, self._prefetcher = self._prefetcher, None
+        if prefetcher is not None:
+            prefetcher.close()
+
+    def follow_up(self, question: str, travel_context: dict, progress_callback=None, use_cache=True):
+        """处理追问，返回值同 handle_follow_up_question"""
+        # 同一份计划仍在预取中的问题等待预取完成，避免重复调用模型
+        prefetcher = self._prefetcher
+        if use_cache and prefetcher is not None and self._prefetch_key == plan_fingerprint(travel_context):
+            answer = prefetcher.get(question)
+            if answer is not None:
+                if progress_callback:
+                    progress_callback(4, 4, "已使用预先生成的回答！")
+                return answer
+        return self._run(self.planner.handle_follow_up_question, question, travel_context,
+                         progress_callback=progress_callback, use_cache=use_cache)
+
+    def close(self):
+        """关闭会话；没有其他会话共享时关闭规划器并停止后台事件循环"""
+        if self._closed:
+            return
+        self._closed = True
+        self.cancel_prefetch()
+        if self._finalizer.detach() is not None:
+            _release_runtime(self._runtime)
@@ -0,0 +1,170 @@
+"""
+旅行规划结果缓存模块
+按规范化后的行程指纹（出发地、目的地、日期、预算档位、偏好等）缓存完整的规划结果，
+相同或几乎相同的请求直接返回缓存，不再重新运行整个智能体流程
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from search_cache import create_cache
+
+PLAN_CACHE_ENABLED = os.environ.get("PLAN_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PLAN_CACHE_BACKEND = os.environ.get("PLAN_CACHE_BACKEND", "sqlite")
+PLAN_CACHE_PATH = os.environ.get(
+    "PLAN_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "travel_agent", "plan_cache.db"),
+)
+PLAN_CACHE_TTL = int(os.environ.get("PLAN_CACHE_TTL", str(6 * 60 * 60)))
+PLAN_CACHE_MAX_ENTRIES = int(os.environ.get("PLAN_CACHE_MAX_ENTRIES", "200"))
+# 写入后清理过期和超量条目的最小间隔（秒）
+PLAN_CACHE_PURGE_INTERVAL = float(os.environ.get("PLAN_CACHE_PURGE_INTERVAL", "3600"))
+# 预算按该档位宽度取整，例如 500 表示 2000~2499 美元视为同一档
+PLAN_CACHE_BUDGET_BUCKET = int(os.environ.get("PLAN_CACHE_BUDGET_BUCKET", "500"))
+
+# TRAVEL_MESSAGE_TEMPLATE 中的字段标签 -> 指纹字段
+TRIP_FIELD_LABELS = {
+    "出发地": "source",
+    "目的地": "destination",
+    "旅行日期": "dates",
+    "预算": "budget",
+    "旅行偏好": "preferences",
+    "住宿类型偏好": "accommodation_type",
+    "交通方式偏好": "transportation_mode",
+    "饮食限制": "dietary_restrictions",
+}
+LIST_TRIP_FIELDS = ("preferences", "transportation_mode", "dietary_restrictions")
+
+# 只匹配行内空白，空字段（如未选择交通方式）不会吞掉下一行
+_LINE_PATTERN = re.compile(r"^[ \t]*-[ \t]*([^：:\n]+)[：:][ \t]*(.*?)[ \t]*$", re.MULTILINE)
+
+
+def _normalize_text(value: str) -> str:
+    return re.sub(r"[\s,，.。'\"]+", "", value).casefold()
+
+
+def trip_fingerprint(message: str) -> Optional[Dict[str, Any]]:
+    """
+    从 build_travel_message 生成的消息中提取规范化的行程指纹
+
+    只有包含全部基本信息字段的规划请求才参与缓存；追问消息（CONTEXT_MESSAGE_TEMPLATE
+    只有部分字段）等其他消息返回 None。基本信息以外的文本规范化后一并计入指纹，
+    附加了不同要求的请求不会共用缓存。
+    """
+    fields = {}
+    for label, value in _LINE_PATTERN.findall(message or ""):
+        key = TRIP_FIELD_LABELS.get(label.strip())
+        if key and key not in fields:
+            fields[key] = value
+    if len(fields) < len(TRIP_FIELD_LABELS) or not (fields["source"] and fields["destination"]):
+        return None
+
+    fingerprint = {"extra": _normalize_text(_LINE_PATTERN.sub("", message))}
+    for key, value in fields.items():
+        if key == "budget":
+            amount = re.search(r"\d+(?:\.\d+)?", value.replace(",", ""))
+            fingerprint[key] = int(float(amount.group()) // max(PLAN_CACHE_BUDGET_BUCKET, 1)) if amount else value
+        elif key == "dates":
+            fingerprint[key] = re.findall(r"\d{4}-\d{2}-\d{2}", value) or _normalize_text(value)
+        elif key in LIST_TRIP_FIELDS:
+            fingerprint[key] = sorted({_normalize_text(item) for item in re.split(r"[,，、]", value) if item.strip()})
+        else:
+            fingerprint[key] = _normalize_text(value)
+    return fingerprint
+
+
+class PlanCache:
+    """
+    规划结果缓存，namespace 区分规划器类型和模型提供商
+
+    写入后按 purge_interval 间隔顺带清理过期和超量条目（首次写入时先清理一次）。
+    异步代码使用 aget / aset，SQLite 后端的读写在线程中执行，不阻塞事件循环。
+    """
+
+    def __init__(self, cache, ttl: int = PLAN_CACHE_TTL, purge_interval: float = PLAN_CACHE_PURGE_INTERVAL):
+        self.cache = cache
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._purge_lock = threading.Lock()
+
+    @property
+    def blocking(self) -> bool:
+        """读写是否会阻塞（SQLite 后端）"""
+        return getattr(self.cache, "blocking", False)
+
+    @staticmethod
+    def make_key(namespace: str, message: str) -> Optional[str]:
+        fingerprint = trip_fingerprint(message)
+        if fingerprint is None:
+            return None
+        payload = json.dumps({"namespace": namespace, **fingerprint}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, message: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的规划结果，附带 cache_age_seconds；未命中或不是行程请求时返回 None"""
+        key = self.make_key(namespace, message)
+        if key is None:
+            return None
+        value = self.cache.get(key)
+        if value is None:
+            return None
+        return {**value, "cache_age_seconds": round(time.time() - value.get("cached_at", time.time()))}
+
+    def set(self, namespace: str, message: str, value: Dict[str, Any]) -> None:
+        """写入规划结果（value 必须可以 JSON 序列化）"""
+        key = self.make_key(namespace, message)
+        if key is None:
+            return
+        self.cache.set(key, {**value, "cached_at": time.time()}, self.ttl, engine=namespace)
+        self._purge_if_due()
+
+    async def aget(self, namespace: str, message: str) -> Optional[Dict[str, Any]]:
+        """get 的异步版本"""
+        if self.blocking:
+            return await asyncio.to_thread(self.get, namespace, message)
+        return self.get(namespace, message)
+
+    async def aset(self, namespace: str, message: str, value: Dict[str, Any]) -> None:
+        """set 的异步版本"""
+        if self.blocking:
+            await asyncio.to_thread(self.set, namespace, message, value)
+        else:
+            self.set(namespace, message, value)
+
+    def _purge_if_due(self) -> None:
+        now = time.monotonic()
+        with self._purge_lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.purge_interval
+        self.cache.purge_expired()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), "ttl": self.ttl}
+
+
+_plan_cache: Optional[PlanCache] = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """获取进程内共享的规划缓存，未启用时返回 None"""
+    global _plan_cache
+    if not PLAN_CACHE_ENABLED:
+        return None
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            try:
+                cache = create_cache(PLAN_CACHE_BACKEND, PLAN_CACHE_MAX_ENTRIES, PLAN_CACHE_PATH)
+            except Exception:
+                # SQLite 文件不可用时退回内存缓存
+                cache = create_cache("memory", PLAN_CACHE_MAX_ENTRIES)
+            _plan_cache = PlanCache(cache)
+        return _plan_cache
@@ -0,0 +1,169 @@
+"""
+快捷问题预取模块
+旅行计划生成后，在后台并发预先计算最可能被点击的几个快捷问题（QUICK_QUESTIONS）的回答，
+用户点击时直接使用已完成的结果。预取需要显式开启，数量和频率都有上限，
+用户重新规划、重置或离开会话时取消尚未完成的预取。
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from follow_up_router import INTENT_SEARCH, route_follow_up
+
+QUICK_PREFETCH_ENABLED = os.environ.get("QUICK_PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+# 每份计划最多预取的问题数
+QUICK_PREFETCH_MAX_QUESTIONS = int(os.environ.get("QUICK_PREFETCH_MAX_QUESTIONS", "3"))
+# 同时运行的预取数量
+QUICK_PREFETCH_CONCURRENCY = int(os.environ.get("QUICK_PREFETCH_CONCURRENCY", "2"))
+# 每小时（整个进程）最多发起的预取次数，控制额外的模型和搜索费用
+QUICK_PREFETCH_HOURLY_LIMIT = int(os.environ.get("QUICK_PREFETCH_HOURLY_LIMIT", "20"))
+# 是否预取需要搜索的问题（搜索会额外消耗 SearchAPI 配额）
+QUICK_PREFETCH_ALLOW_SEARCH = os.environ.get("QUICK_PREFETCH_ALLOW_SEARCH", "false").lower() in ("1", "true", "yes")
+# 点击仍在预取中的问题时最多等待的秒数，超时后直接按正常流程回答
+QUICK_PREFETCH_WAIT_TIMEOUT = float(os.environ.get("QUICK_PREFETCH_WAIT_TIMEOUT", "20"))
+
+# 快捷问题的默认优先级（越靠前越可能被点击）
+QUICK_QUESTION_PRIORITY = ("景点详情", "餐厅推荐", "交通建议", "预算优化", "天气装备", "行程调整", "当地文化", "安全须知")
+# 旅行偏好 -> 优先预取的快捷问题
+PREFERENCE_QUICK_QUESTIONS = {
+    "美食": "餐厅推荐",
+    "文化体验": "当地文化",
+    "观光": "景点详情",
+    "经济实惠": "预算优化",
+    "家庭友好": "安全须知",
+    "冒险": "安全须知",
+    "海滩": "天气装备",
+    "山区": "天气装备",
+    "休闲": "行程调整",
+}
+
+_recent_runs: deque = deque()
+_recent_runs_lock = threading.Lock()
+
+
+def _acquire_run_slot() -> bool:
+    """按每小时上限登记一次预取，超出上限时返回 False"""
+    now = time.monotonic()
+    with _recent_runs_lock:
+        while _recent_runs and now - _recent_runs[0] > 3600:
+            _recent_runs.popleft()
+        if len(_recent_runs) >= QUICK_PREFETCH_HOURLY_LIMIT:
+            return False
+        _recent_runs.append(now)
+        return True
+
+
+def rank_quick_questions(quick_questions: Dict[str, str], preferences: Iterable[str] = (),
+                         limit: int = QUICK_PREFETCH_MAX_QUESTIONS,
+                         allow_search: bool = QUICK_PREFETCH_ALLOW_SEARCH,
+                         always_searchable: bool = False) -> List[str]:
+    """
+    挑选需要预取的快捷问题
+
+    与旅行偏好相关的问题排在前面，其余按 QUICK_QUESTION_PRIORITY 排列；不允许搜索时
+    跳过路由为定向搜索的问题。
+
+    always_searchable 表示回答路径不经过追问路由、总是带着搜索工具（如单智能体），
+    任何问题都可能触发搜索，路由意图不能说明是否会搜索：此时不允许搜索则不预取任何问题。
+
+    Returns:
+        list: 快捷问题的名称（quick_questions 的键）
+    """
+    if always_searchable and not allow_search:
+        return []
+    preferred = [PREFERENCE_QUICK_QUESTIONS[p] for p in preferences or () if p in PREFERENCE_QUICK_QUESTIONS]
+    order = [*preferred, *QUICK_QUESTION_PRIORITY, *quick_questions]
+    names = []
+    for name in dict.fromkeys(order):
+        if name not in quick_questions:
+            continue
+        if not allow_search and route_follow_up(quick_questions[name]).intent == INTENT_SEARCH:
+            continue
+        names.append(name)
+    return names[:max(limit, 0)]
+
+
+class QuickQuestionPrefetcher:
+    """
+    在后台事件循环中预取快捷问题的回答
+
+    answer_fn 接收问题文本、返回回答。传入 loop 时在该事件循环中运行（例如
+    PlannerSession 的后台循环，共享已打开的搜索工具），否则使用自己的后台线程。
+    """
+
+    def __init__(self, answer_fn: Callable[[str], Awaitable[str]],
+                 loop: Optional[asyncio.AbstractEventLoop] = None,
+                 concurrency: int = QUICK_PREFETCH_CONCURRENCY):
+        self.answer_fn = answer_fn
+        self.concurrency = max(concurrency, 1)
+        self._futures: Dict[str, concurrent.futures.Future] = {}
+        self._thread = None
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="quick-prefetch", daemon=True)
+            self._thread.start()
+        self._loop = loop
+        self._semaphore = None
+
+    async def _answer(self, question: str) -> Optional[str]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            # 获得并发名额后才登记，排队中被取消的预取不计入每小时上限
+            if not _acquire_run_slot():
+                return None
+            return await self.answer_fn(question)
+
+    def start(self, questions: Iterable[str]) -> List[str]:
+        """开始预取，返回实际提交的问题（已提交过的问题不会重复提交）"""
+        started = []
+        for question in questions:
+            if question in self._futures:
+                continue
+            self._futures[question] = asyncio.run_coroutine_threadsafe(self._answer(question), self._loop)
+            started.append(question)
+        return started
+
+    def get(self, question: str, timeout: Optional[float] = QUICK_PREFETCH_WAIT_TIMEOUT) -> Optional[str]:
+        """
+        获取预取的回答
+
+        预取仍在进行时最多等待 timeout 秒（None 表示等到完成），未预取、失败、超时
+        或因上限跳过时返回 None，调用方按正常流程处理；超时的预取随之取消，避免与
+        调用方的请求重复调用模型。
+        """
+        future = self._futures.get(question)
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return None
+        except (Exception, concurrent.futures.CancelledError):
+            return None
+
+    def is_ready(self, question: str) -> bool:
+        future = self._futures.get(question)
+        return future is not None and future.done() and not future.cancelled() and future.exception() is None
+
+    def cancel(self) -> None:
+        """取消所有尚未完成的预取"""
+        for future in self._futures.values():
+            if not future.done():
+                future.cancel()
+
+    def close(self) -> None:
+        """取消预取，并停止自己创建的后台事件循环"""
+        self.cancel()
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            if not self._thread.is_alive():
+                self._loop.close()
+            self._thread = None
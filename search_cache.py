@@ -0,0 +1,282 @@
+"""
+SearchAPI 搜索结果缓存模块
+为 mcp_server.py 提供按引擎区分 TTL 的 LRU 响应缓存，
+支持进程内存缓存和可跨进程共享的 SQLite 持久化缓存两种后端
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# 各搜索引擎的缓存有效期（秒），0 表示不缓存
+# 航班价格变化快，缓存时间短；地图、图片等相对稳定，缓存时间长
+CACHE_TTL_POLICIES = {
+    "google_flights": 10 * 60,
+    "google_flights_calendar": 30 * 60,
+    "google_hotels": 60 * 60,
+    "google_hotels_property": 60 * 60,
+    "google_maps": 24 * 60 * 60,
+    "google_maps_reviews": 12 * 60 * 60,
+    "google": 6 * 60 * 60,
+    "google_videos": 24 * 60 * 60,
+    "google_images": 7 * 24 * 60 * 60,
+}
+
+DEFAULT_CACHE_TTL = 60 * 60
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "travel_agent", "searchapi_cache.db")
+
+# SQLite 缓存命中时最近访问时间的最小更新间隔（秒），避免每次命中都写库
+ACCESS_UPDATE_INTERVAL = float(os.environ.get("SEARCHAPI_CACHE_ACCESS_UPDATE_INTERVAL", "60"))
+
+# 不参与缓存键计算的参数
+EXCLUDED_KEY_PARAMS = {"api_key"}
+
+
+def make_cache_key(params: Dict[str, Any]) -> str:
+    """根据规范化后的请求参数生成缓存键（不包含 api_key 和空值）"""
+    normalized = {
+        str(key): str(value).strip()
+        for key, value in params.items()
+        if key not in EXCLUDED_KEY_PARAMS and value is not None
+    }
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+
+
+def get_engine_ttl(engine: Optional[str]) -> int:
+    """获取指定引擎的缓存有效期"""
+    return CACHE_TTL_POLICIES.get(engine, DEFAULT_CACHE_TTL)
+
+
+class TTLCache:
+    """带过期时间和容量上限的内存 LRU 缓存（线程安全，操作不阻塞，可直接在事件循环中调用）"""
+
+    # 读写是否会阻塞（需要放到线程中执行）
+    blocking = False
+
+    def __init__(self, max_entries: int = 1000, stale_grace: int = 0):
+        self.max_entries = max_entries
+        self.stale_grace = stale_grace
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，过期条目计为未命中（保留到宽限期结束，供 get_stale 使用）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.time():
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: int, engine: Optional[str] = None) -> None:
+        """写入缓存，超过容量时淘汰最久未使用的条目"""
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stale(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，忽略是否过期（用于配额耗尽时的降级）"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def purge_expired(self) -> int:
+        """删除过期且超过宽限期的条目，返回删除数量"""
+        cutoff = time.time() - self.stale_grace
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at <= cutoff]
+            for key in expired:
+                del self._entries[key]
+            self.expirations += len(expired)
+        return len(expired)
+
+    def close(self) -> None:
+        """内存缓存无需释放资源"""
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteCache:
+    """
+    基于 SQLite 的持久化缓存
+
+    使用 WAL 模式，允许多个 mcp_server.py 进程同时读写同一个缓存文件；
+    响应体以 zlib 压缩后的 JSON 存储。过期和超量条目由 purge_expired
+    清理，通常由服务器的后台维护任务定期调用。所有操作共用一个连接并由同一把锁串行化，
+    在异步代码中应通过 asyncio.to_thread 调用，避免磁盘 IO 阻塞事件循环。
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 10000, stale_grace: int = 0):
+        self.path = path
+        self.max_entries = max_entries
+        self.stale_grace = stale_grace
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        # auto_vacuum 必须在建表前设置才能生效
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                engine TEXT,
+                payload BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_expires ON search_cache (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_access ON search_cache (last_access)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，过期条目计为未命中（由后台任务统一删除）；最近访问时间按间隔更新"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at, last_access FROM search_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+
+            if now - row[2] >= ACCESS_UPDATE_INTERVAL:
+                self._conn.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def get_stale(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，忽略是否过期（用于配额耗尽时的降级）"""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM search_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def set(self, key: str, value: Dict[str, Any], ttl: int, engine: Optional[str] = None) -> None:
+        """写入缓存，相同键直接覆盖"""
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+
+        payload = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, engine, payload, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, engine, payload, now, now + ttl, now),
+            )
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+
+    def purge_expired(self) -> int:
+        """删除过期且超过宽限期的条目，超过容量上限时按最近访问时间淘汰，并回收空闲页"""
+        with self._lock:
+            expired = self._conn.execute(
+                "DELETE FROM search_cache WHERE expires_at <= ?", (time.time() - self.stale_grace,)
+            ).rowcount
+            self.expirations += expired
+
+            count = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM search_cache WHERE key IN "
+                    "(SELECT key FROM search_cache ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+            # incremental_vacuum 每执行一步只回收一页，executescript 会一直执行到空闲页全部回收
+            self._conn.executescript("PRAGMA incremental_vacuum;")
+        return expired
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存命中统计（命中次数为当前进程的统计，条目数为全局）"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def create_cache(backend: str = "memory", max_entries: int = 1000, path: Optional[str] = None, stale_grace: int = 0):
+    """根据配置创建缓存后端"""
+    if backend == "sqlite":
+        return SQLiteCache(path or DEFAULT_CACHE_PATH, max_entries=max_entries, stale_grace=stale_grace)
+    if backend == "memory":
+        return TTLCache(max_entries=max_entries, stale_grace=stale_grace)
+    raise ValueError(f"不支持的缓存后端: {backend}")
@@ -0,0 +1,166 @@
+"""
+SearchAPI 响应精简模块
+将 google_flights、google_hotels、google_maps 的原始响应裁剪为紧凑的摘要，
+只保留价格、时间、评分、ID 以及后续调用所需的 token，减少传给大模型的提示词长度
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from token_counter import count_tokens
+
+# 所有引擎都会去掉的顶层元数据字段
+METADATA_KEYS = {"search_metadata", "search_parameters", "search_information"}
+
+
+def _compact(data: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉值为空的字段"""
+    return {key: value for key, value in data.items() if value not in (None, "", [], {})}
+
+
+def _pick(data: Optional[Dict[str, Any]], keys: Iterable[str]) -> Dict[str, Any]:
+    """从字典中挑选指定字段"""
+    if not isinstance(data, dict):
+        return {}
+    return _compact({key: data.get(key) for key in keys})
+
+
+def _project_list(items: Any, project: Callable[[Dict[str, Any]], Dict[str, Any]], max_items: int) -> List[Dict[str, Any]]:
+    if not isinstance(items, list):
+        return []
+    return [project(item) for item in items[:max_items] if isinstance(item, dict)]
+
+
+def _flight_option(item: Dict[str, Any]) -> Dict[str, Any]:
+    airport_keys = ("id", "name", "date", "time")
+    return _compact({
+        "price": item.get("price"),
+        "total_duration": item.get("total_duration"),
+        "type": item.get("type"),
+        "stops": len(item.get("layovers") or []),
+        "segments": [
+            _compact({
+                "airline": segment.get("airline"),
+                "flight_number": segment.get("flight_number"),
+                "departure": _pick(segment.get("departure_airport"), airport_keys),
+                "arrival": _pick(segment.get("arrival_airport"), airport_keys),
+                "duration": segment.get("duration"),
+                "travel_class": segment.get("travel_class"),
+                "airplane": segment.get("airplane"),
+            })
+            for segment in item.get("flights") or []
+            if isinstance(segment, dict)
+        ],
+        "layovers": [
+            _pick(layover, ("id", "name", "duration", "overnight"))
+            for layover in item.get("layovers") or []
+        ],
+        "carbon_emissions": (item.get("carbon_emissions") or {}).get("this_flight"),
+        "departure_token": item.get("departure_token"),
+        "booking_token": item.get("booking_token"),
+    })
+
+
+def project_google_flights(data: Dict[str, Any], max_items: int) -> Dict[str, Any]:
+    """航班摘要：价格、时长、航段时间、经停以及 departure_token/booking_token"""
+    other_flights = data.get("other_flights") or []
+    return _compact({
+        "best_flights": _project_list(data.get("best_flights"), _flight_option, max_items),
+        "other_flights": _project_list(other_flights, _flight_option, max_items),
+        "other_flights_total": len(other_flights) if len(other_flights) > max_items else None,
+        "price_insights": _pick(data.get("price_insights"), ("lowest_price", "price_level", "typical_price_range")),
+    })
+
+
+def _hotel_property(item: Dict[str, Any]) -> Dict[str, Any]:
+    price_per_night = item.get("price_per_night") or item.get("rate_per_night") or {}
+    total_price = item.get("total_price") or {}
+    return _compact({
+        "name": item.get("name"),
+        "type": item.get("type"),
+        "hotel_class": item.get("extracted_hotel_class") or item.get("hotel_class"),
+        "rating": item.get("rating") or item.get("overall_rating"),
+        "reviews": item.get("reviews"),
+        "price_per_night": price_per_night.get("extracted_price") or price_per_night.get("price")
+        if isinstance(price_per_night, dict) else price_per_night,
+        "total_price": total_price.get("extracted_price") or total_price.get("price")
+        if isinstance(total_price, dict) else total_price,
+        "check_in_time": item.get("check_in_time"),
+        "check_out_time": item.get("check_out_time"),
+        "gps_coordinates": item.get("gps_coordinates"),
+        "amenities": (item.get("amenities") or [])[:10],
+        "link": item.get("link"),
+        "property_token": item.get("property_token"),
+    })
+
+
+def project_google_hotels(data: Dict[str, Any], max_items: int) -> Dict[str, Any]:
+    """酒店摘要：名称、星级、评分、每晚价格、坐标、设施以及 property_token"""
+    return _compact({
+        "properties": _project_list(data.get("properties"), _hotel_property, max_items),
+        "next_page_token": (data.get("pagination") or {}).get("next_page_token"),
+    })
+
+
+def _map_place(item: Dict[str, Any]) -> Dict[str, Any]:
+    return _compact({
+        "title": item.get("title"),
+        "type": item.get("type"),
+        "rating": item.get("rating"),
+        "reviews": item.get("reviews"),
+        "price": item.get("price"),
+        "address": item.get("address"),
+        "phone": item.get("phone"),
+        "website": item.get("website"),
+        "open_state": item.get("open_state"),
+        "gps_coordinates": item.get("gps_coordinates"),
+        "place_id": item.get("place_id"),
+        "data_id": item.get("data_id"),
+    })
+
+
+def project_google_maps(data: Dict[str, Any], max_items: int) -> Dict[str, Any]:
+    """地图摘要：地点名称、评分、价格、地址、坐标以及查询评论所需的 place_id/data_id"""
+    place_result = data.get("place_result")
+    return _compact({
+        "place_result": _map_place(place_result) if isinstance(place_result, dict) else None,
+        "local_results": _project_list(data.get("local_results"), _map_place, max_items),
+    })
+
+
+PROJECTORS: Dict[str, Callable[[Dict[str, Any], int], Dict[str, Any]]] = {
+    "google_flights": project_google_flights,
+    "google_hotels": project_google_hotels,
+    "google_maps": project_google_maps,
+}
+
+
+def project_response(engine: Optional[str], data: Dict[str, Any], max_items: int = 10) -> Dict[str, Any]:
+    """
+    按引擎精简响应，并附带本次精简节省的字节数和 token 数
+
+    没有专门规则的引擎只去掉顶层元数据；错误结果原样返回。
+    """
+    if not isinstance(data, dict) or "error" in data:
+        return data
+
+    projector = PROJECTORS.get(engine)
+    if projector is not None:
+        projected = projector(data, max_items)
+        # 保留降级提示等不属于原始响应的附加字段
+        if "stale_cache_notice" in data:
+            projected["stale_cache_notice"] = data["stale_cache_notice"]
+    else:
+        projected = {key: value for key, value in data.items() if key not in METADATA_KEYS}
+
+    raw_text = json.dumps(data, ensure_ascii=False)
+    projected_text = json.dumps(projected, ensure_ascii=False)
+    raw_bytes = len(raw_text.encode("utf-8"))
+    projected_bytes = len(projected_text.encode("utf-8"))
+    projected["projection_report"] = {
+        "raw_bytes": raw_bytes,
+        "projected_bytes": projected_bytes,
+        "saved_bytes": raw_bytes - projected_bytes,
+        "saved_tokens": count_tokens(raw_text) - count_tokens(projected_text),
+    }
+    return projected
@@ -0,0 +1,196 @@
+"""
+SearchAPI 限流与配额模块
+为 mcp_server.py 提供令牌桶限流器和按引擎、按天统计调用次数的配额账本
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """异步令牌桶：rate 为每秒补充的令牌数，burst 为桶容量"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """获取一个令牌，令牌不足时等待，返回等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        # 持锁等待，保证等待者按到达顺序获得令牌
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+
+                delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class RateLimiter:
+    """按 API Key 和按引擎两级限流"""
+
+    def __init__(self, rate: float, burst: int, engine_limits: Optional[Dict[str, Tuple[float, int]]] = None):
+        self.rate = rate
+        self.burst = burst
+        self.engine_limits = engine_limits or {}
+        self._buckets: Dict[Tuple[str, Optional[str]], TokenBucket] = {}
+        self.throttled = 0
+        self.total_wait = 0.0
+
+    def _bucket(self, key_id: str, engine: Optional[str]) -> Optional[TokenBucket]:
+        if engine is None:
+            rate, burst = self.rate, self.burst
+        elif engine in self.engine_limits:
+            rate, burst = self.engine_limits[engine]
+        else:
+            return None
+
+        bucket_key = (key_id, engine)
+        if bucket_key not in self._buckets:
+            self._buckets[bucket_key] = TokenBucket(rate, burst)
+        return self._buckets[bucket_key]
+
+    async def acquire(self, api_key: str, engine: Optional[str]) -> float:
+        """依次通过 API Key 级和引擎级令牌桶，返回总等待秒数"""
+        # 不以明文保存 API Key
+        key_id = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+
+        waited = 0.0
+        for bucket in (self._bucket(key_id, None), self._bucket(key_id, engine)):
+            if bucket is not None:
+                waited += await bucket.acquire()
+
+        if waited > 0:
+            self.throttled += 1
+            self.total_wait += waited
+        return waited
+
+    def stats(self) -> Dict[str, object]:
+        """返回限流统计"""
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "engine_limits": {engine: list(limit) for engine, limit in self.engine_limits.items()},
+            "throttled_requests": self.throttled,
+            "total_wait_seconds": round(self.total_wait, 3),
+        }
+
+
+class QuotaLedger:
+    """
+    每日配额账本
+
+    按 (日期, 引擎) 记录上游调用次数，提供 path 时存入 SQLite，
+    多个 mcp_server.py 进程共享同一份账本。预算为 0 表示不限制。
+    consume 会等待跨进程的写锁，在异步代码中应通过 asyncio.to_thread 调用。
+    """
+
+    def __init__(self, path: Optional[str] = None, daily_budget: int = 0,
+                 engine_budgets: Optional[Dict[str, int]] = None):
+        self.path = path or ":memory:"
+        self.daily_budget = daily_budget
+        self.engine_budgets = engine_budgets or {}
+        self.refused = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path) if path else ""
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_quota (
+                day TEXT NOT NULL,
+                engine TEXT NOT NULL,
+                calls INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, engine)
+            )
+            """
+        )
+
+    def consume(self, engine: Optional[str]) -> bool:
+        """预算充足时记一次调用并返回 True，预算耗尽时返回 False"""
+        engine = engine or "unknown"
+        today = date.today().isoformat()
+        engine_budget = self.engine_budgets.get(engine, 0)
+
+        with self._lock:
+            # BEGIN IMMEDIATE 获取写锁，保证跨进程的检查和计数是原子的
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self.daily_budget > 0:
+                    total = self._conn.execute(
+                        "SELECT COALESCE(SUM(calls), 0) FROM search_quota WHERE day = ?", (today,)
+                    ).fetchone()[0]
+                    if total >= self.daily_budget:
+                        self._conn.execute("ROLLBACK")
+                        self.refused += 1
+                        return False
+
+                if engine_budget > 0:
+                    used = self._conn.execute(
+                        "SELECT COALESCE(SUM(calls), 0) FROM search_quota WHERE day = ? AND engine = ?",
+                        (today, engine),
+                    ).fetchone()[0]
+                    if used >= engine_budget:
+                        self._conn.execute("ROLLBACK")
+                        self.refused += 1
+                        return False
+
+                self._conn.execute(
+                    "INSERT INTO search_quota (day, engine, calls) VALUES (?, ?, 1) "
+                    "ON CONFLICT(day, engine) DO UPDATE SET calls = calls + 1",
+                    (today, engine),
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def usage(self, day: Optional[str] = None) -> Dict[str, int]:
+        """返回指定日期（默认今天）各引擎的调用次数"""
+        day = day or date.today().isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT engine, calls FROM search_quota WHERE day = ?", (day,)
+            ).fetchall()
+        return {engine: calls for engine, calls in rows}
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, object]:
+        """返回今日配额使用情况"""
+        usage = self.usage()
+        return {
+            "day": date.today().isoformat(),
+            "usage": usage,
+            "total_calls": sum(usage.values()),
+            "daily_budget": self.daily_budget,
+            "engine_budgets": dict(self.engine_budgets),
+            "refused_requests": self.refused,
+        }
@@ -16,6 +16,7 @@ import streamlit as st
 from travel_agent import (
     TravelPlanningAgent, 
     run_travel_agent, 
+    stream_travel_agent,
     build_travel_message, 
     build_context_message
 )
@@ -23,6 +24,17 @@ from travel_agent import (
 # 导入提示词模块
 from travel_prompts import QUICK_QUESTIONS
 
+# 导入快捷问题预取
+from quick_prefetch import (
+    QUICK_PREFETCH_ALLOW_SEARCH,
+    QUICK_PREFETCH_ENABLED,
+    QuickQuestionPrefetcher,
+    rank_quick_questions
+)
+
+# 导入流式输出渲染
+from agent_streaming import consume_stream, create_stream_renderer
+
 # 配置页面 - 必须是第一个 Streamlit 命令
 st.set_page_config(
     page_title="AI 旅行规划助手",
@@ -253,6 +265,17 @@ def setup_sidebar():
         else:
             st.success(f"✅ 所有 API 密钥已配置完成！当前使用：{st.session_state.model_provider}")
         
+        # 快捷问题预取会额外调用模型，默认关闭；单智能体回答时总是带搜索工具，
+        # 预取的问题都可能消耗 SearchAPI 配额，只有允许预取搜索时才可开启
+        st.session_state['quick_prefetch_enabled'] = st.checkbox(
+            "⚡ 预先生成快捷问题回答",
+            value=st.session_state['quick_prefetch_enabled'] and QUICK_PREFETCH_ALLOW_SEARCH,
+            disabled=not QUICK_PREFETCH_ALLOW_SEARCH,
+            help="计划生成后在后台预先回答最可能点击的几个快捷问题，点击时直接显示（会产生额外的模型和搜索调用费用）"
+                 if QUICK_PREFETCH_ALLOW_SEARCH else
+                 "单智能体回答问题时可能调用搜索，需设置 QUICK_PREFETCH_ALLOW_SEARCH=true 才能预取"
+        )
+        
         # 显示当前选择的模型信息
         if st.session_state.model_provider == "OpenAI":
             st.info("🤖 OpenAI GPT-4o-mini")
@@ -446,6 +469,7 @@ def handle_travel_planning(form_data, all_keys_filled):
     with col_reset:
         if st.session_state.get('travel_plan'):
             if st.button("🔄 重新规划", help="清除当前计划，开始新的规划"):
+                cancel_quick_prefetch()
                 st.session_state['travel_plan'] = None
                 st.session_state['travel_context'] = {}
                 st.session_state['messages'] = []
@@ -457,6 +481,9 @@ def handle_travel_planning(form_data, all_keys_filled):
         elif not form_data['travel_preferences']:
             st.warning("建议选择一些旅行偏好以获得更好的推荐。")
         else:
+            # 新的规划开始后，旧计划的预取不再需要
+            cancel_quick_prefetch()
+            
             # 显示智能体状态
             display_agent_status()
             
@@ -479,15 +506,18 @@ def handle_travel_planning(form_data, all_keys_filled):
                         form_data['dietary_restrictions']
                     )
                     
-                    # 运行智能体
-                    response = asyncio.run(run_travel_agent(
-                        message,
-                        model_provider=st.session_state.model_provider,
-                        openai_key=st.session_state.openai_key,
-                        gemini_key=st.session_state.gemini_key,
-                        searchapi_key=st.session_state.searchapi_key,
-                        progress_callback=progress_tracker
-                    ))
+                    # 流式运行智能体，生成的内容实时显示在计划区域
+                    with st.expander("📋 完整旅行计划", expanded=True):
+                        render = create_stream_renderer()
+                        result = asyncio.run(consume_stream(stream_travel_agent(
+                            message,
+                            model_provider=st.session_state.model_provider,
+                            openai_key=st.session_state.openai_key,
+                            gemini_key=st.session_state.gemini_key,
+                            searchapi_key=st.session_state.searchapi_key,
+                            progress_callback=progress_tracker
+                        ), render))
+                    response = result['content']
                     
                     # 保存旅行计划到会话状态
                     st.session_state['travel_plan'] = response
@@ -502,15 +532,18 @@ def handle_travel_planning(form_data, all_keys_filled):
                         'dietary_restrictions': form_data['dietary_restrictions']
                     }
                     
+                    # 后台预取快捷问题的回答
+                    start_quick_prefetch()
+                    
                     # 显示响应
                     st.success("✅ AI旅行规划专家已为您制定完美的旅行方案！")
                     
                     # 添加AI说明
                     st.info(f"🤖 **AI模型**: {st.session_state.model_provider} - 集成信息搜索和行程规划功能")
-                    
-                    # 显示完整的旅行计划
-                    with st.expander("📋 完整旅行计划", expanded=True):
-                        st.markdown(response)
+                    if result.get('cached'):
+                        st.caption("♻️ 使用缓存的旅行方案，价格可能已变化")
+                    elif result['first_token_seconds'] is not None:
+                        st.caption(f"⏱️ 首字响应时间：{result['first_token_seconds']} 秒")
                     
                     # 生成下载选项
                     generate_download_options(response, form_data)
@@ -710,17 +743,64 @@ def setup_chat_interface():
                     
         with col_reset:
             if st.button('🔄 重新开始规划', key='reset_all'):
+                cancel_quick_prefetch()
                 st.session_state['travel_plan'] = None
                 st.session_state['travel_context'] = {}
                 st.session_state['messages'] = []
                 st.rerun()
 
 
+def start_quick_prefetch():
+    """计划生成后，在后台预取最可能被点击的快捷问题的回答"""
+    cancel_quick_prefetch()
+    if not st.session_state['quick_prefetch_enabled']:
+        return
+    
+    # 后台线程不能访问 st.session_state，先取出需要的值
+    travel_plan = st.session_state['travel_plan']
+    travel_context = dict(st.session_state['travel_context'])
+    agent_kwargs = {
+        'model_provider': st.session_state.model_provider,
+        'openai_key': st.session_state.openai_key,
+        'gemini_key': st.session_state.gemini_key,
+        'searchapi_key': st.session_state.searchapi_key
+    }
+    
+    async def answer(question):
+        context_message = build_context_message(travel_plan, travel_context, question)
+        return await run_travel_agent(context_message, **agent_kwargs)
+    
+    prefetcher = QuickQuestionPrefetcher(answer)
+    # run_travel_agent 不经过追问路由、总是带搜索工具，按"每个问题都可能搜索"挑选
+    names = rank_quick_questions(QUICK_QUESTIONS, travel_context.get('preferences', []),
+                                 always_searchable=True)
+    prefetcher.start([QUICK_QUESTIONS[name] for name in names])
+    st.session_state['quick_prefetcher'] = prefetcher
+
+
+def cancel_quick_prefetch():
+    """取消尚未完成的快捷问题预取"""
+    prefetcher = st.session_state.get('quick_prefetcher')
+    if prefetcher is not None:
+        prefetcher.close()
+    st.session_state['quick_prefetcher'] = None
+
+
 def handle_chat_message(user_message):
     """处理聊天消息"""
     # 添加用户消息到历史
     st.session_state['messages'].append({'role': 'user', 'content': user_message})
     
+    # 已预取的快捷问题直接使用预取结果，仍在预取中的最多等待 QUICK_PREFETCH_WAIT_TIMEOUT 秒，
+    # 超时后取消预取并直接回答
+    prefetcher = st.session_state.get('quick_prefetcher')
+    if prefetcher is not None:
+        with st.spinner('⚡ 正在获取预先生成的回答...'):
+            prefetched = prefetcher.get(user_message)
+        if prefetched:
+            st.session_state['messages'].append({'role': 'assistant', 'content': prefetched})
+            st.rerun()
+    
     # 显示处理状态
     with st.spinner('🤖 AI正在基于您的旅行计划思考回答...'):
         try:
@@ -731,14 +811,17 @@ def handle_chat_message(user_message):
                 user_message
             )
             
-            # 调用agent进行回答
-            response = asyncio.run(run_travel_agent(
-                context_message,
-                model_provider=st.session_state.model_provider,
-                openai_key=st.session_state.openai_key,
-                gemini_key=st.session_state.gemini_key,
-                searchapi_key=st.session_state.searchapi_key
-            ))
+            # 调用agent进行回答，回答内容实时显示
+            with st.chat_message("assistant"):
+                render = create_stream_renderer()
+                result = asyncio.run(consume_stream(stream_travel_agent(
+                    context_message,
+                    model_provider=st.session_state.model_provider,
+                    openai_key=st.session_state.openai_key,
+                    gemini_key=st.session_state.gemini_key,
+                    searchapi_key=st.session_state.searchapi_key
+                ), render))
+            response = result['content']
             
             # 添加AI回复到历史
             st.session_state['messages'].append({'role': 'assistant', 'content': response})
@@ -808,6 +891,10 @@ def init_session_state():
         st.session_state.gemini_key = ""
     if 'quick_question' not in st.session_state:
         st.session_state['quick_question'] = None
+    if 'quick_prefetch_enabled' not in st.session_state:
+        st.session_state['quick_prefetch_enabled'] = QUICK_PREFETCH_ENABLED
+    if 'quick_prefetcher' not in st.session_state:
+        st.session_state['quick_prefetcher'] = None
 
 
 def main():
@@ -842,6 +929,7 @@ def main():
         with col3:
             if st.button("🔄 规划新旅行", key="new_plan"):
                 # 保持当前输入表单的内容，但清除旅行计划
+                cancel_quick_prefetch()
                 st.session_state['travel_plan'] = None
                 st.session_state['travel_context'] = {}
                 st.session_state['messages'] = []
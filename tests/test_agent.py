@@ -0,0 +1,50 @@
+"""agent 的按会话规划器缓存"""
+
+import pytest
+
+pytest.importorskip("langchain_openai")
+
+import agent  # noqa: E402
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = agent.PlannerCache(max_entries=2, idle_ttl=3600)
+
+    class FakePlanner:
+        def __init__(self, email, conv_id):
+            self.closed = False
+
+        def close(self):
+            # 关闭 Redis 连接时不能持有缓存锁
+            assert not cache._lock.locked()
+            self.closed = True
+
+    monkeypatch.setattr(agent, "MultiAgentTravelPlanner", FakePlanner)
+    return cache
+
+
+def test_evicted_planners_are_closed_outside_the_lock(cache):
+    planners = []
+    for conv_id in range(3):
+        with cache.use("user@example.com", str(conv_id)) as planner:
+            planners.append(planner)
+    assert [planner.closed for planner in planners] == [True, False, False]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_planner_in_use_is_closed_after_the_request(cache):
+    with cache.use("user@example.com", "1") as planner:
+        cache.clear()
+        assert not planner.closed
+    assert planner.closed
+
+
+def test_idle_planners_expire_on_next_lookup(cache):
+    with cache.use("user@example.com", "1") as planner:
+        pass
+    cache.idle_ttl = -1
+    with cache.use("user@example.com", "2"):
+        pass
+    assert planner.closed
+    assert cache.stats()["expirations"] == 1
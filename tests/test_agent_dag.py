@@ -0,0 +1,81 @@
+"""agent_dag 的依赖图排序、超时计时和线程池满时的拒绝"""
+
+import threading
+import time
+
+import pytest
+
+from agent_dag import (STATUS_ERROR, STATUS_OK, STATUS_REJECTED, STATUS_TIMEOUT, AgentPool, DagExecutor,
+                       DagNode, topological_order)
+
+
+@pytest.fixture
+def pool():
+    pool = AgentPool(2)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_topological_order_rejects_cycles_and_unknown_dependencies():
+    assert topological_order([DagNode("b", str, ("a",)), DagNode("a", str)]) == ["a", "b"]
+    with pytest.raises(ValueError):
+        topological_order([DagNode("a", str, ("b",)), DagNode("b", str, ("a",))])
+    with pytest.raises(ValueError):
+        topological_order([DagNode("a", str, ("missing",))])
+
+
+def test_downstream_receives_upstream_results_and_partial_failures(pool):
+    def fail(inputs):
+        raise RuntimeError("boom")
+
+    executor = DagExecutor([
+        DagNode("a", lambda inputs: inputs["x"] + "-a"),
+        DagNode("b", fail, ("a",)),
+        DagNode("c", lambda inputs: inputs["a"] + "|" + inputs["b"], ("a", "b")),
+    ], pool=pool)
+    run = executor.run({"x": "in"})
+
+    assert run.results["a"] == "in-a"
+    assert run.results["c"] == "in-a|b 执行出错: boom"
+    statuses = {entry["node"]: entry["status"] for entry in run.trace}
+    assert statuses == {"a": STATUS_OK, "b": STATUS_ERROR, "c": STATUS_OK}
+    assert not run.complete
+
+
+def test_timeout_starts_when_node_starts_running(pool):
+    release = threading.Event()
+    # 两个阻塞节点占满线程池，第三个节点要等其中一个结束才能开始
+    blockers = [DagNode(f"block{i}", lambda inputs: release.wait(5) and "done") for i in range(2)]
+    executor = DagExecutor(blockers + [DagNode("late", lambda inputs: time.sleep(0.1) or "late", timeout=0.5)],
+                           pool=pool, queue_timeout=5)
+
+    timer = threading.Timer(0.8, release.set)
+    timer.start()
+    run = executor.run()
+    timer.join()
+
+    late = next(entry for entry in run.trace if entry["node"] == "late")
+    assert late["status"] == STATUS_OK
+    assert late["started"] >= 0.7
+    assert late["seconds"] < 0.5
+    assert run.complete
+
+
+def test_timed_out_node_keeps_its_slot_and_later_work_is_rejected(pool):
+    release = threading.Event()
+    slow = DagExecutor([DagNode(f"slow{i}", lambda inputs: release.wait(5) and "done", timeout=0.1)
+                        for i in range(2)], pool=pool)
+    run = slow.run()
+    assert [entry["status"] for entry in run.trace] == [STATUS_TIMEOUT, STATUS_TIMEOUT]
+    assert all(entry["started"] is not None for entry in run.trace)
+
+    # 超时节点的线程仍在运行，线程池没有空闲名额，新节点在排队超时后被拒绝而不是超时
+    quick = DagExecutor([DagNode("quick", lambda inputs: "ok", timeout=0.1)], pool=pool, queue_timeout=0.2)
+    run = quick.run()
+    release.set()
+
+    entry = run.trace[0]
+    assert entry["status"] == STATUS_REJECTED
+    assert entry["started"] is None
+    assert run.results["quick"] == "quick 未执行：智能体线程池已满"
+    assert not run.complete
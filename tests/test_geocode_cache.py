@@ -0,0 +1,79 @@
+"""geocode_cache 的离线表、缓存写入和定期清理"""
+
+import time
+
+import geocode_cache
+from gaode_adcodes import lookup_offline
+from geocode_cache import GeocodeCache, normalize_address, offline_response
+from search_cache import SQLiteCache, TTLCache
+
+RESPONSE = {"status": "1", "info": "OK", "geocodes": [{"location": "120.1,30.2", "adcode": "330106"}]}
+
+
+def test_normalize_address():
+    assert normalize_address(" 杭州市 西湖区 ") == "杭州市西湖区"
+    assert normalize_address("ＨangZhou") == "hangzhou"
+    assert normalize_address(None) == ""
+
+
+def test_offline_table_matches_name_and_short_name():
+    assert lookup_offline("杭州")["adcode"] == "330100"
+    assert lookup_offline("杭州市") == lookup_offline("杭州")
+    assert lookup_offline("西湖区") is None
+
+
+def test_offline_response_has_gaode_shape():
+    response = offline_response(" 北京 ")
+    assert response["status"] == "1"
+    assert response["source"] == "offline"
+    assert response["geocodes"][0]["adcode"] == "110000"
+
+
+def test_offline_hits_skip_the_cache():
+    cache = GeocodeCache(TTLCache())
+    assert cache.get("上海")["geocodes"][0]["adcode"] == "310000"
+    assert cache.stats()["offline_hits"] == 1
+    assert cache.stats()["misses"] == 0
+
+    without_table = GeocodeCache(TTLCache(), offline=False)
+    assert without_table.get("上海") is None
+
+
+def test_only_successful_responses_are_cached():
+    cache = GeocodeCache(TTLCache())
+    cache.set("西湖区", {"status": "0", "info": "INVALID_USER_KEY"})
+    cache.set("不存在的地方", {"status": "1", "geocodes": []})
+    assert cache.get("西湖区") is None
+    assert cache.get("不存在的地方") is None
+
+    cache.set("西湖区", RESPONSE)
+    assert cache.get(" 西湖区") == RESPONSE
+
+
+def test_set_purges_expired_entries_at_most_once_per_interval(monkeypatch):
+    backend = TTLCache()
+    cache = GeocodeCache(backend, ttl=10, purge_interval=3600)
+    cache.set("西湖区", RESPONSE)
+
+    now = time.time()
+    monkeypatch.setattr("search_cache.time.time", lambda: now + 60)
+    cache.set("滨江区", RESPONSE)
+    assert backend.stats()["expirations"] == 0
+
+    monotonic = time.monotonic()
+    monkeypatch.setattr(geocode_cache.time, "monotonic", lambda: monotonic + 3601)
+    cache.set("上城区", RESPONSE)
+    assert backend.stats()["expirations"] == 1
+    assert cache.get("西湖区") is None
+
+
+def test_sqlite_backend_is_blocking(tmp_path):
+    backend = SQLiteCache(str(tmp_path / "geocode.db"))
+    try:
+        cache = GeocodeCache(backend)
+        assert cache.blocking
+        cache.set("西湖区", RESPONSE)
+        assert cache.get("西湖区") == RESPONSE
+    finally:
+        backend.close()
+    assert not GeocodeCache(TTLCache()).blocking
@@ -0,0 +1,52 @@
+"""mcp_server 的熔断器和重试"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("mcp")
+
+import httpx  # noqa: E402
+
+import mcp_server  # noqa: E402
+from mcp_server import CircuitBreaker  # noqa: E402
+
+
+def test_is_open_does_not_count_rejections():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    assert not breaker.is_open("google")
+    breaker.record_failure("google")
+    assert breaker.is_open("google")
+    assert breaker.is_open("google")
+    assert breaker.stats()["rejected_requests"] == 0
+
+    assert not breaker.allow("google")
+    assert breaker.stats()["rejected_requests"] == 1
+
+
+def test_retry_stops_when_breaker_opens_without_counting_a_rejection(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    calls = []
+
+    async def fetch_searchapi(params, timeout=None):
+        calls.append(params)
+        raise httpx.ConnectTimeout("timeout")
+
+    async def no_wait(*args):
+        return 0.0
+
+    async def no_sleep(delay):
+        return None
+
+    monkeypatch.setattr(mcp_server, "circuit_breaker", breaker)
+    monkeypatch.setattr(mcp_server, "fetch_searchapi", fetch_searchapi)
+    monkeypatch.setattr(mcp_server, "RETRY_COUNT", 5)
+    monkeypatch.setattr(mcp_server.quota_ledger, "consume", lambda engine: True)
+    monkeypatch.setattr(mcp_server.rate_limiter, "acquire", no_wait)
+    monkeypatch.setattr(mcp_server.asyncio, "sleep", no_sleep)
+
+    result = asyncio.run(mcp_server.fetch_with_retry({"q": "杭州"}, "google"))
+    assert "error" in result
+    assert len(calls) == 2
+    assert breaker.stats()["trips"] == 1
+    assert breaker.stats()["rejected_requests"] == 0
@@ -0,0 +1,38 @@
+"""multi_agent_travel 的行程规划请求构建"""
+
+import pytest
+
+pytest.importorskip("agno")
+
+from multi_agent_travel import MultiAgentTravelPlanner, TravelInfo, parse_travel_info  # noqa: E402
+
+
+@pytest.fixture
+def planner():
+    # 只测试请求构建，不需要模型客户端和搜索工具
+    return MultiAgentTravelPlanner.__new__(MultiAgentTravelPlanner)
+
+
+def test_planning_request_keeps_raw_text_when_collector_output_is_not_json(planner):
+    collected_info = "目的地概况：杭州西湖，最佳季节为春秋两季"
+    travel_info, issues = parse_travel_info(collected_info)
+    assert travel_info.is_empty()
+    assert "无法从输出中解析出 JSON" in issues
+
+    request = planner._build_planning_request("去杭州玩三天", collected_info, travel_info)
+    assert "杭州西湖" in request
+    assert "TravelInfo(" not in request
+
+
+def test_planning_request_uses_parsed_sections(planner):
+    collected_info = '```json\n{"weather_info": {"forecast": "晴转多云"}}\n```'
+    travel_info, _ = parse_travel_info(collected_info)
+
+    request = planner._build_planning_request("去杭州玩三天", collected_info, travel_info)
+    assert "晴转多云" in request
+    assert "```" not in request
+
+
+def test_planning_request_accepts_travel_info(planner):
+    request = planner._build_planning_request("去杭州玩三天", TravelInfo())
+    assert "TravelInfo(" not in request
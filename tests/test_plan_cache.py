@@ -0,0 +1,100 @@
+"""plan_cache 的行程指纹和规划结果缓存"""
+
+import asyncio
+import threading
+import time
+
+import plan_cache
+from plan_cache import PlanCache, trip_fingerprint
+from search_cache import SQLiteCache, TTLCache
+from travel_prompts import TRAVEL_MESSAGE_TEMPLATE
+
+
+def make_message(**overrides):
+    fields = {
+        "source": "北京",
+        "destination": "东京",
+        "start_date": "2026-11-01",
+        "end_date": "2026-11-05",
+        "budget": 2100,
+        "preferences": "美食, 文化",
+        "accommodation_type": "中档酒店",
+        "transportation_mode": "公共交通",
+        "dietary_restrictions": "无",
+    }
+    fields.update(overrides)
+    return TRAVEL_MESSAGE_TEMPLATE.format(**fields)
+
+
+def test_equivalent_requests_share_fingerprint():
+    first = trip_fingerprint(make_message())
+    second = trip_fingerprint(make_message(destination=" 东京 ", budget=2400, preferences="文化，美食"))
+    assert first is not None
+    assert first == second
+
+
+def test_different_trips_do_not_share_fingerprint():
+    base = trip_fingerprint(make_message())
+    assert trip_fingerprint(make_message(budget=2600)) != base
+    assert trip_fingerprint(make_message(end_date="2026-11-06")) != base
+    assert trip_fingerprint(make_message(destination="大阪")) != base
+
+
+def test_empty_field_does_not_swallow_next_line():
+    fingerprint = trip_fingerprint(make_message(transportation_mode=""))
+    assert fingerprint is not None
+    assert fingerprint["transportation_mode"] == []
+    assert fingerprint["dietary_restrictions"] == ["无"]
+    assert fingerprint == trip_fingerprint(make_message(transportation_mode="", preferences="文化, 美食"))
+
+
+def test_non_trip_messages_have_no_fingerprint():
+    assert trip_fingerprint("附近有什么好吃的？") is None
+    assert trip_fingerprint(make_message(source="")) is None
+
+
+def test_plan_cache_roundtrip_is_namespaced():
+    cache = PlanCache(TTLCache(max_entries=10), ttl=60)
+    cache.set("multi:OpenAI", make_message(), {"detailed_itinerary": "行程"})
+    hit = cache.get("multi:OpenAI", make_message(budget=2200))
+    assert hit["detailed_itinerary"] == "行程"
+    assert hit["cache_age_seconds"] >= 0
+    assert cache.get("single:OpenAI", make_message()) is None
+    assert cache.get("multi:OpenAI", "随便问问") is None
+
+
+def test_set_purges_at_most_once_per_interval(monkeypatch):
+    backend = TTLCache(max_entries=10)
+    purges = []
+    monkeypatch.setattr(backend, "purge_expired", lambda: purges.append(1) or 0)
+    cache = PlanCache(backend, ttl=60, purge_interval=3600)
+
+    cache.set("multi:OpenAI", make_message(), {"detailed_itinerary": "行程"})
+    cache.set("multi:OpenAI", make_message(budget=3000), {"detailed_itinerary": "行程"})
+    assert len(purges) == 1
+
+    monotonic = time.monotonic()
+    monkeypatch.setattr(plan_cache.time, "monotonic", lambda: monotonic + 3601)
+    cache.set("multi:OpenAI", make_message(budget=4000), {"detailed_itinerary": "行程"})
+    assert len(purges) == 2
+
+
+def test_async_access_runs_sqlite_io_off_the_event_loop(tmp_path):
+    backend = SQLiteCache(str(tmp_path / "plans.db"))
+    threads = []
+    get, set_ = backend.get, backend.set
+    backend.get = lambda *args, **kwargs: threads.append(threading.current_thread()) or get(*args, **kwargs)
+    backend.set = lambda *args, **kwargs: threads.append(threading.current_thread()) or set_(*args, **kwargs)
+    cache = PlanCache(backend, ttl=60)
+
+    async def scenario():
+        await cache.aset("multi:OpenAI", make_message(), {"detailed_itinerary": "行程"})
+        return await cache.aget("multi:OpenAI", make_message())
+
+    try:
+        assert cache.blocking
+        assert asyncio.run(scenario())["detailed_itinerary"] == "行程"
+    finally:
+        backend.close()
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
@@ -0,0 +1,121 @@
+"""search_cache 的内存和 SQLite 缓存后端"""
+
+import os
+import threading
+import time
+
+import pytest
+
+import search_cache
+from search_cache import SQLiteCache, TTLCache, create_cache, get_engine_ttl, make_cache_key
+
+
+def test_make_cache_key_ignores_api_key_and_empty_values():
+    key = make_cache_key({"engine": "google", "q": " 杭州 ", "api_key": "secret", "gl": None})
+    assert key == make_cache_key({"q": "杭州", "engine": "google", "api_key": "other"})
+    assert "secret" not in key
+
+
+def test_engine_ttl_falls_back_to_default():
+    assert get_engine_ttl("google_flights") == 10 * 60
+    assert get_engine_ttl("unknown_engine") == search_cache.DEFAULT_CACHE_TTL
+
+
+def test_create_cache_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        create_cache("redis")
+
+
+class TestTTLCache:
+    def test_lru_eviction(self):
+        cache = TTLCache(max_entries=2)
+        cache.set("a", {"v": 1}, 60)
+        cache.set("b", {"v": 2}, 60)
+        assert cache.get("a") == {"v": 1}
+        cache.set("c", {"v": 3}, 60)
+        assert cache.get("b") is None
+        assert cache.get("a") == {"v": 1}
+        assert cache.stats()["evictions"] == 1
+
+    def test_expired_entries_kept_for_stale_reads_until_purged(self, monkeypatch):
+        cache = TTLCache(stale_grace=100)
+        cache.set("a", {"v": 1}, 10)
+        now = time.time()
+        monkeypatch.setattr(search_cache.time, "time", lambda: now + 50)
+        assert cache.get("a") is None
+        assert cache.get_stale("a") == {"v": 1}
+        assert cache.purge_expired() == 0
+        monkeypatch.setattr(search_cache.time, "time", lambda: now + 200)
+        assert cache.purge_expired() == 1
+        assert cache.get_stale("a") is None
+
+    def test_purge_from_another_thread_while_writing(self):
+        cache = TTLCache(max_entries=500)
+        stop = threading.Event()
+
+        def purge():
+            while not stop.is_set():
+                cache.purge_expired()
+
+        worker = threading.Thread(target=purge)
+        worker.start()
+        try:
+            for i in range(5000):
+                cache.set(str(i), {"v": i}, 60)
+                cache.get(str(i // 2))
+        finally:
+            stop.set()
+            worker.join()
+        assert cache.stats()["entries"] == 500
+
+
+class TestSQLiteCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = SQLiteCache(str(tmp_path / "cache.db"), max_entries=100)
+        yield cache
+        cache.close()
+
+    def test_roundtrip_and_persistence(self, cache, tmp_path):
+        cache.set("k", {"name": "西湖", "rating": 4.8}, 60, engine="google_maps")
+        assert cache.get("k") == {"name": "西湖", "rating": 4.8}
+
+        other = SQLiteCache(str(tmp_path / "cache.db"))
+        try:
+            assert other.get("k") == {"name": "西湖", "rating": 4.8}
+        finally:
+            other.close()
+
+    def test_hit_updates_last_access_only_after_interval(self, cache, monkeypatch):
+        cache.set("k", {"v": 1}, 600)
+        last_access = lambda: cache._conn.execute(
+            "SELECT last_access FROM search_cache WHERE key = 'k'").fetchone()[0]
+        written = last_access()
+
+        cache.get("k")
+        assert last_access() == written
+
+        now = time.time()
+        monkeypatch.setattr(search_cache.time, "time", lambda: now + search_cache.ACCESS_UPDATE_INTERVAL + 1)
+        cache.get("k")
+        assert last_access() > written
+
+    def test_purge_evicts_least_recently_used_overflow(self, tmp_path):
+        cache = SQLiteCache(str(tmp_path / "lru.db"), max_entries=3)
+        try:
+            for i in range(5):
+                cache.set(str(i), {"v": i}, 60)
+                cache._conn.execute("UPDATE search_cache SET last_access = ? WHERE key = ?", (i, str(i)))
+            cache.purge_expired()
+            assert [cache.get(str(i)) is not None for i in range(5)] == [False, False, True, True, True]
+            assert cache.stats()["evictions"] == 2
+        finally:
+            cache.close()
+
+    def test_purge_reclaims_all_free_pages(self, cache):
+        for i in range(50):
+            # 随机内容无法压缩，每条占用多个数据页
+            cache.set(f"k{i}", {"text": os.urandom(10000).hex()}, 1)
+        cache.stale_grace = -10
+        assert cache.purge_expired() == 50
+        assert cache._conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
@@ -0,0 +1,87 @@
+"""search_quota 的令牌桶限流和每日配额账本"""
+
+import asyncio
+import threading
+
+import pytest
+
+from search_quota import QuotaLedger, RateLimiter, TokenBucket
+
+
+def test_token_bucket_allows_burst_then_waits():
+    async def scenario():
+        bucket = TokenBucket(rate=50, burst=3)
+        waits = [await bucket.acquire() for _ in range(4)]
+        return waits
+
+    waits = asyncio.run(scenario())
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] > 0
+
+
+def test_rate_limiter_only_limits_configured_engines():
+    async def scenario():
+        limiter = RateLimiter(rate=0, burst=1, engine_limits={"google_flights": (50, 1)})
+        await limiter.acquire("key", "google_hotels")
+        await limiter.acquire("key", "google_hotels")
+        await limiter.acquire("key", "google_flights")
+        await limiter.acquire("key", "google_flights")
+        return limiter.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["throttled_requests"] == 1
+    assert stats["engine_limits"] == {"google_flights": [50, 1]}
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    return str(tmp_path / "quota" / "quota.db")
+
+
+def test_daily_and_engine_budgets(ledger_path):
+    ledger = QuotaLedger(ledger_path, daily_budget=3, engine_budgets={"google_flights": 1})
+    try:
+        assert ledger.consume("google_flights")
+        assert not ledger.consume("google_flights")
+        assert ledger.consume("google_hotels")
+        assert ledger.consume(None)
+        assert not ledger.consume("google_hotels")
+        assert ledger.usage() == {"google_flights": 1, "google_hotels": 1, "unknown": 1}
+        assert ledger.stats()["refused_requests"] == 2
+    finally:
+        ledger.close()
+
+
+def test_budget_shared_across_ledgers_on_same_file(ledger_path):
+    first = QuotaLedger(ledger_path, daily_budget=2)
+    second = QuotaLedger(ledger_path, daily_budget=2)
+    try:
+        assert first.consume("google")
+        assert second.consume("google")
+        assert not first.consume("google")
+        assert second.stats()["total_calls"] == 2
+    finally:
+        first.close()
+        second.close()
+
+
+def test_concurrent_consume_never_exceeds_budget(ledger_path):
+    ledger = QuotaLedger(ledger_path, daily_budget=25)
+    granted = []
+
+    def worker():
+        for _ in range(10):
+            if ledger.consume("google"):
+                granted.append(1)
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    try:
+        assert len(granted) == 25
+        assert ledger.usage() == {"google": 25}
+    finally:
+        ledger.close()
+
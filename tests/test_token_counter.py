@@ -0,0 +1,42 @@
+"""token_counter 在编码不可用时的估算和重试"""
+
+import sys
+import types
+
+import pytest
+
+import token_counter
+from context_compression import compress_text
+from token_counter import count_tokens, get_encoding
+
+
+@pytest.fixture
+def offline_tiktoken(monkeypatch):
+    """模拟已安装 tiktoken 但 BPE 文件下载失败"""
+    calls = []
+
+    def encoding_for_model(model):
+        calls.append(model)
+        raise ConnectionError("无法下载 o200k_base.tiktoken")
+
+    monkeypatch.setitem(sys.modules, "tiktoken", types.SimpleNamespace(encoding_for_model=encoding_for_model))
+    monkeypatch.setattr(token_counter, "_load_failures", {})
+    token_counter._encoding_for_model.cache_clear()
+    yield calls
+    token_counter._encoding_for_model.cache_clear()
+
+
+def test_load_failure_falls_back_to_byte_estimate(offline_tiktoken):
+    assert get_encoding("gpt-4.1") is None
+    assert count_tokens("abcdefgh", "gpt-4.1") == 2
+    assert compress_text("很长的旅行信息。" * 500, 50, "gpt-4.1")
+
+
+def test_load_failure_is_retried_after_interval(offline_tiktoken, monkeypatch):
+    count_tokens("abc", "gpt-4.1")
+    count_tokens("abc", "gpt-4.1")
+    assert offline_tiktoken == ["gpt-4.1"]
+
+    monkeypatch.setattr(token_counter, "TOKEN_ENCODING_RETRY_INTERVAL", 0)
+    count_tokens("abc", "gpt-4.1")
+    assert offline_tiktoken == ["gpt-4.1", "gpt-4.1"]
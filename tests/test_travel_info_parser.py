@@ -0,0 +1,75 @@
+"""travel_info_parser 的 JSON 提取、修复和结构校验"""
+
+import json
+
+from travel_info_parser import (TRAVEL_INFO_SCHEMA, extract_json_text, parse_collector_output, parse_json_output,
+                                repair_json, validate_travel_info)
+
+
+def test_extract_json_text_prefers_code_fence():
+    text = '说明 {"not": 1}\n```json\n{"a": 1}\n```\n结尾'
+    assert extract_json_text(text) == '{"a": 1}'
+    assert extract_json_text('前言 {"a": 1}') == '{"a": 1}'
+    assert extract_json_text("```json\n{\"a\": [1, 2") == '{"a": [1, 2'
+    assert extract_json_text("没有 JSON") is None
+    assert extract_json_text("") is None
+
+
+def test_repair_json_removes_trailing_commas_and_ignores_trailing_text():
+    assert repair_json('{"a": [1, 2,], "b": {"c": 1,},}') == {"a": [1, 2], "b": {"c": 1}}
+    assert repair_json('{"a": "x, }"} 以上是结果') == {"a": "x, }"}
+
+
+def test_repair_json_completes_truncated_output():
+    assert repair_json('{"a": {"b": [1, 2') == {"a": {"b": [1, 2]}}
+    assert repair_json('{"a": "unfinished') == {"a": "unfinished"}
+    # 截断在键名之后时回退到上一个逗号
+    assert repair_json('{"a": 1, "b":') == {"a": 1}
+    assert repair_json("not json") is None
+
+
+def test_parse_json_output_reports_repair():
+    assert parse_json_output('{"a": 1}') == ({"a": 1}, False)
+    assert parse_json_output('{"a": 1,}') == ({"a": 1}, True)
+    assert parse_json_output("[1, 2]") == (None, False)
+    assert parse_json_output("没有 JSON") == (None, False)
+
+
+def test_validate_travel_info_normalizes_types():
+    data = {
+        "weather_info": {"forecast": 25, "clothing_suggestions": "短袖"},
+        "hotels_info": {"luxury": "某酒店", "budget": ["青旅"]},
+        "media_info": {"images": ["a.jpg"]},
+        "destination_info": "一段文字",
+        "extra": 1,
+    }
+    sections, issues = validate_travel_info(data)
+
+    assert sections["weather_info"]["forecast"] == "25"
+    assert sections["hotels_info"]["luxury"] == ["某酒店"]
+    assert sections["media_info"]["images"] == {"items": ["a.jpg"]}
+    assert sections["destination_info"] == {"raw": "一段文字"}
+    assert sections["flights_info"] is None
+    assert "忽略未知字段: extra" in issues
+    assert "hotels_info.luxury 应为列表，已自动转换" in issues
+    assert "缺少 flights_info" in issues
+
+
+def test_validate_travel_info_unwraps_single_outer_object():
+    sections, issues = validate_travel_info({"travel_info": {"local_tips": {"currency": "人民币"}}},
+                                            fields=["local_tips"])
+    assert sections == {"local_tips": {"currency": "人民币"}}
+    assert issues == []
+
+
+def test_parse_collector_output():
+    payload = {"weather_info": {"forecast": "晴"}, "local_tips": {"language": "中文"}}
+    text = "收集结果如下：\n```json\n" + json.dumps(payload, ensure_ascii=False)[:-1] + ",\n"
+    sections, issues = parse_collector_output(text, fields=["weather_info", "local_tips"])
+    assert sections == payload
+    assert issues == ["JSON 不完整或格式不规范，已自动修复"]
+
+    sections, issues = parse_collector_output("抱歉，无法完成")
+    assert set(sections) == set(TRAVEL_INFO_SCHEMA)
+    assert all(value is None for value in sections.values())
+    assert issues == ["无法从输出中解析出 JSON"]
@@ -0,0 +1,62 @@
+"""
+token 计数模块
+为搜索结果精简（search_projection.py）和提示词上下文压缩（context_compression.py）
+提供同一套 token 计数：按 TOKEN_COUNT_MODEL 对应的 tiktoken 编码计算，
+未安装 tiktoken 或编码文件无法加载（离线、代理拦截下载）时按每 4 字节 1 个 token 估算
+"""
+
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+# 计数使用的模型（决定 tiktoken 编码）
+TOKEN_COUNT_MODEL = os.environ.get("TOKEN_COUNT_MODEL", "gpt-4.1")
+# 编码文件加载失败后，在该间隔（秒）内不再重试，直接按字节估算
+TOKEN_ENCODING_RETRY_INTERVAL = float(os.environ.get("TOKEN_ENCODING_RETRY_INTERVAL", "300"))
+
+# 模型 -> 最近一次加载编码失败的时间
+_load_failures: Dict[str, float] = {}
+_load_failures_lock = threading.Lock()
+
+
+@lru_cache(maxsize=8)
+def _encoding_for_model(model: str):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def get_encoding(model: Optional[str] = None):
+    """
+    获取模型对应的 tiktoken 编码（默认 TOKEN_COUNT_MODEL）
+
+    未安装 tiktoken 或编码文件无法加载时返回 None；加载失败不会被缓存，
+    TOKEN_ENCODING_RETRY_INTERVAL 秒后再次尝试。
+    """
+    model = model or TOKEN_COUNT_MODEL
+    with _load_failures_lock:
+        failed_at = _load_failures.get(model)
+    if failed_at is not None and time.monotonic() - failed_at < TOKEN_ENCODING_RETRY_INTERVAL:
+        return None
+    try:
+        return _encoding_for_model(model)
+    except Exception:
+        # tiktoken 首次使用编码时需要下载 BPE 文件，下载失败时退回估算
+        with _load_failures_lock:
+            _load_failures[model] = time.monotonic()
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """使用模型对应的 tiktoken 编码精确计数，编码不可用时按每 4 字节 1 个 token 估算"""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text.encode("utf-8")) // 4
+    return len(encoding.encode(text, disallowed_special=()))
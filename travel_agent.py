@@ -6,10 +6,21 @@ AI旅行规划智能体模块
 import asyncio
 import os
 from agno.agent import Agent
-from agno.tools.mcp import MultiMCPTools
 from agno.models.openai import OpenAIChat
 from agno.models.google import Gemini
 
+# 导入搜索工具连接管理
+from mcp_connection import create_search_mcp_tools
+
+# 导入流式输出
+from agent_streaming import stream_agent_run
+
+# 导入上下文压缩
+from context_compression import FOLLOW_UP_CONTEXT_TOKEN_BUDGET, compress_text
+
+# 导入规划结果缓存
+from plan_cache import get_plan_cache
+
 # 导入提示词模块
 from travel_prompts import (
     TRAVEL_AGENT_SYSTEM_PROMPT,
@@ -78,17 +89,48 @@ class TravelPlanningAgent:
         """获取智能体指令"""
         return TRAVEL_AGENT_SYSTEM_PROMPT
     
-    async def plan_travel(self, message: str, progress_callback=None):
+    def _create_agent(self, mcp_tools, model):
+        """创建带搜索工具的旅行规划智能体"""
+        return Agent(
+            tools=[mcp_tools],
+            model=model,
+            name=TRAVEL_AGENT_NAME,
+            instructions=self._get_agent_instructions(),
+            goal=TRAVEL_AGENT_GOAL
+        )
+    
+    def _cache_namespace(self):
+        return f"single_agent:{self.model_provider}"
+    
+    async def _load_cached_plan(self, message: str):
+        """读取缓存的旅行规划结果，未命中时返回 None"""
+        plan_cache = get_plan_cache()
+        cached = await plan_cache.aget(self._cache_namespace(), message) if plan_cache else None
+        return cached['detailed_itinerary'] if cached else None
+    
+    async def _store_plan(self, message: str, travel_plan: str):
+        plan_cache = get_plan_cache()
+        if plan_cache and travel_plan:
+            await plan_cache.aset(self._cache_namespace(), message, {'detailed_itinerary': travel_plan})
+    
+    async def plan_travel(self, message: str, progress_callback=None, use_cache=True):
         """
         执行旅行规划任务
         
         Args:
             message: 用户的旅行规划请求消息
             progress_callback: 可选的进度回调函数
+            use_cache: 是否使用规划结果缓存，相同行程的请求直接返回缓存方案
             
         Returns:
             str: 旅行规划结果
         """
+        cached = await self._load_cached_plan(message) if use_cache else None
+        if cached is not None:
+            if progress_callback:
+                progress_callback(4, 4, "已使用缓存的旅行方案！")
+            return cached
+        
         # 验证API密钥
         self._validate_keys()
         
@@ -99,22 +141,13 @@ class TravelPlanningAgent:
         if progress_callback:
             progress_callback(1, 4, "正在初始化AI旅行规划专家...")
         
-        async with MultiMCPTools(
-            ["python /mnt/public/code/zzy/wzh/doremi/searchAPI-mcp/mcp_server.py"],
-            env=env,
-        ) as mcp_tools:
+        async with create_search_mcp_tools(env) as mcp_tools:
             
             if progress_callback:
                 progress_callback(2, 4, "正在搜索旅行信息...")
             
             # 创建旅行规划智能体
-            travel_agent = Agent(
-                tools=[mcp_tools],
-                model=travel_model,
-                name=TRAVEL_AGENT_NAME,
-                instructions=self._get_agent_instructions(),
-                goal=TRAVEL_AGENT_GOAL
-            )
+            travel_agent = self._create_agent(mcp_tools, travel_model)
             
             if progress_callback:
                 progress_callback(3, 4, "正在制定行程方案...")
@@ -127,11 +160,60 @@ class TravelPlanningAgent:
             
             # 获取响应内容
             if hasattr(result, 'content'):
-                return result.content
+                travel_plan = result.content
             elif hasattr(result, 'messages') and result.messages:
-                return result.messages[-1].content if hasattr(result.messages[-1], 'content') else str(result.messages[-1])
+                travel_plan = result.messages[-1].content if hasattr(result.messages[-1], 'content') else str(result.messages[-1])
             else:
-                return str(result)
+                travel_plan = str(result)
+        
+        if use_cache:
+            await self._store_plan(message, travel_plan)
+        return travel_plan
+
+    
+    async def stream_travel_plan(self, message: str, progress_callback=None, use_cache=True):
+        """
+        以流式方式执行旅行规划任务
+        
+        Args:
+            message: 用户的旅行规划请求消息
+            progress_callback: 可选的进度回调函数
+            use_cache: 是否使用规划结果缓存，命中时一次性产出缓存方案
+            
+        Yields:
+            dict: agent_streaming 定义的 content / tool_call / done 事件，命中缓存时 done 事件的 cached 为 True
+        """
+        cached = await self._load_cached_plan(message) if use_cache else None
+        if cached is not None:
+            if progress_callback:
+                progress_callback(4, 4, "已使用缓存的旅行方案！")
+            yield {"type": "content", "delta": cached}
+            yield {"type": "done", "content": cached, "first_token_seconds": None, "cached": True}
+            return
+        
+        # 验证API密钥
+        self._validate_keys()
+        
+        # 获取环境变量和模型
+        env = self._get_environment()
+        travel_model = self._get_model()
+        
+        if progress_callback:
+            progress_callback(1, 4, "正在初始化AI旅行规划专家...")
+        
+        async with create_search_mcp_tools(env) as mcp_tools:
+            travel_agent = self._create_agent(mcp_tools, travel_model)
+            
+            if progress_callback:
+                progress_callback(2, 4, "正在搜索旅行信息并生成方案...")
+            
+            async for event in stream_agent_run(travel_agent, message):
+                if event["type"] == "done":
+                    if use_cache:
+                        await self._store_plan(message, event["content"])
+                    if progress_callback:
+                        progress_callback(4, 4, "AI规划完成！")
+                yield event
 
 
 def build_travel_message(source, destination, travel_dates, budget, travel_preferences, 
@@ -183,7 +265,7 @@ def build_context_message(travel_plan, travel_context, user_question):
     end_date = travel_dates[1] if isinstance(travel_dates, list) and len(travel_dates) > 1 else '未设定'
     
     return CONTEXT_MESSAGE_TEMPLATE.format(
-        travel_plan=travel_plan,
+        travel_plan=compress_text(travel_plan or '', FOLLOW_UP_CONTEXT_TOKEN_BUDGET),
         source=travel_context.get('source', '未设定'),
         destination=travel_context.get('destination', '未设定'),
         start_date=start_date,
@@ -219,3 +301,22 @@ async def run_travel_agent(message: str, model_provider="OpenAI",
     )
     
     return await agent.plan_travel(message, progress_callback)
+
+
+# 流式运行智能体的便捷函数
+async def stream_travel_agent(message: str, model_provider="OpenAI", 
+                              openai_key=None, gemini_key=None, searchapi_key=None, progress_callback=None):
+    """
+    以流式方式运行旅行规划智能体的便捷函数
+    
+    参数同 run_travel_agent，逐个产出 agent_streaming 定义的事件
+    """
+    agent = TravelPlanningAgent(
+        model_provider=model_provider,
+        openai_key=openai_key,
+        gemini_key=gemini_key,
+        searchapi_key=searchapi_key
+    )
+    
+    async for event in agent.stream_travel_plan(message, progress_callback):
+        yield event
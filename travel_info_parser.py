@@ -0,0 +1,204 @@
+"""
+旅行信息解析模块
+把信息收集智能体的输出解析为结构化数据：兼容 Markdown 代码块、前后说明文字、
+多余的逗号以及因长度限制被截断的 JSON，并按 INFORMATION_COLLECTOR_PROMPT 约定的
+结构校验和规范化各个类别
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 各类别的结构，与 INFORMATION_COLLECTOR_PROMPT 中的输出格式一致
+TRAVEL_INFO_SCHEMA = {
+    "destination_info": {"overview": str, "best_time": str, "culture": str, "safety": str, "visa_requirements": str},
+    "flights_info": {"outbound_options": list, "return_options": list, "price_range": str, "recommendations": str},
+    "hotels_info": {"luxury": list, "mid_range": list, "budget": list, "location_recommendations": str},
+    "restaurants_info": {"fine_dining": list, "local_cuisine": list, "casual_dining": list, "budget_options": list},
+    "attractions_info": {"must_visit": list, "cultural_sites": list, "outdoor_activities": list, "entertainment": list},
+    "transportation_info": {"airport_transfer": list, "public_transport": list, "rental_options": list,
+                            "taxi_rideshare": list},
+    "weather_info": {"forecast": str, "clothing_suggestions": str, "seasonal_considerations": str},
+    "local_tips": {"currency": str, "language": str, "customs": str, "emergency_contacts": str},
+    "media_info": {"images": dict, "videos": dict},
+}
+
+# 修复截断 JSON 时最多尝试的截断点数量
+MAX_REPAIR_ATTEMPTS = 200
+
+_FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)(?:```|$)", re.DOTALL)
+
+
+def extract_json_text(text: str) -> Optional[str]:
+    """取出输出中的 JSON 部分：优先使用代码块内容（允许代码块未闭合），否则从第一个 { 开始"""
+    if not text:
+        return None
+    for match in _FENCE_PATTERN.finditer(text):
+        body = match.group(1)
+        if "{" in body:
+            return body[body.index("{"):].strip()
+    start = text.find("{")
+    return text[start:].strip() if start >= 0 else None
+
+
+def _closers(stack: List[str]) -> str:
+    return "".join(reversed(stack))
+
+
+def repair_json(fragment: str) -> Optional[Any]:
+    """
+    解析可能不完整的 JSON
+
+    扫描一遍记录字符串和括号状态，去掉 } ] 前多余的逗号；文本被截断时先尝试补全
+    字符串和括号，失败后依次回退到更早的逗号或括号位置再补全。
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    cut_points: List[Tuple[int, str]] = []
+    in_string = escape = False
+
+    for ch in fragment:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+            cut_points.append((len(out), _closers(stack)))
+            continue
+        elif ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                # 顶层对象已完整，忽略其后的说明文字
+                break
+            cut_points.append((len(out), _closers(stack)))
+            continue
+        elif ch == ",":
+            cut_points.append((len(out), _closers(stack)))
+        out.append(ch)
+
+    text = "".join(out)
+    candidates = [text + ('"' if in_string else "") + _closers(stack)]
+    if not stack:
+        candidates = [text]
+    for position, closers in reversed(cut_points[-MAX_REPAIR_ATTEMPTS:]):
+        candidates.append(text[:position].rstrip().rstrip(",:") + closers)
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_json_output(text: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    解析智能体输出中的 JSON 对象
+
+    Returns:
+        (数据, 是否经过修复)；无法解析时数据为 None
+    """
+    fragment = extract_json_text(text)
+    if fragment is None:
+        return None, False
+    # 完整合法的 JSON 直接使用 json.loads，只有失败时才进入修复流程
+    try:
+        data = json.loads(fragment)
+        repaired = False
+    except ValueError:
+        data = repair_json(fragment)
+        repaired = True
+    return (data, repaired) if isinstance(data, dict) else (None, repaired)
+
+
+def _validate_section(field: str, value: Any, issues: List[str]) -> Optional[Dict[str, Any]]:
+    schema = TRAVEL_INFO_SCHEMA[field]
+    if value in (None, "", [], {}):
+        return None
+    if not isinstance(value, dict):
+        issues.append(f"{field} 应为对象，已保存在 raw 字段中")
+        return {"raw": value}
+
+    section = dict(value)
+    for key, expected in schema.items():
+        if key not in section or section[key] is None:
+            continue
+        item = section[key]
+        if expected is list and not isinstance(item, list):
+            section[key] = [item]
+            issues.append(f"{field}.{key} 应为列表，已自动转换")
+        elif expected is str and isinstance(item, (int, float)):
+            section[key] = str(item)
+        elif expected is dict and not isinstance(item, dict):
+            section[key] = {"items": item if isinstance(item, list) else [item]}
+            issues.append(f"{field}.{key} 应为对象，已自动转换")
+    return section
+
+
+def validate_travel_info(data: Dict[str, Any], fields: Optional[Iterable[str]] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    按 TRAVEL_INFO_SCHEMA 校验并规范化旅行信息
+
+    Args:
+        data: 解析出的 JSON 对象
+        fields: 需要校验的类别，默认全部
+
+    Returns:
+        (类别 -> 规范化后的内容, 校验问题列表)；缺失的类别值为 None
+    """
+    fields = list(fields or TRAVEL_INFO_SCHEMA)
+    issues: List[str] = []
+
+    # 兼容把所有类别包在一层外部对象里的输出，例如 {"travel_info": {...}}
+    if not any(field in data for field in TRAVEL_INFO_SCHEMA) and len(data) == 1:
+        inner = next(iter(data.values()))
+        if isinstance(inner, dict):
+            data = inner
+
+    unknown = [key for key in data if key not in TRAVEL_INFO_SCHEMA]
+    if unknown:
+        issues.append(f"忽略未知字段: {', '.join(unknown)}")
+
+    sections = {}
+    for field in fields:
+        sections[field] = _validate_section(field, data.get(field), issues)
+        if sections[field] is None:
+            issues.append(f"缺少 {field}")
+    return sections, issues
+
+
+def parse_collector_output(text: str, fields: Optional[Iterable[str]] = None) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    解析信息收集智能体的输出并校验
+
+    Args:
+        text: 智能体输出的原始文本
+        fields: 需要的类别，默认全部
+
+    Returns:
+        (类别 -> 内容, 问题列表)；无法解析时所有类别为 None
+    """
+    data, repaired = parse_json_output(text)
+    if data is None:
+        return {field: None for field in (fields or TRAVEL_INFO_SCHEMA)}, ["无法从输出中解析出 JSON"]
+
+    sections, issues = validate_travel_info(data, fields)
+    if repaired:
+        issues.insert(0, "JSON 不完整或格式不规范，已自动修复")
+    return sections, issues